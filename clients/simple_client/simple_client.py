@@ -1,19 +1,41 @@
 import json
 import socket
+from datetime import datetime, timedelta, UTC
 from struct import unpack
+from framing import send_frame
+from google.protobuf.json_format import MessageToDict
 from messages_pb2 import ActuatorUpdate
 from messages_pb2 import SensorsReport, ActuatorsReport
 from messages_pb2 import RequestType, ClientRequest
 from messages_pb2 import ReplyStatus, ClientReply
 from messages_pb2 import SensorReading, SensorData
+from messages_pb2 import DeviceGroup, GroupCommandReport
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def format_timestamp(message):
+    # Gateways antigos preenchem apenas o timestamp em ISO 8601
+    if not message.timestamp_us:
+        return message.timestamp
+    return (EPOCH + timedelta(microseconds=message.timestamp_us)).isoformat()
+
+
+def payload_dict(message, name):
+    # Gateways antigos, ou dispositivos que enviam JSON, preenchem apenas a string
+    field = f'{name}_struct'
+    if message.HasField(field):
+        return MessageToDict(getattr(message, field))
+    return json.loads(getattr(message, name))
 
 
 def print_sensor_reading(sensor: SensorReading):
-    metadata = json.loads(sensor.metadata)
+    metadata = payload_dict(sensor, 'metadata')
     print('[INFO]')
     print('  Sensor    : %s' %sensor.device_name)
     print('  Reading   : %.4f' %sensor.reading_value)
-    print('  Timestamp : %s' %sensor.timestamp)
+    print('  Timestamp : %s' %format_timestamp(sensor))
     print('  Status    : %s' %('ONLINE' if sensor.is_online else 'OFFLINE'))
     if metadata:
         max_key_length = max(len(k) for k in metadata)
@@ -24,8 +46,8 @@ def print_sensor_reading(sensor: SensorReading):
 
 
 def print_actuator_update(actuator: ActuatorUpdate):
-    state = json.loads(actuator.state)
-    metadata = json.loads(actuator.metadata)
+    state = payload_dict(actuator, 'state')
+    metadata = payload_dict(actuator, 'metadata')
     print('[INFO]')
     print('  Actuator  : %s' %actuator.device_name)
     print('  Timestamp : %s' %actuator.timestamp)
@@ -44,7 +66,7 @@ def print_actuator_update(actuator: ActuatorUpdate):
 
 
 def print_sensor_data(data: SensorData):
-    metadata = json.loads(data.metadata)
+    metadata = payload_dict(data, 'metadata')
     print('[INFO]')
     print('  Sensor : %s' %data.device_name)
     print('  Status : %s' %('ONLINE' if data.is_online else 'OFFLINE'))
@@ -56,7 +78,7 @@ def print_sensor_data(data: SensorData):
     if data.readings:
         print('[DATA]')
         for reading in data.readings:
-            print(f'  {reading.timestamp} : {reading.reading_value:.4f}')
+            print(f'  {format_timestamp(reading)} : {reading.reading_value:.4f}')
     print()
 
 
@@ -76,6 +98,17 @@ def print_actuators_report(report: ActuatorsReport):
         print_actuator_update(actuator)
 
 
+def print_group_report(report: GroupCommandReport):
+    if not report.results:
+        print('No actuators in the group')
+        return
+    for result in report.results:
+        name = f'{result.device_id.category}-{result.device_id.id}'
+        status = ReplyStatus.Name(result.status).removeprefix('RS_')
+        print(f'  {name} : {status}')
+    print()
+
+
 def recv_exaclty(sock, n, timeout_tolerance=3):
     msg_chunks = []
     remaining = n
@@ -109,7 +142,7 @@ def send_request_to_gateway(args, request):
             print('[!] Unable to connect to Gateway')
             return
         try:
-            sock.send(request.SerializeToString())
+            send_frame(sock, request.SerializeToString())
         except Exception:
             print('[!] Error when sending request to Gateway')
             return
@@ -124,7 +157,10 @@ def send_request_to_gateway(args, request):
 
 
 def get_sensors_report(args):
-    request = ClientRequest(type=RequestType.RT_GET_SENSORS_REPORT)
+    request = ClientRequest(
+        type=RequestType.RT_GET_SENSORS_REPORT,
+        typed_payloads=True,
+    )
     reply = send_request_to_gateway(args, request)
     if reply is None:
         return
@@ -141,7 +177,10 @@ def get_sensors_report(args):
 
 
 def get_actuators_report(args):
-    request = ClientRequest(type=RequestType.RT_GET_ACTUATORS_REPORT)
+    request = ClientRequest(
+        type=RequestType.RT_GET_ACTUATORS_REPORT,
+        typed_payloads=True,
+    )
     reply = send_request_to_gateway(args, request)
     if reply is None:
         return
@@ -162,6 +201,7 @@ def send_action_to_actuator(args, device_name, action_name):
         type=RequestType.RT_RUN_ACTUATOR_ACTION,
         device_name=device_name,
         body=action_name,
+        typed_payloads=True,
     )
     reply = send_request_to_gateway(args, request)
     if reply is None:
@@ -195,6 +235,7 @@ def send_set_state_to_actuator(args, device_name, state_key, state_value):
         type=RequestType.RT_SET_ACTUATOR_STATE,
         device_name=device_name,
         body=state_string,
+        typed_payloads=True,
     )
     reply = send_request_to_gateway(args, request)
     if reply is None:
@@ -217,10 +258,68 @@ def send_set_state_to_actuator(args, device_name, state_key, state_value):
         return
 
 
+def parse_device_group(group_name):
+    # <category> ou <category>:<id>,<id>,...
+    category, _, ids = group_name.partition(':')
+    try:
+        ids = [int(device_id) for device_id in ids.split(',')] if ids else []
+    except ValueError:
+        print(f'[!] Invalid device ids in "{group_name}"')
+        return
+    return DeviceGroup(category=category, ids=ids)
+
+
+def send_group_command(args, group_name, request_type, body):
+    device_group = parse_device_group(group_name)
+    if device_group is None:
+        return
+    request = ClientRequest(
+        type=request_type,
+        device_group=device_group,
+        body=body,
+        typed_payloads=True,
+    )
+    reply = send_request_to_gateway(args, request)
+    if reply is None:
+        return
+    if reply.status is ReplyStatus.RS_UNKNOWN_DEVICE:
+        print(f'[!] No actuators found in group "{group_name}"')
+        return
+    if reply.status is not ReplyStatus.RS_OK:
+        print('[!] Something went wrong...')
+        return
+    try:
+        report = GroupCommandReport()
+        report.ParseFromString(reply.data)
+        return report
+    except Exception:
+        print('[!] Unable to understand Gateway response')
+        return
+
+
+def send_action_to_group(args, group_name, action_name):
+    return send_group_command(
+        args, group_name, RequestType.RT_RUN_GROUP_ACTION, action_name,
+    )
+
+
+def send_set_state_to_group(args, group_name, state_key, state_value):
+    state_string = '{"%s": %s}' %(state_key, state_value)
+    try:
+        _ = json.loads(state_string)
+    except json.JSONDecodeError:
+        print(f'[!] An invalid JSON was assembled: {state_string}')
+        return
+    return send_group_command(
+        args, group_name, RequestType.RT_SET_GROUP_STATE, state_string,
+    )
+
+
 def get_sensor_data(args, device_name):
     request = ClientRequest(
         type=RequestType.RT_GET_SENSOR_DATA,
         device_name=device_name,
+        typed_payloads=True,
     )
     reply = send_request_to_gateway(args, request)
     if reply is None:
@@ -244,6 +343,7 @@ def get_actuator_update(args, device_name):
     request = ClientRequest(
         type=RequestType.RT_GET_ACTUATOR_UPDATE,
         device_name=device_name,
+        typed_payloads=True,
     )
     reply = send_request_to_gateway(args, request)
     if reply is None:
@@ -281,7 +381,12 @@ def print_help(bad_command=False):
     print('            : Set state <key> to <value> for actuator <name>')
     print('            : <value> must be a valid stringfyed JSON value')
     print('            : <key> must not be enclosed in double quotes')
-    print('            : If <value> is a string, it must be enclosed in double quotes', end='\n\n')
+    print('            : If <value> is a string, it must be enclosed in double quotes')
+    print('  group <category>[:<id>,<id>,...] <action>')
+    print('            : Send action <action> to every listed actuator of <category>')
+    print('            : Without ids, to every actuator of <category>')
+    print('  group <category>[:<id>,<id>,...] <key> <value>')
+    print('            : Set state <key> to <value> for the listed actuators', end='\n\n')
 
 
 def app(args):
@@ -331,6 +436,17 @@ def app(args):
                         print_actuator_update(update)
                 else:
                     print_help(True)
+            case 'group':
+                if len(params) == 2:
+                    report = send_action_to_group(args, *params)
+                    if report is not None:
+                        print_group_report(report)
+                elif len(params) == 3:
+                    report = send_set_state_to_group(args, *params)
+                    if report is not None:
+                        print_group_report(report)
+                else:
+                    print_help(True)
             case _:
                 print_help(True)
 
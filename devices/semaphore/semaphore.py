@@ -1,7 +1,9 @@
 import sys
 import time
 import json
+import hashlib
 import socket
+import select
 import logging
 import threading
 from numbers import Real
@@ -9,7 +11,10 @@ from datetime import datetime, UTC
 from functools import wraps
 from concurrent.futures import ThreadPoolExecutor
 from google.protobuf.message import DecodeError
-from messages_pb2 import Address
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.struct_pb2 import Struct
+from framing import FrameBuffer, is_framed, recv_frame, send_frame
+from messages_pb2 import Address, DeviceId
 from messages_pb2 import DeviceType, DeviceInfo, JoinRequest, JoinReply
 from messages_pb2 import ActuatorUpdate
 from messages_pb2 import CommandType, ActuatorCommand
@@ -65,27 +70,47 @@ def gateway_discoverer(args):
                     gateway_addrs.ip,
                 )
                 disconnect_device(args)
-            try_to_register(args, (gateway_addrs.ip, gateway_addrs.port), logger)
+            try_to_register(
+                args,
+                (gateway_addrs.ip, gateway_addrs.port),
+                logger,
+                gateway_addrs.framed_registration,
+            )
 
 
 def disconnect_device(args):
     with args.connection_lock:
         args.gateway_ip = None
         args.transmission_port = None
+        args.device_handle = 0
+        args.update_streams = False
+        args.typed_payloads = False
+        args.state_deltas = False
+        args.reported_metadata_hash = 0
+        args.reported_seq = 0
     return
 
 
-def try_to_register(args, address, logger):
+def try_to_register(args, address, logger, framed=False):
     logger.info('Tentando registro no endereço %s', address)
     with args.state_lock:
-        state = json.dumps(args.state)
+        state = snapshot_state(args)
+        state_seq = args.state_seq
         timestamp = datetime.now(UTC).isoformat()
+    # O registro leva as duas representações: ainda não se sabe se o Gateway
+    # lê os Structs
     actuator_info = DeviceInfo(
         type=DeviceType.DT_ACTUATOR,
         name=args.name,
-        state=state,
+        state=json.dumps(MessageToDict(state)),
         metadata=json.dumps(args.metadata),
+        state_struct=state,
+        metadata_struct=args.metadata_struct,
+        metadata_hash=args.metadata_hash,
+        state_seq=state_seq,
         timestamp=timestamp,
+        device_id=DeviceId(category=args.category, id=args.id),
+        framed_commands=True,
     )
     actuator_address = Address(ip=args.host_ip, port=args.port)
     join_request = JoinRequest(
@@ -96,9 +121,13 @@ def try_to_register(args, address, logger):
         sock.settimeout(args.base_timeout)
         try:
             sock.connect(address)
-            sock.send(join_request)
             join_reply = JoinReply()
-            join_reply.ParseFromString(sock.recv(1024))
+            if framed:
+                send_frame(sock, join_request)
+                join_reply.ParseFromString(recv_frame(sock))
+            else:
+                sock.send(join_request)
+                join_reply.ParseFromString(sock.recv(1024))
         except Exception as e:
             logger.warning(
                 'Erro durante tentativa de registro em %s: (%s) %s',
@@ -110,17 +139,72 @@ def try_to_register(args, address, logger):
     with args.connection_lock:
         args.gateway_ip = address[0]
         args.transmission_port = join_reply.report_port
+        args.device_handle = join_reply.device_handle
+        args.update_streams = join_reply.update_streams
+        args.typed_payloads = join_reply.typed_payloads
+        args.state_deltas = join_reply.state_deltas
+        args.reported_metadata_hash = args.metadata_hash
+        args.reported_seq = state_seq
     logger.info('Registro bem-sucedido com o Gateway em %s', address[0])
     return
 
 
-def build_update_message(args, state, timestamp):
-    return ActuatorUpdate(
+def update_state(args, changes):
+    # Deve ser chamada com args.state_lock adquirido
+    args.state_seq += 1
+    for key, value in changes.items():
+        args.state[key] = value
+        args.state_versions[key] = args.state_seq
+    args.state_change.set()
+    return
+
+
+def snapshot_state(args, base_seq=None):
+    # Deve ser chamada com args.state_lock adquirido. Com base_seq, apenas as
+    # chaves alteradas depois dessa versão são incluídas
+    state = Struct()
+    if base_seq is None:
+        state.update(args.state)
+    else:
+        state.update({
+            key: args.state[key]
+            for key, version in args.state_versions.items()
+            if version > base_seq
+        })
+    return state
+
+
+def compute_metadata_hash(metadata_struct):
+    encoded = metadata_struct.SerializeToString(deterministic=True)
+    digest = hashlib.blake2b(encoded, digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def build_update_message(args, state, state_seq, timestamp, base_seq=None):
+    # O handle (0 se o Gateway não atribuiu um) dispensa o parsing do nome
+    update = ActuatorUpdate(
         device_name=args.name,
-        state=state,
-        metadata=json.dumps(args.metadata),
+        device_handle=args.device_handle,
+        metadata_hash=args.metadata_hash,
+        state_seq=state_seq,
         timestamp=timestamp,
     )
+    if base_seq is not None:
+        update.state_delta = True
+        update.base_seq = base_seq
+    with args.connection_lock:
+        typed_payloads = args.typed_payloads
+        reported_metadata_hash = args.reported_metadata_hash
+    if not typed_payloads:
+        # Gateways antigos esperam estado e metadados completos em JSON
+        update.state = json.dumps(MessageToDict(state))
+        update.metadata = json.dumps(args.metadata)
+        return update
+    update.state_struct.CopyFrom(state)
+    # Metadados só são enviados se o Gateway não conhece a versão atual
+    if reported_metadata_hash != args.metadata_hash:
+        update.metadata_struct.CopyFrom(args.metadata_struct)
+    return update
 
 
 def process_set_state_command(args, state_string):
@@ -142,11 +226,11 @@ def process_set_state_command(args, state_string):
         if period_value < 5.0:  # Período mínimo de 5 segundos
             return None
     with args.state_lock:
-        args.state.update(new_state)
-        args.state_change.set()
-        state = json.dumps(args.state)
+        update_state(args, new_state)
+        state = snapshot_state(args)
+        state_seq = args.state_seq
         timestamp = datetime.now(UTC).isoformat()
-    return build_update_message(args, state, timestamp)
+    return build_update_message(args, state, state_seq, timestamp)
 
 
 def process_command(args, command, logger):
@@ -170,20 +254,50 @@ def process_command(args, command, logger):
                 status = ComplyStatus.CS_OK
     if result is None:
         with args.state_lock:
-            state = json.dumps(args.state)
+            state = snapshot_state(args)
+            state_seq = args.state_seq
             timestamp = datetime.now(UTC).isoformat()
-        result = build_update_message(args, state, timestamp)
+        result = build_update_message(args, state, state_seq, timestamp)
     return ActuatorComply(status=status, update=result).SerializeToString()
 
 
+def wait_next_command(args, sock):
+    # Conexão persistente ociosa: aguarda o próximo comando em intervalos
+    # curtos para atender ao stop_flag
+    idle_time = 0.0
+    while not args.stop_flag.is_set() and idle_time < args.command_idle_timeout:
+        readable, _, _ = select.select((sock,), (), (), 1.0)
+        if readable:
+            return True
+        idle_time += 1.0
+    return False
+
+
+def process_framed_commands(args, sock, logger):
+    frame_buffer = FrameBuffer()
+    while wait_next_command(args, sock):
+        try:
+            msg = frame_buffer.recv_frame(sock)
+        except EOFError:
+            logger.debug('Conexão encerrada pelo Gateway')
+            return
+        command = ActuatorCommand()
+        command.ParseFromString(msg)
+        send_frame(sock, process_command(args, command, logger))
+
+
 def command_handler(args, sock, address):
     try:
         logger = logging.getLogger(f'COMMAND_HANDLER_{address}')
-        msg = sock.recv(1024)
-        command = ActuatorCommand()
-        command.ParseFromString(msg)
-        comply = process_command(args, command, logger)
-        sock.send(comply)
+        # Gateways antigos enviam um único comando sem prefixo de tamanho
+        if is_framed(sock):
+            process_framed_commands(args, sock, logger)
+        else:
+            msg = sock.recv(1024)
+            command = ActuatorCommand()
+            command.ParseFromString(msg)
+            comply = process_command(args, command, logger)
+            sock.send(comply)
     except Exception as e:
         logger.error(
             'Erro durante processamento de um comando: (%s) %s',
@@ -225,7 +339,8 @@ def command_listener(args):
                 e,
             )
             raise e
-        with ThreadPoolExecutor(max_workers=5) as executor:
+        # Conexões persistentes do Gateway ocupam um worker enquanto abertas
+        with ThreadPoolExecutor(max_workers=args.command_workers) as executor:
             while not args.stop_flag.is_set():
                 try:
                     conn, addrs = sock.accept()
@@ -269,47 +384,106 @@ def command_listener(args):
                     raise
 
 
+def close_socket(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+
+def open_update_stream(args, transmission_addrs):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(args.base_timeout)
+        sock.connect(transmission_addrs)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
 def state_change_reporter(args):
     logger = logging.getLogger('STATE_CHANGE_REPORTER')
     logger.info('Iniciando thread de divulgação de atualizações')
     idle_time = 0
-    while not args.stop_flag.is_set():
-        with args.connection_lock:
-            transmission_addrs = (args.gateway_ip, args.transmission_port)
-        if transmission_addrs[0] is None:
-            logger.info('Transmissão interrompida. Sem conexão com o Gateway')
-            time.sleep(2.0)
-            continue
-        if not args.state_change.is_set() and idle_time < args.update_interval:
-            time.sleep(1.0)
-            idle_time += 1
-            continue
-        idle_time = 0
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            try:
-                sock.settimeout(args.base_timeout)
-                sock.connect(transmission_addrs)
-            except Exception as e:
-                logger.error(
-                    'Conexão com o Gateway em %s falhou: (%s) %s',
-                    transmission_addrs,
-                    type(e).__name__,
-                    e,
-                )
+    # Com Gateways que aceitam (update_streams), as atualizações seguem por
+    # uma única conexão persistente; com os demais, uma conexão por atualização
+    stream = None
+    stream_addrs = None
+    try:
+        while not args.stop_flag.is_set():
+            with args.connection_lock:
+                transmission_addrs = (args.gateway_ip, args.transmission_port)
+                update_streams = args.update_streams
+            if stream is not None and stream_addrs != transmission_addrs:
+                close_socket(stream)
+                stream = None
+            if transmission_addrs[0] is None:
+                logger.info('Transmissão interrompida. Sem conexão com o Gateway')
                 time.sleep(2.0)
                 continue
+            if not args.state_change.is_set() and idle_time < args.update_interval:
+                time.sleep(1.0)
+                idle_time += 1
+                continue
+            idle_time = 0
+            if stream is None:
+                try:
+                    stream = open_update_stream(args, transmission_addrs)
+                    stream_addrs = transmission_addrs
+                except Exception as e:
+                    logger.error(
+                        'Conexão com o Gateway em %s falhou: (%s) %s',
+                        transmission_addrs,
+                        type(e).__name__,
+                        e,
+                    )
+                    time.sleep(2.0)
+                    continue
+                if update_streams:
+                    logger.info(
+                        'Conexão persistente com o Gateway em %s',
+                        transmission_addrs,
+                    )
             try:
+                # Apenas as chaves alteradas desde a última versão enviada,
+                # se o Gateway aceita deltas. Um delta perdido é detectado
+                # pelo Gateway (base_seq à frente do estado armazenado), que
+                # então solicita o estado completo
+                with args.connection_lock:
+                    if args.state_deltas and args.reported_seq > 0:
+                        base_seq = args.reported_seq
+                    else:
+                        base_seq = None
                 with args.state_lock:
-                    state = json.dumps(args.state)
+                    state = snapshot_state(args, base_seq)
+                    state_seq = args.state_seq
                     args.state_change.clear()
                     timestamp = datetime.now(UTC).isoformat()
-                update = build_update_message(args, state, timestamp)
-                sock.send(update.SerializeToString())
+                update = build_update_message(
+                    args, state, state_seq, timestamp, base_seq,
+                )
+                if update_streams:
+                    send_frame(stream, update.SerializeToString())
+                else:
+                    stream.send(update.SerializeToString())
+                    close_socket(stream)
+                    stream = None
+                with args.connection_lock:
+                    args.reported_metadata_hash = update.metadata_hash
+                    args.reported_seq = state_seq
                 logger.debug(
                     'Atualização de estado enviada para %s',
                     transmission_addrs,
                 )
             except Exception as e:
+                # O próximo envio leva o estado e os metadados completos
+                with args.connection_lock:
+                    args.reported_metadata_hash = 0
+                    args.reported_seq = 0
                 args.state_change.set()
                 logger.error(
                     'Erro ao enviar atualização para %s: (%s) %s',
@@ -317,24 +491,27 @@ def state_change_reporter(args):
                     type(e).__name__,
                     e,
                 )
+                # Reconecta no próximo envio
+                close_socket(stream)
+                stream = None
                 continue
+    finally:
+        if stream is not None:
+            close_socket(stream)
 
 
 def phase_generator(args):
     while True:
         with args.state_lock:
-            args.state['Phase'] = 'Red'
-            args.state_change.set()
+            update_state(args, {'Phase': 'Red'})
             phase_period = args.state['RedPeriod']
         yield 'Red', phase_period
         with args.state_lock:
-            args.state['Phase'] = 'Green'
-            args.state_change.set()
+            update_state(args, {'Phase': 'Green'})
             phase_period = args.state['GreenPeriod']
         yield 'Green', phase_period
         with args.state_lock:
-            args.state['Phase'] = 'Yellow'
-            args.state_change.set()
+            update_state(args, {'Phase': 'Yellow'})
             phase_period = args.state['YellowPeriod']
         yield 'Yellow', phase_period
 
@@ -432,11 +609,17 @@ def main():
     )
 
     # Device name
-    args.name = f'semaphore-{args.id}'
+    args.category = 'semaphore'
+    args.name = f'{args.category}-{args.id}'
 
     # Timeouts
     args.base_timeout = 2.0
     args.multicast_timeout = 5.0
+    # Maior que o tempo ocioso tolerado pelo pool de conexões do Gateway
+    args.command_idle_timeout = 60.0
+
+    # Commands
+    args.command_workers = 8
 
     # Host IP
     args.host_ip = socket.gethostbyname('localhost')
@@ -447,6 +630,12 @@ def main():
     # Gateway
     args.gateway_ip = None
     args.transmission_port = None
+    args.device_handle = 0
+    args.update_streams = False
+    args.typed_payloads = False
+    args.state_deltas = False
+    args.reported_metadata_hash = 0
+    args.reported_seq = 0
 
     # State and metadata
     args.state = {
@@ -455,12 +644,17 @@ def main():
         'RedPeriod': 40.0,
         'Phase': 'Unset'
     }
+    args.state_seq = 1
+    args.state_versions = {key: args.state_seq for key in args.state}
     args.metadata = {
         'Location': {'Latitude': -3.734431, 'Longitude': -38.568971},
         'Target': "R. Licurgo Montenegro X Av. Governador Parsifal Barroso",
         'Phases': ['Unset', 'Green', 'Yellow', 'Red'],
         'Actions': [],
     }
+    args.metadata_struct = Struct()
+    args.metadata_struct.update(args.metadata)
+    args.metadata_hash = compute_metadata_hash(args.metadata_struct)
 
     # Events and locks
     args.stop_flag = threading.Event()
@@ -0,0 +1,127 @@
+import socket
+from struct import pack, unpack_from
+
+
+# Mensagens precedidas por seu tamanho em 4 bytes (big-endian). Este módulo é
+# copiado para os diretórios dos dispositivos e do cliente, assim como o
+# messages_pb2.py
+FRAME_HEADER_SIZE = 4
+MAX_FRAME_SIZE = 1 << 20
+
+
+def frame_message(message):
+    return pack('!I', len(message)) + message
+
+
+def send_frame(sock, message):
+    sock.sendall(frame_message(message))
+
+
+def is_framed(sock):
+    # O primeiro byte de um frame é o mais significativo do tamanho (sempre 0
+    # abaixo de MAX_FRAME_SIZE); o de uma mensagem Protobuf serializada, nunca
+    return sock.recv(1, socket.MSG_PEEK) == b'\x00'
+
+
+def recv_into_exactly(sock, view):
+    received = 0
+    while received < len(view):
+        chunk_size = sock.recv_into(view[received:])
+        if not chunk_size:
+            raise EOFError('Socket closed before receiving all expected data')
+        received += chunk_size
+    return
+
+
+def recv_exactly(sock, n):
+    # Recebe diretamente no buffer final, sem concatenar fragmentos
+    buffer = bytearray(n)
+    with memoryview(buffer) as view:
+        recv_into_exactly(sock, view)
+    return buffer
+
+
+def recv_frame_size(sock, header, max_frame_size=MAX_FRAME_SIZE):
+    with memoryview(header) as view:
+        recv_into_exactly(sock, view)
+    msg_size = unpack_from('!I', header)[0]
+    if msg_size > max_frame_size:
+        raise ValueError(f'Frame of {msg_size} bytes exceeds the limit')
+    return msg_size
+
+
+def recv_frame(sock, max_frame_size=MAX_FRAME_SIZE):
+    msg_size = recv_frame_size(sock, bytearray(FRAME_HEADER_SIZE), max_frame_size)
+    return recv_exactly(sock, msg_size)
+
+
+class FrameBuffer:
+    # Buffer reutilizado entre os frames de uma conexão persistente. O frame
+    # devolvido é uma view do buffer, válida apenas até a próxima leitura
+    def __init__(self, buffer_size=4096, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._header = bytearray(FRAME_HEADER_SIZE)
+        self._buffer = bytearray(buffer_size)
+
+    def recv_frame(self, sock):
+        msg_size = recv_frame_size(sock, self._header, self.max_frame_size)
+        if msg_size > len(self._buffer):
+            self._buffer = bytearray(msg_size)
+        view = memoryview(self._buffer)[:msg_size]
+        recv_into_exactly(sock, view)
+        return view
+
+
+class FrameReader:
+    # Leitura incremental de frames, para sockets não bloqueantes: os bytes
+    # são recebidos em um buffer reutilizado e apenas frames completos são
+    # devolvidos. Cada frame é copiado para bytes, pois o buffer é compactado
+    # e ampliado nas leituras seguintes
+    def __init__(self, buffer_size=4096, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray(buffer_size)
+        self._start = 0
+        self._end = 0
+
+    def _make_room(self, needed):
+        pending = self._end - self._start
+        if self._start and len(self._buffer) - self._end < needed:
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._start, self._end = 0, pending
+        if len(self._buffer) - self._end < needed:
+            self._buffer.extend(bytes(needed - (len(self._buffer) - self._end)))
+        return
+
+    def read(self, sock):
+        # Retorna o número de bytes recebidos; EOFError se a conexão foi encerrada
+        if self._end == len(self._buffer):
+            self._make_room(len(self._buffer) // 2 or 1)
+        with memoryview(self._buffer) as view:
+            received = sock.recv_into(view[self._end:])
+        if not received:
+            raise EOFError('Socket closed by peer')
+        self._end += received
+        return received
+
+    def pending_size(self):
+        return self._end - self._start
+
+    def pending(self):
+        return bytes(self._buffer[self._start:self._end])
+
+    def frames(self):
+        frames = []
+        while self._end - self._start >= FRAME_HEADER_SIZE:
+            msg_size = unpack_from('!I', self._buffer, self._start)[0]
+            if msg_size > self.max_frame_size:
+                raise ValueError(f'Frame of {msg_size} bytes exceeds the limit')
+            frame_end = self._start + FRAME_HEADER_SIZE + msg_size
+            if frame_end > self._end:
+                # Garante espaço para o restante do frame
+                self._make_room(frame_end - self._end)
+                break
+            frames.append(bytes(self._buffer[self._start + FRAME_HEADER_SIZE:frame_end]))
+            self._start = frame_end
+        if self._start == self._end:
+            self._start = self._end = 0
+        return frames
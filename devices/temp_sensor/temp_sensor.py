@@ -2,15 +2,17 @@ import sys
 import json
 import socket
 import time
-import datetime
 import random
+import datetime
 import threading
 import logging
 from functools import wraps
 import pika
 from pika.exceptions import AMQPError
 from google.protobuf.message import DecodeError
-from messages_pb2 import Address, SensorReading
+from google.protobuf.struct_pb2 import Struct
+from framing import recv_frame, send_frame
+from messages_pb2 import Address, SensorReading, SensorReadingBatch, DeviceId
 from messages_pb2 import DeviceType, DeviceInfo, JoinRequest, JoinReply
 
 
@@ -63,7 +65,12 @@ def discoverer(args):
                 continue
             seq_fails = 0
             if addresses.ip != args.gateway_ip:
-                result = try_registration(args, addresses.ip, addresses.port)
+                result = try_registration(
+                    args,
+                    addresses.ip,
+                    addresses.port,
+                    addresses.framed_registration,
+                )
                 if result:
                     logger.info(
                         'Registro bem-sucedido com Gateway em %s',
@@ -112,11 +119,14 @@ def register_broker(args, broker_ip, broker_port, publish_exchange):
         args.publish_exchange = publish_exchange
 
 
-def try_registration(args, gateway_ip, registration_port):
+def try_registration(args, gateway_ip, registration_port, framed=False):
+    # Metadados também em JSON para Gateways que não leem o Struct
     sensor_info = DeviceInfo(
         type=DeviceType.DT_SENSOR,
         name=args.name,
+        device_id=DeviceId(category=args.category, id=args.id),
         metadata=json.dumps(args.metadata),
+        metadata_struct=args.metadata_struct,
     )
     sensor_address = Address(ip=args.host_ip)
     join_request = JoinRequest(
@@ -127,13 +137,20 @@ def try_registration(args, gateway_ip, registration_port):
         try:
             sock.settimeout(args.base_timeout)
             sock.connect((gateway_ip, registration_port))
-            sock.send(join_request.SerializeToString())
             join_reply = JoinReply()
-            join_reply.ParseFromString(sock.recv(1024))
+            # Gateways antigos esperam a requisição sem prefixo de tamanho
+            if framed:
+                send_frame(sock, join_request.SerializeToString())
+                join_reply.ParseFromString(recv_frame(sock))
+            else:
+                sock.send(join_request.SerializeToString())
+                join_reply.ParseFromString(sock.recv(1024))
         except Exception:
             args.gateway_ip = None
+            args.device_handle = 0
             return False
     args.gateway_ip = gateway_ip
+    args.device_handle = join_reply.device_handle
     return True
 
 
@@ -144,6 +161,25 @@ def get_reading(args):
     return temp
 
 
+def encode_readings(readings):
+    # Uma leitura isolada é publicada como SensorReading, compatível com
+    # Gateways antigos; mais de uma, como SensorReadingBatch
+    if len(readings) == 1:
+        return readings[0].SerializeToString(), None
+    batch = SensorReadingBatch(readings=readings)
+    properties = pika.BasicProperties(type='SensorReadingBatch')
+    return batch.SerializeToString(), properties
+
+
+def batch_is_ready(args, pending, batch_start):
+    # Sem um handle atribuído, o Gateway pode não conhecer SensorReadingBatch
+    if not args.device_handle or len(pending) >= args.batch_size:
+        return True
+    if args.batch_interval <= 0:
+        return False
+    return time.monotonic() - batch_start >= args.batch_interval
+
+
 def readings_publisher(args):
     logger = logging.getLogger('READINGS_PUBLISHER')
     while not args.stop_flag.is_set():
@@ -176,21 +212,40 @@ def readings_publisher(args):
                     exchange_type='fanout',
                 )
                 fail_count = 0
+                pending = []
+                batch_start = time.monotonic()
                 while (
                     not args.stop_flag.is_set()
                     and not args.disconnect_flag.is_set()
                 ):
+                    timestamp_us = time.time_ns() // 1000
                     reading = SensorReading(
-                        device_name=args.name,
                         reading_value=get_reading(args),
-                        timestamp=datetime.datetime.now(datetime.UTC).isoformat(),
+                        timestamp_us=timestamp_us,
                     )
-                    reading = reading.SerializeToString()
+                    # Com um handle atribuído o Gateway é recente: nome e
+                    # timestamp em ISO 8601 são dispensados
+                    if args.device_handle:
+                        reading.device_handle = args.device_handle
+                    else:
+                        reading.device_name = args.name
+                        reading.timestamp = datetime.datetime.fromtimestamp(
+                            timestamp_us // 1_000_000,
+                            datetime.UTC,
+                        ).replace(microsecond=timestamp_us % 1_000_000).isoformat()
+                    pending.append(reading)
+                    if not batch_is_ready(args, pending, batch_start):
+                        time.sleep(args.report_interval)
+                        continue
+                    body, properties = encode_readings(pending)
+                    pending = []
+                    batch_start = time.monotonic()
                     try:
                         channel.basic_publish(
                             exchange=publish_exchange,
                             routing_key='',
-                            body=reading,
+                            body=body,
+                            properties=properties,
                         )
                         fail_count = 0
                         max_num_fails = 3
@@ -284,6 +339,16 @@ def main():
         help='Intervalo entre o envio de leituras.'
     )
 
+    parser.add_argument(
+        '--batch_size', type=int, default=1,
+        help='Número de leituras publicadas em uma única mensagem.'
+    )
+
+    parser.add_argument(
+        '--batch_interval', type=float, default=0.0,
+        help='Tempo máximo de espera por um lote completo (0 para não limitar).'
+    )
+
     parser.add_argument(
         '--temperature', type=float, default=25.0,
         help='Temperatura inicial do sensor em °C.'
@@ -327,7 +392,8 @@ def main():
     )
 
     # Device name
-    args.name = f'temperature-{args.id}'
+    args.category = 'temperature'
+    args.name = f'{args.category}-{args.id}'
 
     # Timeouts
     args.base_timeout = 2.0
@@ -338,6 +404,7 @@ def main():
 
     # Gateway IP
     args.gateway_ip = None
+    args.device_handle = 0
 
     # Broker
     args.broker_lock = threading.Lock()
@@ -352,6 +419,8 @@ def main():
         'UnitSymbol': '°C',
         'Location': {'Latitude': -3.733486, 'Longitude': -38.570860},
     }
+    args.metadata_struct = Struct()
+    args.metadata_struct.update(args.metadata)
 
     # Stop flag for clean termination
     args.stop_flag = threading.Event()
@@ -1,9 +1,18 @@
-import json
+import time
 import socket
 import logging
 import datetime
+import selectors
+from db.handles import message_device_key
 from db.repositories import get_actuators_repository
-from concurrent.futures import ThreadPoolExecutor
+from db.writer import completed
+from liveness import ACTUATORS_LIVENESS
+from connection_pool import ACTUATORS_POOL
+from circuit_breaker import ACTUATOR_BREAKERS
+from command_queue import ActuatorCommandQueues
+from google.protobuf.message import DecodeError
+from framing import FrameReader
+from payloads import read_payload
 from messages_pb2 import ActuatorUpdate
 from messages_pb2 import CommandType, ActuatorCommand, ActuatorComply
 
@@ -19,7 +28,17 @@ def build_command_message(type, body):
     return msg.SerializeToString()
 
 
-def send_actuator_command(
+def exchange_once(address, command):
+    # Atuadores sem suporte a comandos com prefixo de tamanho recebem um
+    # único comando por conexão
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(1.0)
+        sock.connect(address)
+        sock.send(command)
+        return sock.recv(1024)
+
+
+def deliver_actuator_command(
     actuator_id,
     actuator_category,
     command_type,
@@ -29,22 +48,29 @@ def send_actuator_command(
     command = build_command_message(command_type, command_body)
     if command is None:
         return None
-    actuator = actuators_repository.get_actuator(actuator_id, actuator_category)
-    if actuator is None:
+    address = actuators_repository.get_actuator_address(actuator_id, actuator_category)
+    if address is None:
         return None
-    address = (actuator.ip_address, actuator.communication_port)
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        sock.settimeout(1.0)
-        try:
-            sock.connect(address)
-            sock.send(command)
-            msg = sock.recv(1024)
-        except OSError:
-            return None
-    reply = ActuatorComply()
-    reply.ParseFromString(msg)
-    state = json.loads(reply.update.state)
-    metadata = json.loads(reply.update.metadata)
+    key = (actuator_id, actuator_category)
+    if not ACTUATOR_BREAKERS.allow(key):
+        return None
+    try:
+        if actuators_repository.has_framed_commands(actuator_id, actuator_category):
+            msg = ACTUATORS_POOL.request(address, command)
+        else:
+            msg = exchange_once(address, command)
+        reply = ActuatorComply()
+        reply.ParseFromString(msg)
+    except (OSError, EOFError, DecodeError):
+        ACTUATOR_BREAKERS.record_failure(key)
+        return None
+    except Exception:
+        ACTUATOR_BREAKERS.record_failure(key)
+        raise
+    ACTUATOR_BREAKERS.record_success(key)
+    ACTUATORS_LIVENESS.mark_seen((actuator_id, actuator_category))
+    state, encoded_state = read_payload(reply.update, 'state')
+    metadata, encoded_metadata = read_payload(reply.update, 'metadata')
     timestamp = datetime.datetime.fromisoformat(reply.update.timestamp)
     actuators_repository.register_actuator_update(
         actuator_id=actuator_id,
@@ -52,97 +78,267 @@ def send_actuator_command(
         device_state=state,
         device_metadata=metadata,
         timestamp=timestamp,
-    )
+        encoded_state=encoded_state,
+        encoded_metadata=encoded_metadata,
+        metadata_hash=reply.update.metadata_hash,
+        state_seq=reply.update.state_seq,
+    ).result()
     return reply
 
 
-def actuator_handler(sock, address):
-    try:
-        logger = logging.getLogger(f'ACTUATOR_HANLDER_{address}')
-        msg = sock.recv(1024)
-        update = ActuatorUpdate()
-        update.ParseFromString(msg)
-    except Exception as e:
-        logger.error(
-            'Erro durante o recebimento de uma atualização: (%s) %s',
-            type(e).__name__,
-            e,
-        )
-        raise e
-    finally:
+COMMAND_QUEUES = ActuatorCommandQueues(deliver_actuator_command)
+
+
+def submit_actuator_command(
+    actuator_id,
+    actuator_category,
+    command_type,
+    command_body,
+):
+    if command_type not in (
+        CommandType.CT_ACTION,
+        CommandType.CT_GET_STATE,
+        CommandType.CT_SET_STATE,
+    ):
+        return completed(None)
+    # Atuadores com o circuito aberto falham imediatamente, sem ocupar a fila
+    if not ACTUATOR_BREAKERS.available((actuator_id, actuator_category)):
+        return completed(None)
+    return COMMAND_QUEUES.submit(
+        actuator_id,
+        actuator_category,
+        command_type,
+        command_body,
+    )
+
+
+def send_actuator_command(
+    actuator_id,
+    actuator_category,
+    command_type,
+    command_body,
+):
+    return submit_actuator_command(
+        actuator_id,
+        actuator_category,
+        command_type,
+        command_body,
+    ).result()
+
+
+def request_full_state(actuator_id, actuator_category, logger):
+    def on_registered(future):
         try:
-            sock.shutdown(socket.SHUT_RDWR)
-        except OSError:
+            applied = future.result()
+        except Exception as e:
             logger.error(
-                'Erro ao tentar enviar FIN para %s',
-                address,
+                'Erro ao registrar atualização do atuador %s-%d: (%s) %s',
+                actuator_category,
+                actuator_id,
+                type(e).__name__,
+                e,
             )
-        finally:
-            sock.close()
-    actuator_category, actuator_id = update.device_name.split('-')
-    actuator_id = int(actuator_id)
+            return
+        if applied:
+            return
+        logger.info(
+            'Lacuna na sequência de estados do atuador %s-%d. '
+            'Solicitando estado completo',
+            actuator_category,
+            actuator_id,
+        )
+        submit_actuator_command(
+            actuator_id,
+            actuator_category,
+            CommandType.CT_GET_STATE,
+            '',
+        )
+    return on_registered
+
+
+def process_actuator_update(update, address, logger):
+    try:
+        actuator_id, actuator_category = message_device_key(update)
+    except ValueError as e:
+        logger.warning(
+            'Atualização de um atuador não identificado localizado em %s: %s',
+            address[0],
+            e,
+        )
+        return
     actuators_repository = get_actuators_repository()
-    actuator = actuators_repository.get_actuator(actuator_id, actuator_category)
-    if actuator is None:
+    if not actuators_repository.has_actuator(actuator_id, actuator_category):
         logger.warning(
             'Recebendo atualizações de um atuador '
             'não registrado localizado em %s',
             address[0],
         )
         return
+    ACTUATORS_LIVENESS.mark_seen((actuator_id, actuator_category))
     logger.debug(
-        'Atuador %s enviou uma atualização: (%s, %s)',
-        update.device_name,
+        'Atuador %s-%d enviou uma atualização: %s',
+        actuator_category,
+        actuator_id,
         update.timestamp,
-        update.device_name,
     )
-    state = json.loads(update.state)
-    metadata = json.loads(update.metadata)
+    state, encoded_state = read_payload(update, 'state')
+    metadata, encoded_metadata = read_payload(update, 'metadata')
     timestamp = datetime.datetime.fromisoformat(update.timestamp)
+    # Não aguarda a gravação: o laço de leitura atende os demais atuadores
     actuators_repository.register_actuator_update(
         actuator_id=actuator_id,
         actuator_category=actuator_category,
         device_state=state,
         device_metadata=metadata,
         timestamp=timestamp,
-    )
+        encoded_state=encoded_state,
+        encoded_metadata=encoded_metadata,
+        metadata_hash=update.metadata_hash,
+        state_seq=update.state_seq,
+        state_delta=update.state_delta,
+        base_seq=update.base_seq,
+    ).add_done_callback(request_full_state(actuator_id, actuator_category, logger))
+
+
+def parse_update(msg):
+    update = ActuatorUpdate()
+    update.ParseFromString(msg)
+    return update
+
+
+class UpdateStream:
+    # Conexão de um atuador com o Gateway. Atuadores antigos enviam uma única
+    # ActuatorUpdate sem prefixo de tamanho e encerram a conexão
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.reader = FrameReader()
+        self.legacy = None
+        self.last_activity = time.monotonic()
 
+    def read_updates(self):
+        self.reader.read(self.sock)
+        self.last_activity = time.monotonic()
+        if self.legacy is None:
+            # Frames começam com o byte mais significativo do tamanho (0)
+            self.legacy = self.reader.pending()[:1] != b'\x00'
+        if self.legacy:
+            # Sem prefixo de tamanho, o limite vale para todo o acumulado
+            if self.reader.pending_size() > self.reader.max_frame_size:
+                raise ValueError(
+                    f'Unframed update exceeds {self.reader.max_frame_size} bytes'
+                )
+            return []
+        return [parse_update(frame) for frame in self.reader.frames()]
+
+    def legacy_update(self):
+        if not self.legacy:
+            return None
+        return parse_update(self.reader.pending())
+
+
+def close_stream(selector, stream, logger):
+    selector.unregister(stream.sock)
+    try:
+        stream.sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        logger.debug('Erro ao tentar enviar FIN para %s', stream.address)
+    finally:
+        stream.sock.close()
+
+
+def accept_streams(selector, sock, logger):
+    while True:
+        try:
+            conn, addrs = sock.accept()
+        except BlockingIOError:
+            return
+        except OSError as e:
+            logger.error(
+                'Erro ao tentar conexão com um atuador: (%s) %s',
+                type(e).__name__,
+                e,
+            )
+            return
+        conn.setblocking(False)
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        selector.register(conn, selectors.EVENT_READ, UpdateStream(conn, addrs))
 
-def actuators_listener(stop_flag, actuators_port):
+
+def read_stream(selector, stream, logger):
+    try:
+        updates = stream.read_updates()
+    except BlockingIOError:
+        return
+    except EOFError:
+        try:
+            update = stream.legacy_update()
+        except DecodeError as e:
+            logger.error(
+                'Erro durante o recebimento de uma atualização de %s: (%s) %s',
+                stream.address,
+                type(e).__name__,
+                e,
+            )
+            update = None
+        close_stream(selector, stream, logger)
+        updates = [] if update is None else [update]
+    except (OSError, ValueError, DecodeError) as e:
+        logger.error(
+            'Erro durante o recebimento de atualizações de %s: (%s) %s',
+            stream.address,
+            type(e).__name__,
+            e,
+        )
+        close_stream(selector, stream, logger)
+        return
+    for update in updates:
+        try:
+            process_actuator_update(update, stream.address, logger)
+        except Exception as e:
+            logger.error(
+                'Erro ao processar atualização de %s: (%s) %s',
+                stream.address,
+                type(e).__name__,
+                e,
+            )
+
+
+def actuators_listener(stop_flag, actuators_port, stream_idle_timeout=60.0):
+    # Um único laço atende as conexões persistentes de todos os atuadores
     logger = logging.getLogger('ACTUATORS_LISTENER')
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+    with (
+        socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock,
+        selectors.DefaultSelector() as selector,
+    ):
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         sock.bind(('', actuators_port))
-        sock.listen()
+        sock.listen(socket.SOMAXCONN)
+        sock.setblocking(False)
         logger.info(
             'Escutando por atualizações dos atuadores na porta %d',
             actuators_port,
         )
-        sock.settimeout(1.0)
-        with ThreadPoolExecutor(max_workers=5) as executor:
+        selector.register(sock, selectors.EVENT_READ)
+        last_sweep = time.monotonic()
+        try:
             while not stop_flag.is_set():
-                try:
-                    conn, addrs = sock.accept()
-                except TimeoutError:
+                for key, _ in selector.select(timeout=1.0):
+                    if key.fileobj is sock:
+                        accept_streams(selector, sock, logger)
+                    else:
+                        read_stream(selector, key.data, logger)
+                now = time.monotonic()
+                if now - last_sweep < 1.0:
                     continue
-                except Exception as e:
-                    logger.error(
-                        'Erro ao tentar conexão com um atuador: (%s) %s',
-                        type(e).__name__,
-                        e,
-                    )
-                    continue
-                try:
-                    conn.settimeout(sock.gettimeout())
-                    executor.submit(actuator_handler, conn, addrs)
-                except Exception:
-                    try:
-                        conn.shutdown(socket.SHUT_RDWR)
-                    except OSError:
-                        logger.error(
-                            'Erro ao tentar enviar FIN para %s',
-                            addrs,
-                        )
-                    finally:
-                        conn.close()
-                    raise
+                last_sweep = now
+                # Conexões sem atividade (atuador encerrado sem FIN)
+                for key in list(selector.get_map().values()):
+                    stream = key.data
+                    if stream is not None and now - stream.last_activity > stream_idle_timeout:
+                        logger.info('Encerrando conexão ociosa de %s', stream.address)
+                        close_stream(selector, stream, logger)
+        finally:
+            for key in list(selector.get_map().values()):
+                if key.data is not None:
+                    close_stream(selector, key.data, logger)
@@ -1,12 +1,19 @@
 import json
+import datetime
 import threading
-from flask import Flask, request
+from flask import Flask, request, current_app
 from flask_restful import Api, Resource, abort
 from flask_cors import CORS
 from werkzeug.serving import make_server
-from actuators_handler import send_actuator_command
+from actuators_handler import send_actuator_command, COMMAND_QUEUES
+from circuit_breaker import ACTUATOR_BREAKERS
+from command_dispatcher import COMMAND_DISPATCHER
+from db.models import MICROSECOND, utc_now, to_micros, from_micros
+from db.rollups import ROLLUP_RESOLUTIONS, choose_resolution
 from db.repositories import get_sensors_repository, get_actuators_repository
-from messages_pb2 import CommandType, ComplyStatus
+from liveness import SENSORS_LIVENESS, ACTUATORS_LIVENESS
+from payloads import payload_dict, read_payload
+from messages_pb2 import CommandType, ComplyStatus, ReplyStatus
 
 
 app = Flask(__name__)
@@ -14,10 +21,6 @@ CORS(app)  # Enable CORS for all routes
 api = Api(app)
 
 
-sensors_repository = get_sensors_repository()
-actuators_repository = get_actuators_repository()
-
-
 class ApiServerThread(threading.Thread):
     def __init__(self, stop_flag, host_ip, port, app):
         threading.Thread.__init__(self)
@@ -39,22 +42,18 @@ class ApiServerThread(threading.Thread):
 class Sensors(Resource):
 
     def get(self):
-        sensors = sensors_repository.get_all_sensors()
+        format_timestamp = timestamp_formatter()
         response = []
-        for sensor in sensors:
-            last_reading = sensors_repository.get_sensor_last_reading(
-                sensor.id,
-                sensor.category,
-            )
+        for sensor, last_reading in get_sensors_repository().get_sensors_with_last_reading():
             response.append({
                 'deviceId': sensor.id,
                 'deviceCategory': sensor.category,
-                'isOnline': sensor.is_online(),
+                'isOnline': SENSORS_LIVENESS.is_online((sensor.id, sensor.category)),
                 'lastReading': dict() if last_reading is None else {
-                    'timestamp': last_reading.timestamp.isoformat(),
+                    'timestamp': format_timestamp(last_reading.timestamp),
                     'value': last_reading.value,
                 },
-                'metadata': sensor.device_metadata,
+                'metadata': payload_dict(sensor.device_metadata, sensor.encoded_metadata),
             })
         return response
 
@@ -62,50 +61,186 @@ class Sensors(Resource):
 class SensorsByCategory(Resource):
 
     def get(self, sensors_category: str):
-        sensors = sensors_repository.get_sensors_by_category(sensors_category)
+        format_timestamp = timestamp_formatter()
         response = []
-        for sensor in sensors:
-            last_reading = sensors_repository.get_sensor_last_reading(
-                sensor.id,
-                sensor.category,
-            )
+        for sensor, last_reading in get_sensors_repository().get_sensors_with_last_reading(
+            sensors_category,
+        ):
             response.append({
                 'deviceId': sensor.id,
                 'deviceCategory': sensor.category,
-                'isOnline': sensor.is_online(),
+                'isOnline': SENSORS_LIVENESS.is_online((sensor.id, sensor.category)),
                 'lastReading': dict() if last_reading is None else {
-                    'timestamp': last_reading.timestamp.isoformat(),
+                    'timestamp': format_timestamp(last_reading.timestamp),
                     'value': last_reading.value,
                 },
-                'metadata': sensor.device_metadata,
+                'metadata': payload_dict(sensor.device_metadata, sensor.encoded_metadata),
             })
         return response
 
 
+MAX_PAGE_SIZE = 1000
+
+DEFAULT_POINTS = 100
+
+
+def parse_timestamp_arg(name):
+    # ISO 8601 ou microssegundos desde a época Unix
+    value = request.args.get(name)
+    if value is None:
+        return None
+    if value.lstrip('-').isdigit():
+        return int(value)
+    try:
+        timestamp = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, message=f'Invalid "{name}" timestamp')
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.UTC)
+    return to_micros(timestamp)
+
+
+def format_iso(timestamp):
+    return from_micros(timestamp).isoformat()
+
+
+def format_micros(timestamp):
+    return timestamp
+
+
+def timestamp_formatter():
+    # Os timestamps só são formatados aqui, e apenas se solicitado
+    timestamps = request.args.get('timestamps', 'iso')
+    if timestamps == 'iso':
+        return format_iso
+    if timestamps == 'micros':
+        return format_micros
+    abort(400, message=f'Unknown timestamps format "{timestamps}"')
+
+
+def encode_cursor(cursor):
+    if cursor is None:
+        return None
+    timestamp, reading_id = cursor
+    return f'{timestamp}.{reading_id}'
+
+
+def decode_cursor(value):
+    if value is None:
+        return None
+    try:
+        timestamp, reading_id = value.split('.')
+        return int(timestamp), int(reading_id)
+    except ValueError:
+        abort(400, message='Invalid cursor')
+
+
 class Sensor(Resource):
 
     def get(self, sensor_category: str, sensor_id: int):
+        sensors_repository = get_sensors_repository()
         sensor = sensors_repository.get_sensor(sensor_id, sensor_category)
         if sensor is None:
             abort(404, message=f'Sensor {sensor_category}-{sensor_id} not found')
-        readings = [
-            {
-                'timestamp': reading.timestamp.isoformat(),
-                'value': reading.value,
-            }
-            for reading in sensors_repository.get_sensor_readings(
+        since = parse_timestamp_arg('since')
+        until = parse_timestamp_arg('until')
+        cursor = decode_cursor(request.args.get('cursor'))
+        format_timestamp = timestamp_formatter()
+        resolution = request.args.get('resolution', 'auto')
+        if resolution == 'auto':
+            points = request.args.get('points', DEFAULT_POINTS, type=int)
+            if points < 1:
+                abort(400, message='points must be at least 1')
+            resolution = 'raw'
+            if since is not None:
+                resolution = choose_resolution(
+                    ((until or to_micros(utc_now())) - since) * MICROSECOND,
+                    points,
+                )
+        elif resolution != 'raw' and resolution not in ROLLUP_RESOLUTIONS:
+            abort(400, message=f'Unknown resolution "{resolution}"')
+        if resolution == 'raw':
+            limit = request.args.get('limit', 100, type=int)
+            readings, next_cursor = sensors_repository.get_sensor_readings_page(
                 sensor.id,
                 sensor.category,
-                limit=100,
+                after=since,
+                before=until,
+                cursor=cursor,
+                limit=min(max(limit, 1), MAX_PAGE_SIZE),
             )
-        ]
+            readings = [
+                {
+                    'timestamp': format_timestamp(reading.timestamp),
+                    'value': reading.value,
+                }
+                for reading in readings
+            ]
+        else:
+            limit = request.args.get('limit', MAX_PAGE_SIZE, type=int)
+            rollups, next_bucket = sensors_repository.get_sensor_rollups_page(
+                sensor.id,
+                sensor.category,
+                resolution,
+                after=since,
+                before=until,
+                cursor=None if cursor is None else cursor[0],
+                limit=min(max(limit, 1), MAX_PAGE_SIZE),
+            )
+            readings = [
+                {
+                    'timestamp': format_timestamp(rollup.bucket),
+                    'value': rollup.avg_value,
+                    'min': rollup.min_value,
+                    'max': rollup.max_value,
+                    'count': rollup.count,
+                    'last': rollup.last_value,
+                }
+                for rollup in rollups
+            ]
+            next_cursor = None if next_bucket is None else (next_bucket, 0)
+        last_reading = sensors_repository.get_sensor_last_reading(
+            sensor.id,
+            sensor.category,
+        )
         return {
             'deviceId': sensor.id,
             'deviceCategory': sensor.category,
-            'isOnline': sensor.is_online(),
+            'isOnline': SENSORS_LIVENESS.is_online((sensor.id, sensor.category)),
+            'resolution': resolution,
             'readings': readings,
-            'lastReading': readings[-1] if readings else {},
-            'metadata': sensor.device_metadata,
+            'nextCursor': encode_cursor(next_cursor),
+            'lastReading': dict() if last_reading is None else {
+                'timestamp': format_timestamp(last_reading.timestamp),
+                'value': last_reading.value,
+            },
+            'metadata': payload_dict(sensor.device_metadata, sensor.encoded_metadata),
+        }
+
+
+class SensorSummary(Resource):
+
+    def get(self, sensor_category: str, sensor_id: int):
+        since = parse_timestamp_arg('since')
+        until = parse_timestamp_arg('until')
+        format_timestamp = timestamp_formatter()
+        summary = get_sensors_repository().get_sensor_summary(
+            sensor_id,
+            sensor_category,
+            after=since,
+            before=until,
+        )
+        if summary is None:
+            abort(404, message=f'Sensor {sensor_category}-{sensor_id} not found')
+        return {
+            'deviceId': sensor_id,
+            'deviceCategory': sensor_category,
+            'since': None if since is None else format_timestamp(since),
+            'until': None if until is None else format_timestamp(until),
+            'count': summary.count,
+            'min': summary.min_value,
+            'max': summary.max_value,
+            'mean': summary.mean_value,
         }
 
 
@@ -116,15 +251,45 @@ class Actuators(Resource):
             {
                 'deviceId': actuator.id,
                 'deviceCategory': actuator.category,
-                'isOnline': actuator.is_online(),
+                'isOnline': ACTUATORS_LIVENESS.is_online((actuator.id, actuator.category)),
                 'lastUpdate': actuator.timestamp.isoformat(),
-                'currentState': actuator.device_state,
-                'metadata': actuator.device_metadata,
+                'currentState': payload_dict(actuator.device_state, actuator.encoded_state),
+                'metadata': payload_dict(actuator.device_metadata, actuator.encoded_metadata),
             }
-            for actuator in actuators_repository.get_all_actuators()
+            for actuator in get_actuators_repository().get_all_actuators()
         ]
 
 
+def parse_group_args():
+    ids = request.args.get('ids')
+    deadline = request.args.get('deadline')
+    try:
+        ids = [int(actuator_id) for actuator_id in ids.split(',')] if ids else None
+    except ValueError:
+        abort(400, message='Invalid "ids" list')
+    try:
+        deadline = float(deadline) if deadline else None
+    except ValueError:
+        abort(400, message='Invalid "deadline"')
+    return ids, deadline
+
+
+def group_command_response(actuators_category, results):
+    if not results:
+        abort(404, message=f'No actuators found in category "{actuators_category}"')
+    response = []
+    for result in results:
+        entry = {
+            'deviceId': result.actuator_id,
+            'deviceCategory': result.actuator_category,
+            'status': ReplyStatus.Name(result.status).removeprefix('RS_'),
+        }
+        if result.update is not None:
+            entry['currentState'] = payload_dict(*read_payload(result.update, 'state'))
+        response.append(entry)
+    return response, 200
+
+
 class ActuatorsByCategory(Resource):
 
     def get(self, actuators_category: str):
@@ -132,28 +297,59 @@ class ActuatorsByCategory(Resource):
             {
                 'deviceId': actuator.id,
                 'deviceCategory': actuator.category,
-                'isOnline': actuator.is_online(),
+                'isOnline': ACTUATORS_LIVENESS.is_online((actuator.id, actuator.category)),
                 'lastUpdate': actuator.timestamp.isoformat(),
-                'currentState': actuator.device_state,
-                'metadata': actuator.device_metadata,
+                'currentState': payload_dict(actuator.device_state, actuator.encoded_state),
+                'metadata': payload_dict(actuator.device_metadata, actuator.encoded_metadata),
             }
-            for actuator in actuators_repository.get_actuators_by_category(actuators_category)
+            for actuator in get_actuators_repository().get_actuators_by_category(actuators_category)
         ]
 
+    def put(self, actuators_category: str):
+        ids, deadline = parse_group_args()
+        results = COMMAND_DISPATCHER.dispatch(
+            actuator_category=actuators_category,
+            command_type=CommandType.CT_SET_STATE,
+            command_body=json.dumps(request.get_json()),
+            actuator_ids=ids,
+            deadline=deadline,
+        )
+        return group_command_response(actuators_category, results)
+
+    def post(self, actuators_category: str):
+        data = request.get_json()
+        if 'action' not in data:
+            abort(400, message='No "action" was specified')
+        ids, deadline = parse_group_args()
+        results = COMMAND_DISPATCHER.dispatch(
+            actuator_category=actuators_category,
+            command_type=CommandType.CT_ACTION,
+            command_body=data['action'],
+            actuator_ids=ids,
+            deadline=deadline,
+        )
+        return group_command_response(actuators_category, results)
+
+
+def abort_unavailable(actuator_category, actuator_id):
+    if not get_actuators_repository().has_actuator(actuator_id, actuator_category):
+        abort(404, message=f'Actuator {actuator_category}-{actuator_id} not found')
+    abort(503, message=f'Actuator {actuator_category}-{actuator_id} unavailable')
+
 
 class Actuator(Resource):
 
     def get(self, actuator_category: str, actuator_id: int):
-        actuator = actuators_repository.get_actuator(actuator_id, actuator_category)
+        actuator = get_actuators_repository().get_actuator(actuator_id, actuator_category)
         if actuator is None:
             abort(404, message=f'Actuator {actuator_category}-{actuator_id} not found')
         return {
             'deviceId': actuator.id,
             'deviceCategory': actuator.category,
-            'isOnline': actuator.is_online(),
+            'isOnline': ACTUATORS_LIVENESS.is_online((actuator.id, actuator.category)),
             'lastUpdate': actuator.timestamp.isoformat(),
-            'currentState': actuator.device_state,
-            'metadata': actuator.device_metadata,
+            'currentState': payload_dict(actuator.device_state, actuator.encoded_state),
+            'metadata': payload_dict(actuator.device_metadata, actuator.encoded_metadata),
         }
 
     def put(self, actuator_category: str, actuator_id: int):
@@ -165,7 +361,7 @@ class Actuator(Resource):
             command_body=json.dumps(data),
         )
         if response is None:
-            abort(404, message=f'Actuator {actuator_category}-{actuator_id} not found')
+            abort_unavailable(actuator_category, actuator_id)
         if response.status is ComplyStatus.CS_INVALID_STATE:
             abort(400, message='Invalid state supplied')
         if response.status is not ComplyStatus.CS_OK:
@@ -183,7 +379,7 @@ class Actuator(Resource):
             command_body=data['action'],
         )
         if response is None:
-            abort(404, message=f'Actuator {actuator_category}-{actuator_id} not found')
+            abort_unavailable(actuator_category, actuator_id)
         if response.status is ComplyStatus.CS_UNKNOWN_ACTION:
             abort(400, message=f'Unknown action "{data['action']}"')
         if response.status is not ComplyStatus.CS_OK:
@@ -191,12 +387,35 @@ class Actuator(Resource):
         return {"message": "OK"}, 200
 
 
+class ReadingsStats(Resource):
+
+    def get(self):
+        readings_buffer = current_app.config.get('READINGS_BUFFER')
+        if readings_buffer is None:
+            abort(404, message='Readings buffer not available')
+        return readings_buffer.stats()
+
+
+class CommandsStats(Resource):
+
+    def get(self):
+        return {**COMMAND_QUEUES.stats(), **ACTUATOR_BREAKERS.stats()}
+
+
 # Sensors
 api.add_resource(Sensors, '/sensors')
 api.add_resource(SensorsByCategory, '/sensors/<string:sensors_category>')
 api.add_resource(Sensor, '/sensors/<string:sensor_category>/<int:sensor_id>')
+api.add_resource(
+    SensorSummary,
+    '/sensors/<string:sensor_category>/<int:sensor_id>/summary',
+)
 
 # Actuators
 api.add_resource(Actuators, '/actuators')
 api.add_resource(ActuatorsByCategory, '/actuators/<string:actuators_category>')
 api.add_resource(Actuator, '/actuators/<string:actuator_category>/<int:actuator_id>')
+
+# Stats
+api.add_resource(ReadingsStats, '/stats/readings')
+api.add_resource(CommandsStats, '/stats/commands')
@@ -0,0 +1,140 @@
+import time
+import threading
+import random
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from sqlalchemy.orm import sessionmaker
+from db.models import Base
+from db.sessions import create_write_engine, create_read_engine
+from db.writer import DatabaseWriter
+from db.registry import DeviceRegistry
+from db.partitions import PartitionManager
+from db.archive import ArchiveStore
+from db.repositories import STORAGE_BACKENDS
+from db.sql import SQLSensorRepository
+from db.memory import MemoryStore, MemorySensorRepository
+
+
+@contextmanager
+def open_repository(backend):
+    if backend == 'memory':
+        yield MemorySensorRepository(MemoryStore())
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = Path(tmp_dir) / 'bench.db'
+        engine = create_write_engine(db_file)
+        read_engine = create_read_engine(db_file)
+        Base.metadata.create_all(engine)
+        writer = DatabaseWriter(sessionmaker(engine, expire_on_commit=False))
+        stop_flag = threading.Event()
+        writer_thread = threading.Thread(target=writer.run, args=(stop_flag,))
+        writer_thread.start()
+        try:
+            yield SQLSensorRepository(
+                sessionmaker(read_engine),
+                writer,
+                DeviceRegistry(),
+                PartitionManager(),
+                ArchiveStore(Path(tmp_dir) / 'archive'),
+            )
+        finally:
+            stop_flag.set()
+            writer_thread.join()
+            read_engine.dispose()
+            engine.dispose()
+
+
+def populate(repository, num_sensors, readings_per_sensor):
+    now = time.time_ns() // 1000
+    futures = [
+        repository.add_sensor(sensor_id, 'temperature', '127.0.0.1', {}, 6.0)
+        for sensor_id in range(num_sensors)
+    ]
+    for future in futures:
+        future.result()
+    for offset in range(readings_per_sensor):
+        repository.register_sensor_readings([
+            (
+                sensor_id,
+                'temperature',
+                random.uniform(20.0, 40.0),
+                now - 5_000_000 * offset,
+            )
+            for sensor_id in range(num_sensors)
+        ]).result()
+    return
+
+
+def report_n_plus_one(repository):
+    return [
+        (sensor, repository.get_sensor_last_reading(sensor.id, sensor.category))
+        for sensor in repository.get_all_sensors()
+    ]
+
+
+def report_set_based(repository):
+    return repository.get_sensors_with_last_reading()
+
+
+def measure(func, repository, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(repository)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes, readings_per_sensor, repeat, backend):
+    print(
+        f'{"sensores":>10} {"ingestão (ms)":>14} {"N+1 (ms)":>12} '
+        f'{"set-based (ms)":>16} {"ganho":>8}'
+    )
+    for num_sensors in sizes:
+        with open_repository(backend) as repository:
+            start = time.perf_counter()
+            populate(repository, num_sensors, readings_per_sensor)
+            ingestion = time.perf_counter() - start
+            n_plus_one = measure(report_n_plus_one, repository, repeat)
+            set_based = measure(report_set_based, repository, repeat)
+        print(
+            f'{num_sensors:>10} {ingestion * 1000:>14.1f} {n_plus_one * 1000:>12.1f} '
+            f'{set_based * 1000:>16.1f} {n_plus_one / set_based:>7.1f}x'
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Latência do relatório de sensores em função do número de sensores.'
+    )
+
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[100, 500, 1000, 5000],
+        help='Quantidades de sensores a serem avaliadas.'
+    )
+
+    parser.add_argument(
+        '--readings', type=int, default=20,
+        help='Número de leituras armazenadas por sensor.'
+    )
+
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='Número de repetições de cada medição (o menor tempo é reportado).'
+    )
+
+    parser.add_argument(
+        '--backend', type=str, default='sqlite', choices=STORAGE_BACKENDS,
+        help='Backend de armazenamento avaliado.'
+    )
+
+    args = parser.parse_args()
+
+    return run(args.sizes, args.readings, args.repeat, args.backend)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import time
+import logging
+import threading
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class Circuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+
+class CircuitBreakers:
+    def __init__(self, failure_threshold=3, reset_timeout=5.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._circuits: dict[tuple[int, str], Circuit] = {}
+        self._rejected = 0
+
+    def configure(self, failure_threshold, reset_timeout):
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.reset_timeout = reset_timeout
+            self._circuits.clear()
+        return
+
+    def _open(self, key, circuit, reason):
+        logger = logging.getLogger('CIRCUIT_BREAKER')
+        if circuit.state != OPEN:
+            logger.warning(
+                'Comandos para o atuador %s-%d suspensos: %s',
+                key[1],
+                key[0],
+                reason,
+            )
+        circuit.state = OPEN
+        circuit.opened_at = self.clock()
+        circuit.probing = False
+        return
+
+    def _close(self, key, circuit):
+        logger = logging.getLogger('CIRCUIT_BREAKER')
+        if circuit.state != CLOSED:
+            logger.info('Comandos para o atuador %s-%d retomados', key[1], key[0])
+        circuit.state = CLOSED
+        circuit.failures = 0
+        circuit.probing = False
+        return
+
+    def available(self, key):
+        # Não altera o circuito: rejeita comandos enquanto aberto e ainda
+        # não é hora de uma nova tentativa
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None or circuit.state == CLOSED:
+                return True
+            if circuit.state == OPEN:
+                ready = self.clock() - circuit.opened_at >= self.reset_timeout
+            else:
+                ready = not circuit.probing
+            if not ready:
+                self._rejected += 1
+            return ready
+
+    def allow(self, key):
+        # Meio aberto, apenas um comando de teste é enviado por vez
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None or circuit.state == CLOSED:
+                return True
+            if circuit.state == OPEN:
+                if self.clock() - circuit.opened_at < self.reset_timeout:
+                    self._rejected += 1
+                    return False
+                circuit.state = HALF_OPEN
+            if circuit.probing:
+                self._rejected += 1
+                return False
+            circuit.probing = True
+            return True
+
+    def record_success(self, key):
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is not None:
+                self._close(key, circuit)
+        return
+
+    def record_failure(self, key):
+        with self._lock:
+            circuit = self._circuits.setdefault(key, Circuit())
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN:
+                self._open(key, circuit, 'falha na tentativa de reconexão')
+            elif circuit.failures >= self.failure_threshold:
+                self._open(key, circuit, f'{circuit.failures} falhas consecutivas')
+        return
+
+    def liveness_changed(self, key, online):
+        with self._lock:
+            circuit = self._circuits.setdefault(key, Circuit())
+            if online:
+                self._close(key, circuit)
+            else:
+                self._open(key, circuit, 'atuador offline')
+        return
+
+    def state(self, key):
+        with self._lock:
+            circuit = self._circuits.get(key)
+            return CLOSED if circuit is None else circuit.state
+
+    def stats(self):
+        with self._lock:
+            return {
+                'openCircuits': [
+                    f'{category}-{device_id}'
+                    for (device_id, category), circuit in self._circuits.items()
+                    if circuit.state != CLOSED
+                ],
+                'rejectedCommands': self._rejected,
+            }
+
+
+ACTUATOR_BREAKERS = CircuitBreakers()
@@ -1,95 +1,140 @@
-import json
 import socket
 import logging
-from struct import pack
 from actuators_handler import send_actuator_command
+from command_dispatcher import COMMAND_DISPATCHER
 from concurrent.futures import ThreadPoolExecutor
+from framing import is_framed, recv_frame, send_frame
+from db.handles import split_device_name
+from db.models import from_micros
 from db.repositories import get_sensors_repository, get_actuators_repository
+from liveness import SENSORS_LIVENESS, ACTUATORS_LIVENESS
+from payloads import serialize_with_payloads, serialize_repeated
+from payloads import legacy_payloads, has_payload, encode_field
 from messages_pb2 import SensorReading, SensorData
 from messages_pb2 import SensorsReport, ActuatorsReport
 from messages_pb2 import RequestType, ClientRequest
 from messages_pb2 import ReplyStatus, ClientReply
 from messages_pb2 import ActuatorUpdate, CommandType, ComplyStatus
+from messages_pb2 import DeviceId, GroupCommandResult, GroupCommandReport
 
 
-def get_sensors_report():
+def legacy_timestamp(micros):
+    # Clientes antigos leem apenas o timestamp em ISO 8601
+    return from_micros(micros).isoformat()
+
+
+def get_sensors_report(typed=False):
     sensors_repository = get_sensors_repository()
-    sensors = sensors_repository.get_all_sensors()
     sensors_summary = []
-    for sensor in sensors:
-        reading = sensors_repository.get_sensor_last_reading(sensor.id, sensor.category)
+    for sensor, reading in sensors_repository.get_sensors_with_last_reading():
         if reading is None:
             continue
-        sensors_summary.append(SensorReading(
+        summary = SensorReading(
             device_name=f'{sensor.category}-{sensor.id}',
+            device_id=DeviceId(category=sensor.category, id=sensor.id),
             reading_value=reading.value,
-            timestamp=reading.timestamp.isoformat(),
-            metadata=json.dumps(sensor.device_metadata),
-            is_online=sensor.is_online(),
+            timestamp_us=reading.timestamp,
+            is_online=SENSORS_LIVENESS.is_online((sensor.id, sensor.category)),
+        )
+        if not typed:
+            summary.timestamp = legacy_timestamp(reading.timestamp)
+        sensors_summary.append(serialize_with_payloads(
+            summary,
+            {'metadata': (sensor.device_metadata, sensor.encoded_metadata)},
+            typed,
         ))
-    return SensorsReport(devices=sensors_summary).SerializeToString()
+    return serialize_repeated(SensorsReport.DEVICES_FIELD_NUMBER, sensors_summary)
+
+
+def serialize_actuator_update(actuator, typed):
+    update = ActuatorUpdate(
+        device_name=f'{actuator.category}-{actuator.id}',
+        device_id=DeviceId(category=actuator.category, id=actuator.id),
+        timestamp=actuator.timestamp.isoformat(),
+        is_online=ACTUATORS_LIVENESS.is_online((actuator.id, actuator.category)),
+    )
+    return serialize_with_payloads(
+        update,
+        {
+            'state': (actuator.device_state, actuator.encoded_state),
+            'metadata': (actuator.device_metadata, actuator.encoded_metadata),
+        },
+        typed,
+    )
 
 
-def get_actuators_report():
+def get_actuators_report(typed=False):
     actuators_repository = get_actuators_repository()
     actuators_summary = [
-        ActuatorUpdate(
-            device_name=f'{actuator.category}-{actuator.id}',
-            state=json.dumps(actuator.device_state),
-            metadata=json.dumps(actuator.device_metadata),
-            timestamp=actuator.timestamp.isoformat(),
-            is_online=actuator.is_online(),
-        )
+        serialize_actuator_update(actuator, typed)
         for actuator in actuators_repository.get_all_actuators()
     ]
-    return ActuatorsReport(devices=actuators_summary).SerializeToString()
+    return serialize_repeated(ActuatorsReport.DEVICES_FIELD_NUMBER, actuators_summary)
 
 
-def get_sensor_data(device_name):
+def get_sensor_data(sensor_id, sensor_category, typed=False):
     sensors_repository = get_sensors_repository()
-    sensor_category, sensor_id = device_name.split('-')
-    sensor_id = int(sensor_id)
     sensor = sensors_repository.get_sensor(sensor_id, sensor_category)
     if sensor is None:
         return None
     readings = sensors_repository.get_sensor_readings(sensor.id, sensor.category)
     readings = [
         SensorData.SimpleReading(
-            timestamp=reading.timestamp.isoformat(),
+            timestamp_us=reading.timestamp,
             reading_value=reading.value,
         )
         for reading in readings
     ]
-    return SensorData(
-        device_name=device_name,
-        metadata=json.dumps(sensor.device_metadata),
+    if not typed:
+        for reading in readings:
+            reading.timestamp = legacy_timestamp(reading.timestamp_us)
+    data = SensorData(
+        device_name=f'{sensor.category}-{sensor.id}',
+        device_id=DeviceId(category=sensor.category, id=sensor.id),
         readings=readings,
-        is_online=sensor.is_online(),
+        is_online=SENSORS_LIVENESS.is_online((sensor.id, sensor.category)),
+    )
+    return serialize_with_payloads(
+        data,
+        {'metadata': (sensor.device_metadata, sensor.encoded_metadata)},
+        typed,
     )
 
 
-def get_actuator_update(device_name):
+def get_actuator_update(actuator_id, actuator_category, typed=False):
     actuators_repository = get_actuators_repository()
-    actuator_category, actuator_id = device_name.split('-')
-    actuator_id = int(actuator_id)
     actuator = actuators_repository.get_actuator(actuator_id, actuator_category)
     if actuator is None:
         return None
-    return ActuatorUpdate(
-        device_name=device_name,
-        state=json.dumps(actuator.device_state),
-        metadata=json.dumps(actuator.device_metadata),
-        timestamp=actuator.timestamp.isoformat(),
-        is_online=actuator.is_online(),
-    )
+    return serialize_actuator_update(actuator, typed)
 
 
-def process_set_actuator_state(device_name, state_string):
+def serialize_comply_update(actuator_id, actuator_category, update, typed):
+    update.is_online = True
+    if not typed:
+        legacy_payloads(update, ('state', 'metadata'))
+    if has_payload(update, 'metadata'):
+        return update.SerializeToString()
+    # Metadados inalterados são omitidos pelo atuador; usa os armazenados
     actuators_repository = get_actuators_repository()
-    actuator_category, actuator_id = device_name.split('-')
-    actuator_id = int(actuator_id)
     actuator = actuators_repository.get_actuator(actuator_id, actuator_category)
     if actuator is None:
+        return update.SerializeToString()
+    return serialize_with_payloads(
+        update,
+        {'metadata': (actuator.device_metadata, actuator.encoded_metadata)},
+        typed,
+    )
+
+
+def process_set_actuator_state(
+    actuator_id,
+    actuator_category,
+    state_string,
+    typed=False,
+):
+    actuators_repository = get_actuators_repository()
+    if not actuators_repository.has_actuator(actuator_id, actuator_category):
         return ClientReply(
             status=ReplyStatus.RS_UNKNOWN_DEVICE,
             reply_to=RequestType.RT_SET_ACTUATOR_STATE,
@@ -110,20 +155,26 @@ def process_set_actuator_state(device_name, state_string):
             status=ReplyStatus.RS_INVALID_STATE,
             reply_to=RequestType.RT_SET_ACTUATOR_STATE,
         )
-    comply_msg.update.is_online = True
     return ClientReply(
         status=ReplyStatus.RS_OK,
         reply_to=RequestType.RT_SET_ACTUATOR_STATE,
-        data=comply_msg.update.SerializeToString(),
+        data=serialize_comply_update(
+            actuator_id,
+            actuator_category,
+            comply_msg.update,
+            typed,
+        ),
     )
 
 
-def process_run_actuator_action(device_name, action_name):
+def process_run_actuator_action(
+    actuator_id,
+    actuator_category,
+    action_name,
+    typed=False,
+):
     actuators_repository = get_actuators_repository()
-    actuator_category, actuator_id = device_name.split('-')
-    actuator_id = int(actuator_id)
-    actuator = actuators_repository.get_actuator(actuator_id, actuator_category)
-    if actuator is None:
+    if not actuators_repository.has_actuator(actuator_id, actuator_category):
         return ClientReply(
             status=ReplyStatus.RS_UNKNOWN_DEVICE,
             reply_to=RequestType.RT_RUN_ACTUATOR_ACTION,
@@ -147,10 +198,65 @@ def process_run_actuator_action(device_name, action_name):
     return ClientReply(
         status=ReplyStatus.RS_OK,
         reply_to=RequestType.RT_RUN_ACTUATOR_ACTION,
-        data=comply_msg.update.SerializeToString(),
+        data=serialize_comply_update(
+            actuator_id,
+            actuator_category,
+            comply_msg.update,
+            typed,
+        ),
     )
 
 
+def serialize_group_result(result, typed):
+    entry = GroupCommandResult(
+        device_id=DeviceId(category=result.actuator_category, id=result.actuator_id),
+        status=result.status,
+    ).SerializeToString()
+    if result.update is None:
+        return entry
+    update = serialize_comply_update(
+        result.actuator_id,
+        result.actuator_category,
+        result.update,
+        typed,
+    )
+    return entry + encode_field(GroupCommandResult.UPDATE_FIELD_NUMBER, update)
+
+
+def process_group_command(request):
+    match request.type:
+        case RequestType.RT_SET_GROUP_STATE:
+            command_type = CommandType.CT_SET_STATE
+        case RequestType.RT_RUN_GROUP_ACTION:
+            command_type = CommandType.CT_ACTION
+    results = COMMAND_DISPATCHER.dispatch(
+        actuator_category=request.device_group.category,
+        command_type=command_type,
+        command_body=request.body,
+        actuator_ids=list(request.device_group.ids),
+        deadline=request.deadline_ms / 1000.0,
+    )
+    if not results:
+        return ClientReply(
+            status=ReplyStatus.RS_UNKNOWN_DEVICE,
+            reply_to=request.type,
+        )
+    return ClientReply(
+        status=ReplyStatus.RS_OK,
+        reply_to=request.type,
+        data=serialize_repeated(
+            GroupCommandReport.RESULTS_FIELD_NUMBER,
+            [serialize_group_result(result, request.typed_payloads) for result in results],
+        ),
+    )
+
+
+def request_device_key(request):
+    if request.HasField('device_id'):
+        return request.device_id.id, request.device_id.category
+    return split_device_name(request.device_name)
+
+
 def process_client_request(request):
     try:
         match request.type:
@@ -158,16 +264,19 @@ def process_client_request(request):
                 return ClientReply(
                     status=ReplyStatus.RS_OK,
                     reply_to=request.type,
-                    data=get_sensors_report(),
+                    data=get_sensors_report(request.typed_payloads),
                 )
             case RequestType.RT_GET_ACTUATORS_REPORT:
                 return ClientReply(
                     status=ReplyStatus.RS_OK,
                     reply_to=request.type,
-                    data=get_actuators_report(),
+                    data=get_actuators_report(request.typed_payloads),
                 )
             case RequestType.RT_GET_SENSOR_DATA:
-                data = get_sensor_data(request.device_name)
+                data = get_sensor_data(
+                    *request_device_key(request),
+                    typed=request.typed_payloads,
+                )
                 if data is None:
                     return ClientReply(
                         status=ReplyStatus.RS_UNKNOWN_DEVICE,
@@ -176,10 +285,13 @@ def process_client_request(request):
                 return ClientReply(
                     status=ReplyStatus.RS_OK,
                     reply_to=request.type,
-                    data=data.SerializeToString(),
+                    data=data,
                 )
             case RequestType.RT_GET_ACTUATOR_UPDATE:
-                update = get_actuator_update(request.device_name)
+                update = get_actuator_update(
+                    *request_device_key(request),
+                    typed=request.typed_payloads,
+                )
                 if update is None:
                     return ClientReply(
                         status=ReplyStatus.RS_UNKNOWN_DEVICE,
@@ -188,18 +300,26 @@ def process_client_request(request):
                 return ClientReply(
                     status=ReplyStatus.RS_OK,
                     reply_to=request.type,
-                    data=update.SerializeToString(),
+                    data=update,
                 )
             case RequestType.RT_SET_ACTUATOR_STATE:
+                actuator_id, actuator_category = request_device_key(request)
                 return process_set_actuator_state(
-                    device_name=request.device_name,
+                    actuator_id=actuator_id,
+                    actuator_category=actuator_category,
                     state_string=request.body,
+                    typed=request.typed_payloads,
                 )
             case RequestType.RT_RUN_ACTUATOR_ACTION:
+                actuator_id, actuator_category = request_device_key(request)
                 return process_run_actuator_action(
-                    device_name=request.device_name,
+                    actuator_id=actuator_id,
+                    actuator_category=actuator_category,
                     action_name=request.body,
+                    typed=request.typed_payloads,
                 )
+            case RequestType.RT_SET_GROUP_STATE | RequestType.RT_RUN_GROUP_ACTION:
+                return process_group_command(request)
             case _:
                 return ClientReply(
                     status=ReplyStatus.RS_FAIL,
@@ -212,18 +332,13 @@ def process_client_request(request):
         )
 
 
-def frame_message(message):
-    msg_size = len(message)
-    msg_size = pack('!I', msg_size)
-    return msg_size + message
-
-
 def client_handler(sock, address):
     try:
         logger = logging.getLogger(f'CLIENT_HANDLER_{address}')
         logger.info('Tratando requisição de um cliente em %s', address)
         try:
-            msg = sock.recv(1024)
+            # Clientes antigos enviam a requisição sem prefixo de tamanho
+            msg = recv_frame(sock) if is_framed(sock) else sock.recv(1024)
             request = ClientRequest()
             request.ParseFromString(msg)
         except Exception as e:
@@ -244,7 +359,7 @@ def client_handler(sock, address):
             )
             raise e
         try:
-            sock.sendall(frame_message(reply))
+            send_frame(sock, reply)
         except Exception as e:
             logger.error(
                 'Erro ao enviar resposta ao cliente: (%s) %s',
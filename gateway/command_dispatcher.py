@@ -0,0 +1,123 @@
+import logging
+from concurrent.futures import wait
+from typing import NamedTuple
+from actuators_handler import submit_actuator_command
+from db.repositories import get_actuators_repository
+from messages_pb2 import ActuatorUpdate, CommandType, ComplyStatus, ReplyStatus
+
+
+class GroupCommandResult(NamedTuple):
+    actuator_id: int
+    actuator_category: str
+    status: ReplyStatus
+    update: ActuatorUpdate | None = None
+
+
+def reply_status(comply):
+    if comply is None:
+        return ReplyStatus.RS_FAIL
+    match comply.status:
+        case ComplyStatus.CS_OK:
+            return ReplyStatus.RS_OK
+        case ComplyStatus.CS_INVALID_STATE:
+            return ReplyStatus.RS_INVALID_STATE
+        case ComplyStatus.CS_UNKNOWN_ACTION:
+            return ReplyStatus.RS_UNKNOWN_ACTION
+        case _:
+            return ReplyStatus.RS_FAIL
+
+
+def resolve_group(actuator_category, actuator_ids=None):
+    # Retorna as chaves dos atuadores do grupo e as dos não registrados
+    actuators_repository = get_actuators_repository()
+    if not actuator_ids:
+        targets = [
+            (actuator.id, actuator.category)
+            for actuator in actuators_repository.get_actuators_by_category(actuator_category)
+        ]
+        return sorted(targets), []
+    targets = []
+    unknown = []
+    for actuator_id in dict.fromkeys(actuator_ids):
+        key = (actuator_id, actuator_category)
+        if actuators_repository.has_actuator(*key):
+            targets.append(key)
+        else:
+            unknown.append(key)
+    return targets, unknown
+
+
+class CommandDispatcher:
+    def __init__(self, deadline=2.0):
+        self.deadline = deadline
+
+    def configure(self, deadline):
+        self.deadline = deadline
+        return
+
+    def dispatch(
+        self,
+        actuator_category,
+        command_type,
+        command_body,
+        actuator_ids=None,
+        deadline=None,
+    ):
+        # Os comandos do grupo são enfileirados em paralelo, um por atuador; os
+        # que não terminam dentro do prazo (contado a partir do envio do grupo)
+        # resultam em RS_TIMEOUT e, se ainda não enviados, são descartados
+        logger = logging.getLogger('COMMAND_DISPATCHER')
+        targets, unknown = resolve_group(actuator_category, actuator_ids)
+        futures = {
+            submit_actuator_command(
+                actuator_id,
+                actuator_category,
+                command_type,
+                command_body,
+            ): (actuator_id, actuator_category)
+            for actuator_id, actuator_category in targets
+        }
+        done, not_done = wait(futures, timeout=deadline or self.deadline)
+        results = []
+        for future, (actuator_id, actuator_category) in futures.items():
+            if future in not_done:
+                future.cancel()
+                results.append(GroupCommandResult(
+                    actuator_id,
+                    actuator_category,
+                    ReplyStatus.RS_TIMEOUT,
+                ))
+                continue
+            try:
+                comply = future.result()
+            except Exception as e:
+                logger.error(
+                    'Erro ao enviar comando para o atuador %s-%d: (%s) %s',
+                    actuator_category,
+                    actuator_id,
+                    type(e).__name__,
+                    e,
+                )
+                comply = None
+            status = reply_status(comply)
+            results.append(GroupCommandResult(
+                actuator_id,
+                actuator_category,
+                status,
+                comply.update if status == ReplyStatus.RS_OK else None,
+            ))
+        results.extend(
+            GroupCommandResult(actuator_id, actuator_category, ReplyStatus.RS_UNKNOWN_DEVICE)
+            for actuator_id, actuator_category in unknown
+        )
+        logger.debug(
+            'Comando %s enviado a %d atuadores da categoria %s: %d concluídos',
+            CommandType.Name(command_type),
+            len(futures),
+            actuator_category,
+            len(done),
+        )
+        return results
+
+
+COMMAND_DISPATCHER = CommandDispatcher()
@@ -0,0 +1,182 @@
+import json
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from messages_pb2 import CommandType, ComplyStatus
+
+
+class PendingCommand:
+    def __init__(self, command_type, command_body):
+        self.command_type = command_type
+        self.command_body = command_body
+        self.mergeable = False
+        if command_type == CommandType.CT_SET_STATE:
+            try:
+                patch = json.loads(command_body)
+            except ValueError:
+                patch = None
+            self.mergeable = isinstance(patch, dict)
+        # Cada espera guarda o corpo do próprio comando
+        self.waiters: list[tuple[Future, str]] = []
+
+    def can_merge(self, other):
+        # Apenas alterações de estado ainda não enviadas são combinadas
+        return self.mergeable and other.mergeable
+
+    def add_waiter(self, command_body=None, running=False):
+        waiter = Future()
+        if running:
+            waiter.set_running_or_notify_cancel()
+        if command_body is None:
+            command_body = self.command_body
+        self.waiters.append((waiter, command_body))
+        return waiter
+
+    def start(self):
+        # Descarta quem desistiu do comando antes do envio
+        self.waiters = [
+            (waiter, command_body) for waiter, command_body in self.waiters
+            if waiter.set_running_or_notify_cancel()
+        ]
+        if self.mergeable and self.waiters:
+            # O corpo enviado combina apenas as alterações de quem ainda espera
+            if len(self.waiters) == 1:
+                self.command_body = self.waiters[0][1]
+            else:
+                patch = {}
+                for _, command_body in self.waiters:
+                    patch.update(json.loads(command_body))
+                self.command_body = json.dumps(patch)
+        return bool(self.waiters)
+
+    def should_split(self, reply):
+        # O atuador rejeita a alteração inteira se uma das chaves é inválida.
+        # Nesse caso cada alteração combinada é reenviada separadamente
+        return (
+            self.mergeable
+            and len(self.waiters) > 1
+            and reply is not None
+            and reply.status == ComplyStatus.CS_INVALID_STATE
+        )
+
+    def finish(self, reply, replies=None):
+        for index, (waiter, _) in enumerate(self.waiters):
+            waiter.set_result(reply if replies is None else replies[index])
+        return
+
+
+class CommandQueue:
+    def __init__(self):
+        self.pending: deque[PendingCommand] = deque()
+        self.in_flight: PendingCommand | None = None
+        self.draining = False
+
+
+class ActuatorCommandQueues:
+    def __init__(self, deliver, max_workers=32):
+        self.deliver = deliver
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._queues: dict[tuple[int, str], CommandQueue] = {}
+        self._executor = None
+        self._merged = 0
+        self._shared = 0
+
+    def configure(self, max_workers):
+        self.shutdown()
+        with self._lock:
+            self.max_workers = max_workers
+        return
+
+    def submit(self, actuator_id, actuator_category, command_type, command_body):
+        # Comandos de um mesmo atuador são enviados um por vez, na ordem de
+        # chegada. CT_SET_STATE ainda não enviados são combinados em uma única
+        # alteração e CT_GET_STATE concorrentes compartilham o mesmo resultado
+        key = (actuator_id, actuator_category)
+        command = PendingCommand(command_type, command_body)
+        with self._lock:
+            queue = self._queues.setdefault(key, CommandQueue())
+            tail = queue.pending[-1] if queue.pending else None
+            last = tail if tail is not None else queue.in_flight
+            if (
+                command_type == CommandType.CT_GET_STATE
+                and last is not None
+                and last.command_type == CommandType.CT_GET_STATE
+            ):
+                self._shared += 1
+                return last.add_waiter(running=tail is None)
+            if tail is not None and tail.can_merge(command):
+                self._merged += 1
+                return tail.add_waiter(command_body)
+            waiter = command.add_waiter()
+            queue.pending.append(command)
+            if not queue.draining:
+                queue.draining = True
+                self._get_executor().submit(self._drain, key)
+            return waiter
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='ACTUATOR_COMMANDS',
+            )
+        return self._executor
+
+    def _drain(self, key):
+        logger = logging.getLogger('ACTUATOR_COMMANDS')
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                command = None
+                while queue.pending:
+                    command = queue.pending.popleft()
+                    if command.start():
+                        break
+                    command = None
+                if command is None:
+                    queue.draining = False
+                    del self._queues[key]
+                    return
+                queue.in_flight = command
+            reply = self._deliver(logger, key, command.command_type, command.command_body)
+            replies = None
+            if command.should_split(reply):
+                replies = [
+                    self._deliver(logger, key, command.command_type, command_body)
+                    for _, command_body in command.waiters
+                ]
+            with self._lock:
+                queue.in_flight = None
+            command.finish(reply, replies)
+
+    def _deliver(self, logger, key, command_type, command_body):
+        try:
+            return self.deliver(key[0], key[1], command_type, command_body)
+        except Exception as e:
+            logger.error(
+                'Erro ao enviar comando para o atuador %s-%d: (%s) %s',
+                key[1],
+                key[0],
+                type(e).__name__,
+                e,
+            )
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'actuators': len(self._queues),
+                'pendingCommands': sum(len(queue.pending) for queue in self._queues.values()),
+                'mergedCommands': self._merged,
+                'sharedCommands': self._shared,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        return
@@ -0,0 +1,182 @@
+import time
+import select
+import socket
+import logging
+import threading
+from collections import deque
+from typing import NamedTuple
+from framing import send_frame, recv_frame
+
+
+class IdleConnection(NamedTuple):
+    sock: socket.socket
+    last_used: float
+
+
+def close_connection(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+
+def is_healthy(sock):
+    # Uma conexão ociosa saudável não tem nada para ler: dados pendentes ou
+    # FIN do atuador indicam que ela não pode ser reaproveitada
+    try:
+        readable, _, _ = select.select((sock,), (), (), 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+class ActuatorConnectionPool:
+    def __init__(self, max_connections=4, idle_timeout=30.0, timeout=1.0):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, int], deque[IdleConnection]] = {}
+        self._slots: dict[tuple[str, int], threading.BoundedSemaphore] = {}
+
+    def configure(self, max_connections, idle_timeout, timeout=1.0):
+        self.close_all()
+        with self._lock:
+            self.max_connections = max_connections
+            self.idle_timeout = idle_timeout
+            self.timeout = timeout
+            self._slots.clear()
+        return
+
+    def _slot(self, address):
+        with self._lock:
+            slot = self._slots.get(address)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.max_connections)
+                self._slots[address] = slot
+            return slot
+
+    def _take_idle(self, address):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(address)
+            while idle:
+                # A conexão usada mais recentemente é a que tem menos chance
+                # de ter sido encerrada pelo atuador
+                connection = idle.pop()
+                if now - connection.last_used < self.idle_timeout and is_healthy(connection.sock):
+                    return connection.sock
+                close_connection(connection.sock)
+        return None
+
+    def _release(self, address, sock):
+        with self._lock:
+            self._idle.setdefault(address, deque()).append(
+                IdleConnection(sock, time.monotonic())
+            )
+        return
+
+    def _connect(self, address):
+        sock = socket.create_connection(address, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def request(self, address, message):
+        slot = self._slot(address)
+        if not slot.acquire(timeout=self.timeout):
+            raise TimeoutError(f'No connection available to {address}')
+        try:
+            sock = self._take_idle(address)
+            if sock is not None:
+                try:
+                    reply = self._exchange(sock, message)
+                    self._release(address, sock)
+                    return reply
+                except EOFError:
+                    # Encerrada pelo atuador antes de responder: tenta uma
+                    # conexão nova
+                    close_connection(sock)
+                except Exception:
+                    close_connection(sock)
+                    raise
+            sock = self._connect(address)
+            try:
+                reply = self._exchange(sock, message)
+            except Exception:
+                close_connection(sock)
+                raise
+            self._release(address, sock)
+            return reply
+        finally:
+            slot.release()
+
+    def _exchange(self, sock, message):
+        send_frame(sock, message)
+        return recv_frame(sock)
+
+    def evict_idle(self):
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for address, idle in list(self._idle.items()):
+                kept = deque(
+                    connection for connection in idle
+                    if now - connection.last_used < self.idle_timeout
+                )
+                evicted.extend(
+                    connection.sock for connection in idle
+                    if now - connection.last_used >= self.idle_timeout
+                )
+                if kept:
+                    self._idle[address] = kept
+                else:
+                    del self._idle[address]
+        for sock in evicted:
+            close_connection(sock)
+        return len(evicted)
+
+    def discard(self, address):
+        with self._lock:
+            idle = self._idle.pop(address, ())
+        for connection in idle:
+            close_connection(connection.sock)
+        return
+
+    def close_all(self):
+        with self._lock:
+            idle = [
+                connection
+                for connections in self._idle.values()
+                for connection in connections
+            ]
+            self._idle.clear()
+        for connection in idle:
+            close_connection(connection.sock)
+        return
+
+    def stats(self):
+        with self._lock:
+            return {
+                'actuators': len(self._idle),
+                'idleConnections': sum(len(idle) for idle in self._idle.values()),
+            }
+
+
+def pool_maintainer(stop_flag, interval):
+    logger = logging.getLogger('POOL_MAINTAINER')
+    logger.info(
+        'Encerrando conexões ociosas com atuadores a cada %.1f segundos',
+        interval,
+    )
+    try:
+        while not stop_flag.wait(interval):
+            evicted = ACTUATORS_POOL.evict_idle()
+            if evicted:
+                logger.debug('%d conexões ociosas encerradas', evicted)
+    finally:
+        ACTUATORS_POOL.close_all()
+
+
+ACTUATORS_POOL = ActuatorConnectionPool()
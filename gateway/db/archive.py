@@ -0,0 +1,168 @@
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+import numpy as np
+
+
+# Uma entrada do índice esparso a cada INDEX_STRIDE leituras
+INDEX_STRIDE = 4096
+
+
+class SensorArchive(NamedTuple):
+    # Ordenadas por (timestamp, id), com os ids originais das leituras
+    timestamps: np.ndarray
+    values: np.ndarray
+    ids: np.ndarray
+    index: np.ndarray
+
+    def position(self, micros: int, side: str = 'left'):
+        block = int(np.searchsorted(self.index, micros, side=side))
+        start = max(block - 1, 0) * INDEX_STRIDE
+        end = min(block * INDEX_STRIDE, len(self.timestamps))
+        return start + int(np.searchsorted(self.timestamps[start:end], micros, side=side))
+
+    def span(
+        self,
+        after: int | None = None,
+        before: int | None = None,
+        cursor: tuple[int, int] | None = None,
+    ):
+        low = 0 if after is None else self.position(after)
+        high = len(self.timestamps)
+        if before is not None:
+            high = min(high, self.position(before))
+        if cursor is not None:
+            cursor_micros, cursor_id = cursor
+            # Leituras com o mesmo timestamp do cursor: apenas as de id menor
+            start = self.position(cursor_micros)
+            end = self.position(cursor_micros, 'right')
+            position = start + int(np.searchsorted(self.ids[start:end], cursor_id))
+            high = min(high, position)
+        return low, max(low, high)
+
+
+class ArchiveStore:
+    def __init__(self, root: str = 'archive', cache_size: int = 256):
+        self.root = Path(root)
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple, SensorArchive | None] = OrderedDict()
+        self._unreferenced: set[Path] = set()
+
+    def configure(self, root: str):
+        self.root = Path(root)
+        with self._lock:
+            self._cache.clear()
+        return
+
+    def clear(self):
+        if self.root.is_dir():
+            shutil.rmtree(self.root)
+        with self._lock:
+            self._cache.clear()
+        return
+
+    def version_dir(self, key: str, version: int):
+        return self.root / key / f'v{version}'
+
+    @staticmethod
+    def sensor_name(sensor_id: int, sensor_category: str):
+        return f'{sensor_category}-{sensor_id}'
+
+    def sensors(self, key: str, version: int):
+        directory = self.version_dir(key, version)
+        if version == 0 or not directory.is_dir():
+            return set()
+        sensors = set()
+        for path in directory.glob('*.ts'):
+            sensor_category, sensor_id = path.stem.rsplit('-', 1)
+            sensors.add((int(sensor_id), sensor_category))
+        return sensors
+
+    def count(self, key: str, version: int):
+        directory = self.version_dir(key, version)
+        if version == 0 or not directory.is_dir():
+            return 0
+        return sum(
+            path.stat().st_size // np.dtype(np.int64).itemsize
+            for path in directory.glob('*.ts')
+        )
+
+    def open(self, key: str, version: int, sensor_id: int, sensor_category: str):
+        if version == 0:
+            return None
+        cache_key = (key, version, sensor_id, sensor_category)
+        with self._lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return self._cache[cache_key]
+        base = self.version_dir(key, version) / self.sensor_name(sensor_id, sensor_category)
+        archive = None
+        if base.with_suffix('.ts').is_file():
+            archive = SensorArchive(
+                timestamps=np.memmap(base.with_suffix('.ts'), dtype=np.int64, mode='r'),
+                values=np.memmap(base.with_suffix('.val'), dtype=np.float32, mode='r'),
+                ids=np.memmap(base.with_suffix('.id'), dtype=np.int64, mode='r'),
+                index=np.fromfile(base.with_suffix('.idx'), dtype=np.int64),
+            )
+        with self._lock:
+            self._cache[cache_key] = archive
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return archive
+
+    def begin_version(self, key: str, version: int):
+        staging = self.root / key / f'.v{version}'
+        if staging.is_dir():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        return staging
+
+    def write_sensor(
+        self,
+        staging: Path,
+        sensor_id: int,
+        sensor_category: str,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        ids: np.ndarray,
+    ):
+        base = staging / self.sensor_name(sensor_id, sensor_category)
+        timestamps.astype(np.int64).tofile(base.with_suffix('.ts'))
+        values.astype(np.float32).tofile(base.with_suffix('.val'))
+        ids.astype(np.int64).tofile(base.with_suffix('.id'))
+        timestamps[::INDEX_STRIDE].astype(np.int64).tofile(base.with_suffix('.idx'))
+        return
+
+    def publish_version(self, staging: Path, key: str, version: int):
+        # Os leitores só consultam a versão depois que o catálogo a referencia
+        os.rename(staging, self.version_dir(key, version))
+        return
+
+    def collect(self, referenced: set[tuple[str, int]]):
+        # Versões sem referência são removidas na passagem seguinte, dando
+        # tempo para que leituras em andamento terminem
+        if not self.root.is_dir():
+            return []
+        unreferenced = set()
+        for directory in self.root.glob('*/*'):
+            if not directory.is_dir() or directory.name.startswith('.'):
+                continue
+            version = int(directory.name[1:])
+            if (directory.parent.name, version) not in referenced:
+                unreferenced.add(directory)
+        removed = sorted(unreferenced & self._unreferenced)
+        for directory in removed:
+            shutil.rmtree(directory, ignore_errors=True)
+            try:
+                directory.parent.rmdir()
+            except OSError:
+                pass
+        self._unreferenced = unreferenced - set(removed)
+        return removed
+
+
+ARCHIVE = ArchiveStore()
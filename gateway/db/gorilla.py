@@ -0,0 +1,153 @@
+import struct
+
+
+# Codificação no estilo Gorilla (Pelkonen et al., 2015): timestamps em
+# microssegundos como delta-of-delta e valores float64 como XOR do anterior
+
+MASK_64 = (1 << 64) - 1
+
+# Faixas do delta-of-delta (prefixo, bits). Acima delas: '1111' + 64 bits
+TIMESTAMP_BUCKETS = (
+    ('10', 16),
+    ('110', 24),
+    ('1110', 32),
+)
+
+
+def _signed(value: int, width: int):
+    if value >= 1 << (width - 1):
+        return value - (1 << width)
+    return value
+
+
+def _encode_integers(bits: list[str], integers: list[int]):
+    bits.append(format(integers[0] & MASK_64, '064b'))
+    previous_integer = integers[0]
+    previous_delta = 0
+    for integer in integers[1:]:
+        delta = integer - previous_integer
+        delta_of_delta = delta - previous_delta
+        if delta_of_delta == 0:
+            bits.append('0')
+        else:
+            for prefix, width in TIMESTAMP_BUCKETS:
+                if -(1 << (width - 1)) <= delta_of_delta < 1 << (width - 1):
+                    bits.append(prefix)
+                    bits.append(format(delta_of_delta & ((1 << width) - 1), f'0{width}b'))
+                    break
+            else:
+                bits.append('1111')
+                bits.append(format(delta_of_delta & MASK_64, '064b'))
+        previous_integer = integer
+        previous_delta = delta
+
+
+def _to_bytes(bits: list[str]):
+    stream = ''.join(bits)
+    stream += '0' * (-len(stream) % 8)
+    return int(stream, 2).to_bytes(len(stream) // 8, 'big')
+
+
+def _to_stream(data: bytes):
+    return format(int.from_bytes(data, 'big'), f'0{len(data) * 8}b')
+
+
+def encode_chunk(timestamps: list[int], values: list[float]):
+    count = len(timestamps)
+    if count == 0:
+        return b''
+    bits = []
+    _encode_integers(bits, timestamps)
+    words = struct.unpack(f'>{count}Q', struct.pack(f'>{count}d', *values))
+    bits.append(format(words[0], '064b'))
+    previous_word = words[0]
+    window = None
+    for word in words[1:]:
+        xor = word ^ previous_word
+        previous_word = word
+        if xor == 0:
+            bits.append('0')
+            continue
+        leading = min(64 - xor.bit_length(), 31)
+        trailing = (xor & -xor).bit_length() - 1
+        if window is not None and leading >= window[0] and trailing >= window[1]:
+            # Bits significativos cabem na janela do valor anterior
+            width = 64 - window[0] - window[1]
+            bits.append('10')
+            bits.append(format(xor >> window[1], f'0{width}b'))
+            continue
+        width = 64 - leading - trailing
+        bits.append('11')
+        bits.append(format(leading, '05b'))
+        bits.append(format(width - 1, '06b'))
+        bits.append(format(xor >> trailing, f'0{width}b'))
+        window = (leading, trailing)
+    return _to_bytes(bits)
+
+
+def encode_ids(ids: list[int]):
+    # Ids originais das leituras do bloco, com o mesmo delta-of-delta dos
+    # timestamps (leituras de um sensor têm ids próximos)
+    if not ids:
+        return b''
+    bits = []
+    _encode_integers(bits, ids)
+    return _to_bytes(bits)
+
+
+def _decode_integers(stream: str, count: int):
+    integer = _signed(int(stream[:64], 2), 64)
+    position = 64
+    integers = [integer]
+    delta = 0
+    for _ in range(count - 1):
+        if stream[position] == '0':
+            position += 1
+        else:
+            for prefix, width in TIMESTAMP_BUCKETS:
+                if stream.startswith(prefix, position):
+                    position += len(prefix)
+                    break
+            else:
+                position += 4
+                width = 64
+            delta += _signed(int(stream[position:position + width], 2), width)
+            position += width
+        integer += delta
+        integers.append(integer)
+    return integers, position
+
+
+def decode_chunk(data: bytes, count: int):
+    if count == 0:
+        return [], []
+    stream = _to_stream(data)
+    timestamps, position = _decode_integers(stream, count)
+    word = int(stream[position:position + 64], 2)
+    position += 64
+    words = [word]
+    leading = trailing = 0
+    for _ in range(count - 1):
+        if stream[position] == '0':
+            position += 1
+            words.append(word)
+            continue
+        if stream[position + 1] == '1':
+            leading = int(stream[position + 2:position + 7], 2)
+            width = int(stream[position + 7:position + 13], 2) + 1
+            trailing = 64 - leading - width
+            position += 13
+        else:
+            width = 64 - leading - trailing
+            position += 2
+        word ^= int(stream[position:position + width], 2) << trailing
+        position += width
+        words.append(word)
+    values = list(struct.unpack(f'>{count}d', struct.pack(f'>{count}Q', *words)))
+    return timestamps, values
+
+
+def decode_ids(data: bytes, count: int):
+    if count == 0:
+        return []
+    return _decode_integers(_to_stream(data), count)[0]
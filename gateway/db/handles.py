@@ -0,0 +1,73 @@
+import threading
+
+
+# Handle numérico de um dispositivo: código da categoria nos bits altos e
+# id do dispositivo nos 32 bits baixos. Códigos começam em 1, logo um
+# handle nunca é 0 (valor padrão do Protobuf para campo ausente)
+HANDLE_ID_BITS = 32
+
+HANDLE_ID_MASK = (1 << HANDLE_ID_BITS) - 1
+
+
+def split_device_name(device_name: str):
+    # Compatibilidade com nomes "<categoria>-<id>"; a categoria pode conter '-'
+    device_category, device_id = device_name.rsplit('-', 1)
+    return int(device_id), device_category
+
+
+def message_device_key(message):
+    # Ordem de preferência: handle numérico, DeviceId, nome do dispositivo
+    if message.device_handle:
+        key = DEVICE_CATEGORIES.resolve(message.device_handle)
+        if key is None:
+            raise ValueError(f'Unknown device handle {message.device_handle}')
+        return key
+    if message.HasField('device_id'):
+        return message.device_id.id, message.device_id.category
+    return split_device_name(message.device_name)
+
+
+class CategoryDictionary:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes: dict[str, int] = {}
+        self._names: dict[int, str] = {}
+
+    def load(self, categories: dict[str, int]):
+        with self._lock:
+            self._codes = dict(categories)
+            self._names = {code: name for name, code in categories.items()}
+        return
+
+    def add(self, category: str, code: int):
+        with self._lock:
+            self._codes[category] = code
+            self._names[code] = category
+        return
+
+    def code(self, category: str):
+        return self._codes.get(category)
+
+    def assign(self, category: str):
+        with self._lock:
+            code = self._codes.get(category)
+            if code is None:
+                code = len(self._codes) + 1
+                self._codes[category] = code
+                self._names[code] = category
+            return code
+
+    def handle(self, device_id: int, device_category: str):
+        code = self._codes.get(device_category)
+        if code is None:
+            return None
+        return (code << HANDLE_ID_BITS) | device_id
+
+    def resolve(self, handle: int):
+        category = self._names.get(handle >> HANDLE_ID_BITS)
+        if category is None:
+            return None
+        return handle & HANDLE_ID_MASK, category
+
+
+DEVICE_CATEGORIES = CategoryDictionary()
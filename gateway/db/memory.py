@@ -0,0 +1,490 @@
+import bisect
+import datetime
+import threading
+from array import array
+from typing import Any
+import numpy as np
+from .models import Sensor, Actuator, LatestReading, SensorRollup
+from .models import utc_now, to_micros
+from .repositories import SensorRepository, ActuatorRepository, StoredReading
+from .repositories import ReadingsSummary, metadata_changed, apply_state_patch
+from .rollups import ROLLUP_RESOLUTIONS, RollupRetention, build_rollup_rows
+from .writer import completed
+from .handles import CategoryDictionary, DEVICE_CATEGORIES
+
+
+class ReadingSeries:
+    def __init__(self):
+        self.timestamps = array('q')
+        self.values = array('d')
+        self.ids = array('q')
+        self.next_id = 1
+
+    def append(self, micros: int, value: float):
+        # Leituras fora de ordem são inseridas na posição correta
+        if self.timestamps and micros < self.timestamps[-1]:
+            position = bisect.bisect_right(self.timestamps, micros)
+            self.timestamps.insert(position, micros)
+            self.values.insert(position, value)
+            self.ids.insert(position, self.next_id)
+        else:
+            self.timestamps.append(micros)
+            self.values.append(value)
+            self.ids.append(self.next_id)
+        self.next_id += 1
+
+    def trim(self, count: int):
+        del self.timestamps[:count]
+        del self.values[:count]
+        del self.ids[:count]
+
+    def position(self, micros: int, reading_id: int | None = None):
+        position = bisect.bisect_left(self.timestamps, micros)
+        if reading_id is not None:
+            while (
+                position < len(self.timestamps)
+                and self.timestamps[position] == micros
+                and self.ids[position] < reading_id
+            ):
+                position += 1
+        return position
+
+
+class MemoryStore:
+    def __init__(
+        self,
+        series_capacity: int = 100000,
+        categories: CategoryDictionary = DEVICE_CATEGORIES,
+    ):
+        self.series_capacity = series_capacity
+        self.categories = categories
+        self.retention: datetime.timedelta | None = None
+        self.rollup_retention = RollupRetention()
+        self.lock = threading.RLock()
+        self.sensors: dict[tuple[int, str], Sensor] = {}
+        self.actuators: dict[tuple[int, str], Actuator] = {}
+        self.series: dict[tuple[int, str], ReadingSeries] = {}
+        self.latest: dict[tuple[int, str], tuple[float, int]] = {}
+        self.rollups: dict[tuple[int, str, int], dict[int, list]] = {}
+        self.rollup_buckets: dict[tuple[int, str, int], list[int]] = {}
+
+    def configure(
+        self,
+        retention: datetime.timedelta | None,
+        series_capacity: int | None = None,
+        rollup_retention: dict[str, datetime.timedelta | None] | None = None,
+    ):
+        self.retention = retention
+        self.rollup_retention.configure(rollup_retention or {})
+        if series_capacity is not None:
+            self.series_capacity = series_capacity
+        return
+
+
+class MemorySensorRepository(SensorRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    def add_sensor(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        ip_address: str,
+        device_metadata: dict[str, Any] | None,
+        availability_tolerance: float = 10.0,
+        encoded_metadata: bytes | None = None,
+    ):
+        sensor = Sensor(
+            id=sensor_id,
+            category=sensor_category,
+            ip_address=ip_address,
+            device_metadata=device_metadata,
+            encoded_metadata=encoded_metadata,
+            availability_tolerance=availability_tolerance,
+            last_seen=utc_now(),
+        )
+        with self.store.lock:
+            self.store.sensors[(sensor_id, sensor_category)] = sensor
+            self.store.series.setdefault((sensor_id, sensor_category), ReadingSeries())
+        self.store.categories.assign(sensor_category)
+        return completed(self.store.categories.handle(sensor_id, sensor_category))
+
+    def has_sensor(self, sensor_id: int, sensor_category: str):
+        return (sensor_id, sensor_category) in self.store.sensors
+
+    def get_sensor(self, sensor_id: int, sensor_category: str):
+        return self.store.sensors.get((sensor_id, sensor_category))
+
+    def get_sensor_readings_page(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None = None,
+        before: int | None = None,
+        cursor: tuple[int, int] | None = None,
+        limit: int = 100,
+    ):
+        with self.store.lock:
+            series = self.store.series.get((sensor_id, sensor_category))
+            if series is None:
+                return None
+            low = 0 if after is None else series.position(after)
+            high = len(series.timestamps)
+            if before is not None:
+                high = min(high, series.position(before))
+            if cursor is not None:
+                high = min(high, series.position(*cursor))
+            start = max(low, high - limit)
+            readings = [
+                StoredReading(
+                    series.ids[position],
+                    series.values[position],
+                    series.timestamps[position],
+                )
+                for position in range(start, high)
+            ]
+        next_cursor = None
+        if start > low:
+            next_cursor = (readings[0].timestamp, readings[0].id)
+        return readings, next_cursor
+
+    def get_sensor_rollups_page(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        resolution: str,
+        after: int | None = None,
+        before: int | None = None,
+        cursor: int | None = None,
+        limit: int = 1000,
+    ):
+        if not self.has_sensor(sensor_id, sensor_category):
+            return None
+        seconds = int(ROLLUP_RESOLUTIONS[resolution].total_seconds())
+        key = (sensor_id, sensor_category, seconds)
+        with self.store.lock:
+            buckets = self.store.rollup_buckets.get(key, [])
+            values = self.store.rollups.get(key, {})
+            low = 0 if after is None else bisect.bisect_left(buckets, after)
+            high = len(buckets)
+            if before is not None:
+                high = min(high, bisect.bisect_left(buckets, before))
+            if cursor is not None:
+                high = min(high, bisect.bisect_left(buckets, cursor))
+            start = max(low, high - limit)
+            rollups = [
+                SensorRollup(
+                    sensor_category=sensor_category,
+                    sensor_id=sensor_id,
+                    resolution=seconds,
+                    bucket=bucket,
+                    min_value=values[bucket][0],
+                    max_value=values[bucket][1],
+                    sum_value=values[bucket][2],
+                    count=values[bucket][3],
+                    last_value=values[bucket][4],
+                    last_timestamp=values[bucket][5],
+                )
+                for bucket in buckets[start:high]
+            ]
+        next_cursor = None
+        if start > low:
+            next_cursor = rollups[0].bucket
+        return rollups, next_cursor
+
+    def get_sensor_summary(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None = None,
+        before: int | None = None,
+    ):
+        with self.store.lock:
+            series = self.store.series.get((sensor_id, sensor_category))
+            if series is None:
+                return None
+            low = 0 if after is None else series.position(after)
+            high = len(series.timestamps)
+            if before is not None:
+                high = min(high, series.position(before))
+            # Visão sem cópia do array; liberada antes de soltar o lock, já
+            # que o array não pode crescer enquanto houver visões exportadas
+            values = np.frombuffer(series.values, dtype=np.float64)
+            summary = ReadingsSummary.from_values(values[low:high])
+            del values
+        return summary
+
+    def _last_reading(self, sensor_id: int, sensor_category: str):
+        latest = self.store.latest.get((sensor_id, sensor_category))
+        if latest is None:
+            return None
+        return LatestReading(
+            sensor_id=sensor_id,
+            sensor_category=sensor_category,
+            value=latest[0],
+            timestamp=latest[1],
+        )
+
+    def get_sensor_last_reading(self, sensor_id: int, sensor_category: str):
+        return self._last_reading(sensor_id, sensor_category)
+
+    def get_sensors_with_last_reading(self, sensor_category: str | None = None):
+        with self.store.lock:
+            return [
+                (sensor, self._last_reading(sensor.id, sensor.category))
+                for sensor in self.store.sensors.values()
+                if sensor_category is None or sensor.category == sensor_category
+            ]
+
+    def get_all_sensors(self):
+        with self.store.lock:
+            return list(self.store.sensors.values())
+
+    def get_sensors_by_category(self, sensor_category: str):
+        with self.store.lock:
+            return [
+                sensor for sensor in self.store.sensors.values()
+                if sensor.category == sensor_category
+            ]
+
+    def mark_sensors_as_seen(
+        self,
+        last_seen: dict[tuple[int, str], datetime.datetime],
+    ):
+        updated = False
+        with self.store.lock:
+            for key, timestamp in last_seen.items():
+                sensor = self.store.sensors.get(key)
+                if sensor is not None:
+                    sensor.last_seen = timestamp
+                    updated = True
+        return completed(updated)
+
+    def _update_rollups(self, rows: list[dict]):
+        for rollup in build_rollup_rows(rows):
+            key = (rollup['sensor_id'], rollup['sensor_category'], rollup['resolution'])
+            bucket = rollup['bucket']
+            values = self.store.rollups.setdefault(key, {})
+            current = values.get(bucket)
+            if current is None:
+                values[bucket] = [
+                    rollup['min_value'],
+                    rollup['max_value'],
+                    rollup['sum_value'],
+                    rollup['count'],
+                    rollup['last_value'],
+                    rollup['last_timestamp'],
+                ]
+                bisect.insort(self.store.rollup_buckets.setdefault(key, []), bucket)
+                continue
+            current[0] = min(current[0], rollup['min_value'])
+            current[1] = max(current[1], rollup['max_value'])
+            current[2] += rollup['sum_value']
+            current[3] += rollup['count']
+            if rollup['last_timestamp'] >= current[5]:
+                current[4] = rollup['last_value']
+                current[5] = rollup['last_timestamp']
+
+    def register_sensor_readings(
+        self,
+        readings: list[tuple[int, str, float, int]],
+    ):
+        horizon = None
+        if self.store.retention is not None:
+            horizon = to_micros(utc_now() - self.store.retention)
+        unknown_keys = set()
+        rows = []
+        with self.store.lock:
+            for sensor_id, sensor_category, reading_value, reading_timestamp in readings:
+                key = (sensor_id, sensor_category)
+                series = self.store.series.get(key)
+                if series is None:
+                    unknown_keys.add(key)
+                    continue
+                if horizon is not None and reading_timestamp < horizon:
+                    continue
+                series.append(reading_timestamp, reading_value)
+                # Descarta as leituras mais antigas em blocos para amortizar a cópia
+                excess = len(series.timestamps) - self.store.series_capacity
+                if excess > self.store.series_capacity // 8:
+                    series.trim(excess)
+                latest = self.store.latest.get(key)
+                if latest is None or reading_timestamp > latest[1]:
+                    self.store.latest[key] = (reading_value, reading_timestamp)
+                rows.append({
+                    'value': reading_value,
+                    'timestamp': reading_timestamp,
+                    'sensor_id': sensor_id,
+                    'sensor_category': sensor_category,
+                })
+            self._update_rollups(rows)
+        return completed(unknown_keys)
+
+    def drop_expired_readings(self, now: datetime.datetime | None = None):
+        if self.store.retention is None:
+            return completed(0)
+        horizon = to_micros((now or utc_now()) - self.store.retention)
+        count = 0
+        with self.store.lock:
+            for series in self.store.series.values():
+                expired = series.position(horizon)
+                if expired:
+                    series.trim(expired)
+                    count += expired
+        return completed(count)
+
+    def drop_expired_rollups(self, now: datetime.datetime | None = None):
+        horizons = self.store.rollup_retention.horizons(now or utc_now())
+        count = 0
+        with self.store.lock:
+            for key, buckets in self.store.rollup_buckets.items():
+                horizon = horizons.get(key[2])
+                if horizon is None:
+                    continue
+                expired = bisect.bisect_right(buckets, horizon)
+                values = self.store.rollups[key]
+                for bucket in buckets[:expired]:
+                    del values[bucket]
+                del buckets[:expired]
+                count += expired
+        return completed(count)
+
+    def compress_readings(self, now: datetime.datetime | None = None):
+        # As séries em memória já são colunares (24 bytes por leitura)
+        return completed(0)
+
+    def archive_readings(self, now: datetime.datetime | None = None):
+        return completed(0)
+
+
+class MemoryActuatorRepository(ActuatorRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    def add_actuator(
+        self,
+        actuator_id: int,
+        actuator_category: str,
+        ip_address: str,
+        communication_port: int,
+        device_state: dict[str, Any] | None,
+        device_metadata: dict[str, Any] | None,
+        timestamp: datetime.datetime,
+        availability_tolerance: float = 10.0,
+        encoded_state: bytes | None = None,
+        encoded_metadata: bytes | None = None,
+        metadata_hash: int | None = None,
+        state_seq: int | None = None,
+        framed_commands: bool = False,
+    ):
+        actuator = Actuator(
+            id=actuator_id,
+            category=actuator_category,
+            ip_address=ip_address,
+            communication_port=communication_port,
+            device_state=device_state,
+            device_metadata=device_metadata,
+            encoded_state=encoded_state,
+            encoded_metadata=encoded_metadata,
+            metadata_hash=metadata_hash or None,
+            state_seq=state_seq or None,
+            framed_commands=framed_commands,
+            timestamp=timestamp,
+            availability_tolerance=availability_tolerance,
+            last_seen=utc_now(),
+        )
+        with self.store.lock:
+            self.store.actuators[(actuator_id, actuator_category)] = actuator
+        self.store.categories.assign(actuator_category)
+        return completed(self.store.categories.handle(actuator_id, actuator_category))
+
+    def has_actuator(self, actuator_id: int, actuator_category: str):
+        return (actuator_id, actuator_category) in self.store.actuators
+
+    def get_actuator_address(self, actuator_id: int, actuator_category: str):
+        actuator = self.store.actuators.get((actuator_id, actuator_category))
+        if actuator is None:
+            return None
+        return (actuator.ip_address, actuator.communication_port)
+
+    def has_framed_commands(self, actuator_id: int, actuator_category: str):
+        actuator = self.store.actuators.get((actuator_id, actuator_category))
+        return actuator is not None and bool(actuator.framed_commands)
+
+    def get_actuator(self, actuator_id: int, actuator_category: str):
+        return self.store.actuators.get((actuator_id, actuator_category))
+
+    def get_all_actuators(self):
+        with self.store.lock:
+            return list(self.store.actuators.values())
+
+    def get_actuators_by_category(self, actuator_category: str):
+        with self.store.lock:
+            return [
+                actuator for actuator in self.store.actuators.values()
+                if actuator.category == actuator_category
+            ]
+
+    def mark_actuators_as_seen(
+        self,
+        last_seen: dict[tuple[int, str], datetime.datetime],
+    ):
+        updated = False
+        with self.store.lock:
+            for key, timestamp in last_seen.items():
+                actuator = self.store.actuators.get(key)
+                if actuator is not None:
+                    actuator.last_seen = timestamp
+                    updated = True
+        return completed(updated)
+
+    def register_actuator_update(
+        self,
+        actuator_id: int,
+        actuator_category: str,
+        device_state: dict[str, Any] | None,
+        device_metadata: dict[str, Any] | None,
+        timestamp: datetime.datetime,
+        encoded_state: bytes | None = None,
+        encoded_metadata: bytes | None = None,
+        metadata_hash: int | None = None,
+        state_seq: int | None = None,
+        state_delta: bool = False,
+        base_seq: int = 0,
+    ):
+        with self.store.lock:
+            actuator = self.store.actuators.get((actuator_id, actuator_category))
+            if actuator is None:
+                return completed(False)
+            if state_delta:
+                if actuator.state_seq is None or actuator.state_seq < base_seq:
+                    return completed(False)
+                if actuator.state_seq < state_seq and actuator.timestamp < timestamp:
+                    actuator.device_state, actuator.encoded_state = apply_state_patch(
+                        actuator.device_state,
+                        actuator.encoded_state,
+                        device_state,
+                        encoded_state,
+                    )
+                    actuator.state_seq = state_seq
+                    actuator.timestamp = timestamp
+            elif actuator.timestamp < timestamp:
+                actuator.device_state = device_state
+                actuator.encoded_state = encoded_state
+                actuator.state_seq = state_seq or None
+                actuator.timestamp = timestamp
+            else:
+                return completed(True)
+            if metadata_changed(
+                device_metadata,
+                encoded_metadata,
+                metadata_hash,
+                actuator.metadata_hash,
+            ):
+                actuator.device_metadata = device_metadata
+                actuator.encoded_metadata = encoded_metadata
+                actuator.metadata_hash = metadata_hash or None
+        return completed(True)
+
+
+MEMORY_STORE = MemoryStore()
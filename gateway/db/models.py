@@ -1,11 +1,10 @@
-import time
 import datetime
-from sqlalchemy import Index, ForeignKeyConstraint
-from sqlalchemy import Integer, Float, String
-from sqlalchemy import Date, DateTime
-from sqlalchemy import JSON
+from sqlalchemy import ForeignKeyConstraint
+from sqlalchemy import Integer, BigInteger, Float, String, Boolean
+from sqlalchemy import DateTime
+from sqlalchemy import JSON, LargeBinary
 from sqlalchemy.orm import DeclarativeBase, Mapped
-from sqlalchemy.orm import mapped_column, relationship
+from sqlalchemy.orm import mapped_column
 from sqlalchemy.types import TypeDecorator
 
 
@@ -13,40 +12,22 @@ class Base(DeclarativeBase):
     pass
 
 
-def utc_today():
-    return datetime.datetime.now(datetime.UTC).date()
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
 
 
-class Sensor(Base):
-    __tablename__ = 'sensors'
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def utc_now():
+    return datetime.datetime.now(datetime.UTC)
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    category: Mapped[str] = mapped_column(String, primary_key=True)
-    ip_address: Mapped[str] = mapped_column(String, nullable=False)
-    device_metadata: Mapped[dict] = mapped_column(JSON, nullable=False)
-    availability_tolerance: Mapped[float] = mapped_column(Float, nullable=False)
-    last_seen_date: Mapped[datetime.date] = mapped_column(
-        Date, nullable=False, default=utc_today,
-    )
-    last_seen_clock: Mapped[float] = mapped_column(
-        Float, nullable=False, default=time.monotonic,
-    )
 
-    readings: Mapped[list['Reading']] = relationship(back_populates='sensor')
+def to_micros(timestamp: datetime.datetime):
+    return (timestamp - EPOCH) // MICROSECOND
 
-    def mark_as_seen(self):
-        self.last_seen_date = utc_today()
-        self.last_seen_clock = time.monotonic()
-        return
 
-    def is_online(self):
-        return (
-            self.last_seen_date == utc_today()
-            and (
-                (time.monotonic() - self.last_seen_clock)
-                <= self.availability_tolerance
-            )
-        )
+def from_micros(micros: int):
+    return EPOCH + datetime.timedelta(microseconds=micros)
 
 
 class UTCDateTime(TypeDecorator):
@@ -56,31 +37,90 @@ class UTCDateTime(TypeDecorator):
     cache_ok = True
 
     def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
         return value.replace(tzinfo=None)
 
     def process_result_value(self, value, dialect):
+        if value is None:
+            return None
         return value.replace(tzinfo=datetime.UTC)
 
 
-class Reading(Base):
-    __tablename__ = 'sensors_readings'
+class DeviceCategory(Base):
+    __tablename__ = 'devices_categories'
+
+    # Código usado nos handles numéricos dos dispositivos
+    code: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+
+
+class Sensor(Base):
+    __tablename__ = 'sensors'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    category: Mapped[str] = mapped_column(String, primary_key=True)
+    ip_address: Mapped[str] = mapped_column(String, nullable=False)
+    # JSON ou google.protobuf.Struct codificado, conforme enviado pelo sensor
+    device_metadata: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    encoded_metadata: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    availability_tolerance: Mapped[float] = mapped_column(Float, nullable=False)
+    last_seen: Mapped[datetime.datetime] = mapped_column(
+        UTCDateTime, nullable=False, default=utc_now,
+    )
+
+
+class ReadingsPartition(Base):
+    __tablename__ = 'sensors_partitions'
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    start: Mapped[int] = mapped_column(BigInteger, nullable=False, unique=True)
+    end: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    compressed: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    archive_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class LatestReading(Base):
+    __tablename__ = 'sensors_latest'
+
+    sensor_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    sensor_category: Mapped[str] = mapped_column(String, primary_key=True)
     value: Mapped[float] = mapped_column(Float, nullable=False)
-    timestamp: Mapped[datetime.datetime] = mapped_column(UTCDateTime, nullable=False)
+    # Microssegundos desde a época Unix (UTC)
+    timestamp: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            columns=['sensor_id', 'sensor_category'],
+            refcolumns=['sensors.id', 'sensors.category']
+        ),
+    )
 
-    sensor_id: Mapped[int] = mapped_column(Integer, nullable=False)
-    sensor_category: Mapped[str] = mapped_column(String, nullable=False)
+
+class SensorRollup(Base):
+    __tablename__ = 'sensors_rollups'
+
+    sensor_category: Mapped[str] = mapped_column(String, primary_key=True)
+    sensor_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    resolution: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bucket: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    min_value: Mapped[float] = mapped_column(Float, nullable=False)
+    max_value: Mapped[float] = mapped_column(Float, nullable=False)
+    sum_value: Mapped[float] = mapped_column(Float, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_value: Mapped[float] = mapped_column(Float, nullable=False)
+    last_timestamp: Mapped[int] = mapped_column(BigInteger, nullable=False)
 
     __table_args__ = (
         ForeignKeyConstraint(
             columns=['sensor_id', 'sensor_category'],
             refcolumns=['sensors.id', 'sensors.category']
         ),
-        Index('idx_readings_timestamp', timestamp.desc()),
     )
 
-    sensor: Mapped['Sensor'] = relationship(back_populates='readings')
+    @property
+    def avg_value(self):
+        return self.sum_value / self.count
 
 
 class Actuator(Base):
@@ -90,27 +130,17 @@ class Actuator(Base):
     category: Mapped[str] = mapped_column(String, primary_key=True)
     ip_address: Mapped[str] = mapped_column(String, nullable=False)
     communication_port: Mapped[int] = mapped_column(Integer, nullable=False)
-    device_state: Mapped[dict] = mapped_column(JSON, nullable=False)
-    device_metadata: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # JSON ou google.protobuf.Struct codificado, conforme enviado pelo atuador
+    device_state: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    device_metadata: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    encoded_state: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    encoded_metadata: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    metadata_hash: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    state_seq: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # Atuador aceita comandos com prefixo de tamanho em conexões persistentes
+    framed_commands: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     timestamp: Mapped[datetime.datetime] = mapped_column(UTCDateTime, nullable=False)
     availability_tolerance: Mapped[float] = mapped_column(Float, nullable=False)
-    last_seen_date: Mapped[datetime.date] = mapped_column(
-        Date, nullable=False, default=utc_today,
+    last_seen: Mapped[datetime.datetime] = mapped_column(
+        UTCDateTime, nullable=False, default=utc_now,
     )
-    last_seen_clock: Mapped[float] = mapped_column(
-        Float, nullable=False, default=time.monotonic,
-    )
-
-    def mark_as_seen(self):
-        self.last_seen_date = utc_today()
-        self.last_seen_clock = time.monotonic()
-        return
-
-    def is_online(self):
-        return (
-            self.last_seen_date == utc_today()
-            and (
-                (time.monotonic() - self.last_seen_clock)
-                <= self.availability_tolerance
-            )
-        )
@@ -0,0 +1,325 @@
+import bisect
+import datetime
+import threading
+from typing import NamedTuple
+from sqlalchemy import MetaData, Table, Column, Index, ForeignKeyConstraint
+from sqlalchemy import Integer, BigInteger, Float, String, LargeBinary
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, sessionmaker
+from .models import Sensor, ReadingsPartition, to_micros, from_micros
+
+
+PARTITION_PERIODS = ('day', 'week')
+
+MAX_CHUNK_SIZE = 1 << 16
+
+READINGS_TABLE_PREFIX = 'sensors_readings_'
+
+CHUNKS_TABLE_PREFIX = 'sensors_chunks_'
+
+partitions_metadata = MetaData()
+
+
+class Partition(NamedTuple):
+    key: str
+    # Limites em microssegundos desde a época Unix
+    start: int
+    end: int
+    # Possui blocos comprimidos (além da cauda de leituras brutas)
+    compressed: bool = False
+    # Versão do arquivo colunar (0: não arquivada)
+    archive_version: int = 0
+
+
+def readings_table(key: str):
+    table_name = f'{READINGS_TABLE_PREFIX}{key}'
+    table = partitions_metadata.tables.get(table_name)
+    if table is not None:
+        return table
+    return Table(
+        table_name,
+        partitions_metadata,
+        Column('id', Integer, primary_key=True),
+        Column('value', Float, nullable=False),
+        Column('timestamp', BigInteger, nullable=False),
+        Column('sensor_id', Integer, nullable=False),
+        Column('sensor_category', String, nullable=False),
+        ForeignKeyConstraint(
+            columns=['sensor_id', 'sensor_category'],
+            refcolumns=[Sensor.__table__.c.id, Sensor.__table__.c.category],
+        ),
+        # Cobre as consultas de histórico de um sensor (inclusive o valor)
+        Index(
+            f'idx_{table_name}_sensor_timestamp',
+            'sensor_category',
+            'sensor_id',
+            'timestamp',
+            'value',
+        ),
+        # As leituras mantêm seus ids ao serem comprimidas e arquivadas: ids
+        # removidos da tabela bruta não podem ser reaproveitados
+        sqlite_autoincrement=True,
+    )
+
+
+def chunks_table(key: str):
+    table_name = f'{CHUNKS_TABLE_PREFIX}{key}'
+    table = partitions_metadata.tables.get(table_name)
+    if table is not None:
+        return table
+    return Table(
+        table_name,
+        partitions_metadata,
+        Column('id', Integer, primary_key=True),
+        Column('sensor_id', Integer, nullable=False),
+        Column('sensor_category', String, nullable=False),
+        Column('start', BigInteger, nullable=False),
+        Column('end', BigInteger, nullable=False),
+        Column('count', Integer, nullable=False),
+        Column('data', LargeBinary, nullable=False),
+        # Ids originais das leituras (gorilla.encode_ids)
+        Column('ids', LargeBinary, nullable=False),
+        ForeignKeyConstraint(
+            columns=['sensor_id', 'sensor_category'],
+            refcolumns=[Sensor.__table__.c.id, Sensor.__table__.c.category],
+        ),
+        Index(f'idx_{table_name}_sensor_end', 'sensor_category', 'sensor_id', 'end'),
+    )
+
+
+def partition_start(timestamp: int, period: str):
+    start = from_micros(timestamp).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        start -= datetime.timedelta(days=start.weekday())
+    return start
+
+
+def partition_length(period: str):
+    return datetime.timedelta(days=7 if period == 'week' else 1)
+
+
+class PartitionManager:
+    def __init__(
+        self,
+        period: str = 'day',
+        retention: datetime.timedelta | None = None,
+        hot_window: datetime.timedelta | None = None,
+        chunk_size: int = 1024,
+        archive_window: datetime.timedelta | None = None,
+    ):
+        self.configure(period, retention, hot_window, chunk_size, archive_window)
+        self._lock = threading.Lock()
+        self._starts: list[int] = []
+        self._partitions: list[Partition] = []
+
+    def configure(
+        self,
+        period: str,
+        retention: datetime.timedelta | None,
+        hot_window: datetime.timedelta | None = None,
+        chunk_size: int = 1024,
+        archive_window: datetime.timedelta | None = None,
+    ):
+        if period not in PARTITION_PERIODS:
+            raise ValueError(f'Invalid partition period: {period}')
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f'Invalid chunk size: {chunk_size}')
+        self.period = period
+        self.retention = retention
+        self.hot_window = hot_window
+        self.chunk_size = chunk_size
+        self.archive_window = archive_window
+        return
+
+    @staticmethod
+    def catalog(session: Session):
+        stmt = select(ReadingsPartition).order_by(ReadingsPartition.start)
+        return [
+            Partition(
+                partition.key,
+                partition.start,
+                partition.end,
+                partition.compressed,
+                partition.archive_version,
+            )
+            for partition in session.scalars(stmt)
+        ]
+
+    def load(self, session_maker: sessionmaker):
+        with session_maker() as session:
+            partitions = self.catalog(session)
+        with self._lock:
+            self._partitions = partitions
+            self._starts = [partition.start for partition in partitions]
+        return
+
+    def horizon(self, now: datetime.datetime):
+        if self.retention is None:
+            return None
+        return to_micros(now - self.retention)
+
+    def find(self, timestamp: int):
+        with self._lock:
+            position = bisect.bisect_right(self._starts, timestamp) - 1
+            if position >= 0 and timestamp < self._partitions[position].end:
+                return self._partitions[position]
+            return None
+
+    def _new_partition(self, timestamp: int):
+        start_date = partition_start(timestamp, self.period)
+        start = to_micros(start_date)
+        end = to_micros(start_date + partition_length(self.period))
+        with self._lock:
+            position = bisect.bisect_right(self._starts, timestamp)
+            if position > 0:
+                start = max(start, self._partitions[position - 1].end)
+            if position < len(self._partitions):
+                end = min(end, self._partitions[position].start)
+        return Partition(from_micros(start).strftime('%Y%m%d'), start, end)
+
+    def route(self, session: Session, timestamps: list[int]):
+        created = {}
+        keys = []
+        for timestamp in timestamps:
+            partition = self.find(timestamp)
+            if partition is None:
+                partition = next(
+                    (
+                        new for new in created.values()
+                        if new.start <= timestamp < new.end
+                    ),
+                    None,
+                )
+            if partition is None:
+                partition = self._new_partition(timestamp)
+                readings_table(partition.key).create(session.connection(), checkfirst=True)
+                session.execute(
+                    sqlite_insert(ReadingsPartition).values(
+                        key=partition.key,
+                        start=partition.start,
+                        end=partition.end,
+                    ).on_conflict_do_nothing()
+                )
+                created[partition.key] = partition
+            keys.append(partition.key)
+        return keys, list(created.values())
+
+    def add(self, partitions: list[Partition]):
+        with self._lock:
+            keys = {p.key for p in self._partitions}
+            for partition in partitions:
+                if partition.key in keys:
+                    continue
+                position = bisect.bisect_right(self._starts, partition.start)
+                self._starts.insert(position, partition.start)
+                self._partitions.insert(position, partition)
+        return
+
+    def overlapping(
+        self,
+        after: int | None = None,
+        before: int | None = None,
+        session: Session | None = None,
+    ):
+        # Com uma sessão, o catálogo é lido no mesmo snapshot das leituras
+        if session is not None:
+            partitions = self.catalog(session)
+        else:
+            with self._lock:
+                partitions = list(self._partitions)
+        return [
+            partition for partition in reversed(partitions)
+            if (after is None or partition.end > after)
+            and (before is None or partition.start < before)
+        ]
+
+    def expired(self, now: datetime.datetime):
+        horizon = self.horizon(now)
+        if horizon is None:
+            return []
+        with self._lock:
+            return [
+                partition for partition in self._partitions
+                if partition.end <= horizon
+            ]
+
+    def compressible(self, now: datetime.datetime):
+        if self.hot_window is None:
+            return []
+        horizon = to_micros(now - self.hot_window)
+        archive_horizon = self.archive_horizon(now)
+        with self._lock:
+            return [
+                partition for partition in self._partitions
+                if partition.end <= horizon
+                and (archive_horizon is None or partition.end > archive_horizon)
+            ]
+
+    def archive_horizon(self, now: datetime.datetime):
+        if self.archive_window is None:
+            return None
+        return to_micros(now - self.archive_window)
+
+    def archivable(self, now: datetime.datetime):
+        horizon = self.archive_horizon(now)
+        if horizon is None:
+            return []
+        with self._lock:
+            return [
+                partition for partition in self._partitions
+                if partition.end <= horizon
+            ]
+
+    def archived(self):
+        with self._lock:
+            return {
+                (partition.key, partition.archive_version)
+                for partition in self._partitions
+                if partition.archive_version > 0
+            }
+
+    def enable_compression(self, session: Session, partition: Partition):
+        chunks_table(partition.key).create(session.connection(), checkfirst=True)
+        session.execute(
+            update(ReadingsPartition)
+            .where(ReadingsPartition.key == partition.key)
+            .values(compressed=True)
+        )
+        return partition._replace(compressed=True)
+
+    def set_archive_version(self, session: Session, partition: Partition, version: int):
+        # Os blocos comprimidos passam a fazer parte do arquivo colunar
+        chunks_table(partition.key).drop(session.connection(), checkfirst=True)
+        session.execute(
+            update(ReadingsPartition)
+            .where(ReadingsPartition.key == partition.key)
+            .values(compressed=False, archive_version=version)
+        )
+        return partition._replace(compressed=False, archive_version=version)
+
+    def replace(self, partition: Partition):
+        with self._lock:
+            self._partitions = [
+                partition if p.key == partition.key else p
+                for p in self._partitions
+            ]
+        return
+
+    def drop(self, session: Session, partition: Partition):
+        readings_table(partition.key).drop(session.connection(), checkfirst=True)
+        chunks_table(partition.key).drop(session.connection(), checkfirst=True)
+        session.execute(
+            delete(ReadingsPartition).where(ReadingsPartition.key == partition.key)
+        )
+        return
+
+    def remove(self, partitions: list[Partition]):
+        keys = {partition.key for partition in partitions}
+        with self._lock:
+            self._partitions = [p for p in self._partitions if p.key not in keys]
+            self._starts = [p.start for p in self._partitions]
+        return
+
+
+PARTITIONS = PartitionManager()
@@ -0,0 +1,128 @@
+from typing import Any, NamedTuple
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+from .models import Sensor, Actuator, DeviceCategory
+from .handles import CategoryDictionary, DEVICE_CATEGORIES
+
+
+class SensorEntry(NamedTuple):
+    ip_address: str
+    device_metadata: dict[str, Any] | None
+    encoded_metadata: bytes | None
+
+
+class ActuatorEntry(NamedTuple):
+    ip_address: str
+    communication_port: int
+    metadata_hash: int | None = None
+    framed_commands: bool = False
+
+
+class DeviceRegistry:
+    def __init__(self, categories: CategoryDictionary = DEVICE_CATEGORIES):
+        self.categories = categories
+        self._sensors: dict[tuple[int, str], SensorEntry] = {}
+        self._actuators: dict[tuple[int, str], ActuatorEntry] = {}
+
+    def load(self, session_maker: sessionmaker):
+        with session_maker() as session:
+            sensors = {
+                (sensor.id, sensor.category): SensorEntry(
+                    ip_address=sensor.ip_address,
+                    device_metadata=sensor.device_metadata,
+                    encoded_metadata=sensor.encoded_metadata,
+                )
+                for sensor in session.scalars(select(Sensor))
+            }
+            actuators = {
+                (actuator.id, actuator.category): ActuatorEntry(
+                    ip_address=actuator.ip_address,
+                    communication_port=actuator.communication_port,
+                    metadata_hash=actuator.metadata_hash,
+                    framed_commands=actuator.framed_commands,
+                )
+                for actuator in session.scalars(select(Actuator))
+            }
+            categories = {
+                category.name: category.code
+                for category in session.scalars(select(DeviceCategory))
+            }
+        self.categories.load(categories)
+        self._sensors = sensors
+        self._actuators = actuators
+        return
+
+    def add_sensor(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        ip_address: str,
+        device_metadata: dict[str, Any] | None,
+        encoded_metadata: bytes | None = None,
+    ):
+        self._sensors[(sensor_id, sensor_category)] = SensorEntry(
+            ip_address=ip_address,
+            device_metadata=device_metadata,
+            encoded_metadata=encoded_metadata,
+        )
+        return
+
+    def add_actuator(
+        self,
+        actuator_id: int,
+        actuator_category: str,
+        ip_address: str,
+        communication_port: int,
+        metadata_hash: int | None = None,
+        framed_commands: bool = False,
+    ):
+        self._actuators[(actuator_id, actuator_category)] = ActuatorEntry(
+            ip_address=ip_address,
+            communication_port=communication_port,
+            metadata_hash=metadata_hash,
+            framed_commands=framed_commands,
+        )
+        return
+
+    def set_actuator_metadata_hash(
+        self,
+        actuator_id: int,
+        actuator_category: str,
+        metadata_hash: int | None,
+    ):
+        key = (actuator_id, actuator_category)
+        actuator = self._actuators.get(key)
+        if actuator is not None:
+            self._actuators[key] = actuator._replace(metadata_hash=metadata_hash)
+        return
+
+    def has_sensor(self, sensor_id: int, sensor_category: str):
+        return (sensor_id, sensor_category) in self._sensors
+
+    def has_actuator(self, actuator_id: int, actuator_category: str):
+        return (actuator_id, actuator_category) in self._actuators
+
+    def get_sensor(self, sensor_id: int, sensor_category: str):
+        return self._sensors.get((sensor_id, sensor_category))
+
+    def get_actuator(self, actuator_id: int, actuator_category: str):
+        return self._actuators.get((actuator_id, actuator_category))
+
+    def get_actuator_metadata_hash(self, actuator_id: int, actuator_category: str):
+        actuator = self._actuators.get((actuator_id, actuator_category))
+        if actuator is None:
+            return None
+        return actuator.metadata_hash
+
+    def get_actuator_address(self, actuator_id: int, actuator_category: str):
+        actuator = self._actuators.get((actuator_id, actuator_category))
+        if actuator is None:
+            return None
+        return (actuator.ip_address, actuator.communication_port)
+
+    def has_framed_commands(self, actuator_id: int, actuator_category: str):
+        actuator = self._actuators.get((actuator_id, actuator_category))
+        return actuator is not None and actuator.framed_commands
+
+
+REGISTRY = DeviceRegistry()
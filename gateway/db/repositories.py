@@ -1,202 +1,365 @@
 import datetime
-from typing import Any
-from sqlalchemy import select
-from sqlalchemy.orm import sessionmaker
-from .sessions import SessionMaker
-from .models import Sensor, Actuator, Reading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Any, NamedTuple
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.struct_pb2 import Struct
+from .models import utc_now
+from .writer import transform
+
+
+STORAGE_BACKENDS = ('sqlite', 'memory')
+
+_storage_backend = 'sqlite'
+
+
+def init_storage(
+    backend='sqlite',
+    clear=False,
+    partition_period='day',
+    retention_days=0,
+    series_capacity=None,
+    hot_days=0,
+    chunk_size=1024,
+    archive_days=0,
+    archive_dir='archive',
+    rollup_retention_days=None,
+):
+    global _storage_backend
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f'Invalid storage backend: {backend}')
+    retention = datetime.timedelta(days=retention_days) if retention_days > 0 else None
+    hot_window = datetime.timedelta(days=hot_days) if hot_days > 0 else None
+    archive_window = datetime.timedelta(days=archive_days) if archive_days > 0 else None
+    rollup_retention = {
+        resolution: datetime.timedelta(days=days) if days > 0 else None
+        for resolution, days in (rollup_retention_days or {}).items()
+    }
+    if backend == 'memory':
+        from .memory import MEMORY_STORE
+        MEMORY_STORE.configure(retention, series_capacity, rollup_retention)
+    else:
+        from .sessions import init_db
+        init_db(
+            clear,
+            partition_period,
+            retention,
+            hot_window,
+            chunk_size,
+            archive_window,
+            archive_dir,
+            rollup_retention,
+        )
+    _storage_backend = backend
+    return
 
 
 def get_sensors_repository():
-    return SensorRepository(SessionMaker)
+    if _storage_backend == 'memory':
+        from .memory import MemorySensorRepository, MEMORY_STORE
+        return MemorySensorRepository(MEMORY_STORE)
+    from .sql import SQLSensorRepository
+    from .sessions import ReadSessionMaker
+    from .writer import DB_WRITER
+    from .registry import REGISTRY
+    from .partitions import PARTITIONS
+    from .archive import ARCHIVE
+    from .rollups import ROLLUP_RETENTION
+    return SQLSensorRepository(
+        ReadSessionMaker,
+        DB_WRITER,
+        REGISTRY,
+        PARTITIONS,
+        ARCHIVE,
+        ROLLUP_RETENTION,
+    )
 
 
 def get_actuators_repository():
-    return ActuatorRepository(SessionMaker)
+    if _storage_backend == 'memory':
+        from .memory import MemoryActuatorRepository, MEMORY_STORE
+        return MemoryActuatorRepository(MEMORY_STORE)
+    from .sql import SQLActuatorRepository
+    from .sessions import ReadSessionMaker
+    from .writer import DB_WRITER
+    from .registry import REGISTRY
+    return SQLActuatorRepository(ReadSessionMaker, DB_WRITER, REGISTRY)
+
+
+class StoredReading(NamedTuple):
+    id: int
+    value: float
+    # Microssegundos desde a época Unix (UTC)
+    timestamp: int
+
+
+class ReadingsSummary(NamedTuple):
+    count: int
+    min_value: float | None
+    max_value: float | None
+    sum_value: float
+
+    @classmethod
+    def from_values(cls, values):
+        # Aceita arrays do numpy (inclusive fatias de arquivos mapeados)
+        if len(values) == 0:
+            return EMPTY_SUMMARY
+        return cls(
+            len(values),
+            float(values.min()),
+            float(values.max()),
+            float(values.sum(dtype='float64')),
+        )
+
+    @property
+    def mean_value(self):
+        if self.count == 0:
+            return None
+        return self.sum_value / self.count
+
+    def merge(self, other: 'ReadingsSummary'):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        return ReadingsSummary(
+            self.count + other.count,
+            min(self.min_value, other.min_value),
+            max(self.max_value, other.max_value),
+            self.sum_value + other.sum_value,
+        )
+
+
+EMPTY_SUMMARY = ReadingsSummary(0, None, None, 0.0)
+
+
+def metadata_changed(
+    device_metadata: dict[str, Any] | None,
+    encoded_metadata: bytes | None,
+    metadata_hash: int | None,
+    stored_hash: int | None,
+):
+    # Metadados omitidos, ou com o mesmo hash dos armazenados, não são regravados
+    if device_metadata is None and encoded_metadata is None:
+        return False
+    return not metadata_hash or metadata_hash != stored_hash
+
 
+def apply_state_patch(
+    device_state: dict[str, Any] | None,
+    encoded_state: bytes | None,
+    delta_state: dict[str, Any] | None,
+    encoded_delta: bytes | None,
+):
+    # Retorna (dicionário, bytes codificados) do estado com o delta aplicado
+    if encoded_state is not None and encoded_delta is not None:
+        # A concatenação de dois Structs codificados mescla seus mapas
+        merged = Struct()
+        merged.ParseFromString(encoded_state + encoded_delta)
+        return None, merged.SerializeToString()
+    if encoded_state is not None:
+        state = MessageToDict(Struct.FromString(encoded_state))
+    else:
+        state = dict(device_state or {})
+    if encoded_delta is not None:
+        state.update(MessageToDict(Struct.FromString(encoded_delta)))
+    elif delta_state is not None:
+        state.update(delta_state)
+    return state, None
 
-class SensorRepository:
-    def __init__(self, session_maker: sessionmaker):
-        self.session_maker = session_maker
 
+class SensorRepository(ABC):
+    # Mutações retornam um Future resolvido após a gravação. O de add_sensor
+    # resolve para o handle numérico do dispositivo. Metadados chegam como
+    # dicionário ou como google.protobuf.Struct já codificado (encoded_*)
+
+    @abstractmethod
     def add_sensor(
         self,
         sensor_id: int,
         sensor_category: str,
         ip_address: str,
-        device_metadata: dict[str, Any],
+        device_metadata: dict[str, Any] | None,
         availability_tolerance: float = 10.0,
-    ):
-        sensor = self.get_sensor(sensor_id, sensor_category)
-        if sensor is None:
-            with self.session_maker.begin() as session:
-                sensor = Sensor(
-                    id=sensor_id,
-                    category=sensor_category,
-                    ip_address=ip_address,
-                    device_metadata=device_metadata,
-                    availability_tolerance=availability_tolerance,
-                )
-                session.add(sensor)
-        else:
-            with self.session_maker.begin() as session:
-                sensor = session.merge(sensor)
-                sensor.ip_address = ip_address
-                sensor.device_metadata = device_metadata
-                sensor.availability_tolerance = availability_tolerance
-                sensor.mark_as_seen()
-        return sensor
-
-    def get_sensor(self, sensor_id: int, sensor_category: str):
-        with self.session_maker() as session:
-            return session.get(Sensor, (sensor_id, sensor_category))
+        encoded_metadata: bytes | None = None,
+    ) -> Future: ...
+
+    @abstractmethod
+    def has_sensor(self, sensor_id: int, sensor_category: str) -> bool: ...
+
+    @abstractmethod
+    def get_sensor(self, sensor_id: int, sensor_category: str): ...
+
+    @abstractmethod
+    def get_sensor_readings_page(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None = None,
+        before: int | None = None,
+        cursor: tuple[int, int] | None = None,
+        limit: int = 100,
+    ): ...
+
+    @abstractmethod
+    def get_sensor_rollups_page(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        resolution: str,
+        after: int | None = None,
+        before: int | None = None,
+        cursor: int | None = None,
+        limit: int = 1000,
+    ): ...
+
+    @abstractmethod
+    def get_sensor_summary(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None = None,
+        before: int | None = None,
+    ) -> ReadingsSummary | None: ...
+
+    @abstractmethod
+    def get_sensor_last_reading(self, sensor_id: int, sensor_category: str): ...
+
+    @abstractmethod
+    def get_sensors_with_last_reading(self, sensor_category: str | None = None): ...
+
+    @abstractmethod
+    def get_all_sensors(self): ...
+
+    @abstractmethod
+    def get_sensors_by_category(self, sensor_category: str): ...
+
+    @abstractmethod
+    def mark_sensors_as_seen(
+        self,
+        last_seen: dict[tuple[int, str], datetime.datetime],
+    ) -> Future: ...
+
+    @abstractmethod
+    def register_sensor_readings(
+        self,
+        readings: list[tuple[int, str, float, int]],
+    ) -> Future: ...
+
+    @abstractmethod
+    def drop_expired_readings(self, now: datetime.datetime | None = None) -> Future: ...
+
+    @abstractmethod
+    def drop_expired_rollups(self, now: datetime.datetime | None = None) -> Future: ...
+
+    @abstractmethod
+    def compress_readings(self, now: datetime.datetime | None = None) -> Future: ...
+
+    @abstractmethod
+    def archive_readings(self, now: datetime.datetime | None = None) -> Future: ...
 
     def get_sensor_readings(self, sensor_id: int, sensor_category: str, limit: int = 200):
-        with self.session_maker() as session:
-            sensor = session.get(Sensor, (sensor_id, sensor_category))
-            if sensor is None:
-                return None
-            stmt = select(Reading).where(
-                Reading.sensor_id == sensor_id,
-                Reading.sensor_category == sensor_category,
-            ).order_by(Reading.timestamp.desc()).limit(limit)
-            readings = session.scalars(stmt).all()
-            readings.reverse()
-            return readings
-
-    def get_sensor_last_reading(self, sensor_id: int, sensor_category: str):
-        stmt = select(Reading).where(
-            Reading.sensor_id == sensor_id,
-            Reading.sensor_category == sensor_category,
-        ).order_by(Reading.timestamp.desc()).limit(1)
-        with self.session_maker() as session:
-            return session.scalars(stmt).first()
-
-    def get_all_sensors(self):
-        stmt = select(Sensor)
-        with self.session_maker() as session:
-            return session.scalars(stmt).all()
-
-    def get_sensors_by_category(self, sensor_category: str):
-        stmt = select(Sensor).where(Sensor.category == sensor_category)
-        with self.session_maker() as session:
-            return session.scalars(stmt).all()
-
-    def mark_sensor_as_seen(self, sensor_id: int, sensor_category: str):
-        with self.session_maker.begin() as session:
-            sensor = session.get(Sensor, (sensor_id, sensor_category))
-            if sensor is None:
-                return False
-            sensor.mark_as_seen()
-            return True
+        page = self.get_sensor_readings_page(sensor_id, sensor_category, limit=limit)
+        if page is None:
+            return None
+        return page[0]
+
+    def mark_sensor_as_seen(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        last_seen: datetime.datetime | None = None,
+    ):
+        return self.mark_sensors_as_seen({
+            (sensor_id, sensor_category): last_seen or utc_now(),
+        })
 
     def register_sensor_reading(
         self,
         sensor_id: int,
         sensor_category: str,
         reading_value: float,
-        reading_timestamp: datetime.datetime,
+        reading_timestamp: int,
     ):
-        sensor = self.get_sensor(sensor_id, sensor_category)
-        if sensor is None:
-            return False
-        with self.session_maker.begin() as session:
-            sensor = session.merge(sensor)
-            reading = Reading(
-                value=reading_value,
-                timestamp=reading_timestamp,
-                sensor_id=sensor_id,
-                sensor_category=sensor_category,
-            )
-            session.add(reading)
-            sensor.mark_as_seen()
-            return True
-
-
-class ActuatorRepository:
-    def __init__(self, session_maker: sessionmaker):
-        self.session_maker = session_maker
+        future = self.register_sensor_readings(
+            [(sensor_id, sensor_category, reading_value, reading_timestamp)]
+        )
+        return transform(future, lambda unknown_sensors: not unknown_sensors)
+
 
+class ActuatorRepository(ABC):
+    # Mutações retornam um Future resolvido após a gravação. O de add_actuator
+    # resolve para o handle numérico do dispositivo. Estado e metadados chegam
+    # como dicionário ou como google.protobuf.Struct já codificado (encoded_*).
+    # Em register_actuator_update os metadados podem ser omitidos (None) e,
+    # com state_delta, o estado contém apenas as chaves alteradas desde
+    # base_seq. O Future resolve para False se o delta não pôde ser aplicado
+    # por uma lacuna na sequência de estados
+
+    @abstractmethod
     def add_actuator(
         self,
         actuator_id: int,
         actuator_category: str,
         ip_address: str,
         communication_port: int,
-        device_state: dict[str, Any],
-        device_metadata: dict[str, Any],
+        device_state: dict[str, Any] | None,
+        device_metadata: dict[str, Any] | None,
         timestamp: datetime.datetime,
         availability_tolerance: float = 10.0,
-    ):
-        actuator = self.get_actuator(actuator_id, actuator_category)
-        if actuator is None:
-            with self.session_maker.begin() as session:
-                actuator = Actuator(
-                    id=actuator_id,
-                    category=actuator_category,
-                    ip_address=ip_address,
-                    communication_port=communication_port,
-                    device_state=device_state,
-                    device_metadata=device_metadata,
-                    timestamp=timestamp,
-                    availability_tolerance=availability_tolerance,
-                )
-                session.add(actuator)
-        else:
-            with self.session_maker.begin() as session:
-                actuator = session.merge(actuator)
-                actuator.ip_address = ip_address
-                actuator.communication_port = communication_port
-                actuator.device_state = device_state
-                actuator.device_metadata = device_metadata
-                actuator.timestamp = timestamp
-                actuator.availability_tolerance = availability_tolerance
-        return actuator
-
-    def get_actuator(self, actuator_id: int, actuator_category: str):
-        with self.session_maker() as session:
-            return session.get(Actuator, (actuator_id, actuator_category))
-
-    # def get_actuator_by_address(self, ip_address: str, communication_port: int):
-    #     stmt = select(Actuator).where(
-    #         Actuator.ip_address == ip_address,
-    #         Actuator.communication_port == communication_port,
-    #     ).limit(1)
-    #     with self.session_maker() as session:
-    #         return session.scalars(stmt).first()
-
-    def get_all_actuators(self):
-        stmt = select(Actuator)
-        with self.session_maker() as session:
-            return session.scalars(stmt).all()
-
-    def get_actuators_by_category(self, actuator_category: str):
-        stmt = select(Actuator).where(Actuator.category == actuator_category)
-        with self.session_maker() as session:
-            return session.scalars(stmt).all()
-
-    def mark_actuator_as_seen(self, actuator_id: int, actuator_category: str):
-        with self.session_maker.begin() as session:
-            actuator = session.get(Actuator, (actuator_id, actuator_category))
-            if actuator is None:
-                return False
-            actuator.mark_as_seen()
-            return True
+        encoded_state: bytes | None = None,
+        encoded_metadata: bytes | None = None,
+        metadata_hash: int | None = None,
+        state_seq: int | None = None,
+        framed_commands: bool = False,
+    ) -> Future: ...
+
+    @abstractmethod
+    def has_actuator(self, actuator_id: int, actuator_category: str) -> bool: ...
+
+    @abstractmethod
+    def get_actuator_address(self, actuator_id: int, actuator_category: str): ...
+
+    @abstractmethod
+    def has_framed_commands(self, actuator_id: int, actuator_category: str) -> bool: ...
+
+    @abstractmethod
+    def get_actuator(self, actuator_id: int, actuator_category: str): ...
 
+    @abstractmethod
+    def get_all_actuators(self): ...
+
+    @abstractmethod
+    def get_actuators_by_category(self, actuator_category: str): ...
+
+    @abstractmethod
+    def mark_actuators_as_seen(
+        self,
+        last_seen: dict[tuple[int, str], datetime.datetime],
+    ) -> Future: ...
+
+    @abstractmethod
     def register_actuator_update(
         self,
         actuator_id: int,
         actuator_category: str,
-        device_state: dict[str, Any],
-        device_metadata: dict[str, Any],
+        device_state: dict[str, Any] | None,
+        device_metadata: dict[str, Any] | None,
         timestamp: datetime.datetime,
+        encoded_state: bytes | None = None,
+        encoded_metadata: bytes | None = None,
+        metadata_hash: int | None = None,
+        state_seq: int | None = None,
+        state_delta: bool = False,
+        base_seq: int = 0,
+    ) -> Future: ...
+
+    def mark_actuator_as_seen(
+        self,
+        actuator_id: int,
+        actuator_category: str,
+        last_seen: datetime.datetime | None = None,
     ):
-        with self.session_maker.begin() as session:
-            actuator = session.get(Actuator, (actuator_id, actuator_category))
-            if actuator is None:
-                return False
-            if timestamp > actuator.timestamp:
-                actuator.device_state = device_state
-                actuator.device_metadata = device_metadata
-                actuator.timestamp = timestamp
-                actuator.mark_as_seen()
-            return True
+        return self.mark_actuators_as_seen({
+            (actuator_id, actuator_category): last_seen or utc_now(),
+        })
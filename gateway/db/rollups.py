@@ -0,0 +1,83 @@
+import datetime
+from .models import MICROSECOND, to_micros
+
+
+# Resoluções em ordem crescente de granularidade
+ROLLUP_RESOLUTIONS = {
+    '1m': datetime.timedelta(minutes=1),
+    '1h': datetime.timedelta(hours=1),
+    '1d': datetime.timedelta(days=1),
+}
+
+
+def build_rollup_rows(readings: list[dict]):
+    rollups = {}
+    for resolution in ROLLUP_RESOLUTIONS.values():
+        seconds = int(resolution.total_seconds())
+        micros = resolution // MICROSECOND
+        for reading in readings:
+            key = (
+                reading['sensor_category'],
+                reading['sensor_id'],
+                seconds,
+                reading['timestamp'] - reading['timestamp'] % micros,
+            )
+            value = reading['value']
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollups[key] = {
+                    'sensor_category': key[0],
+                    'sensor_id': key[1],
+                    'resolution': key[2],
+                    'bucket': key[3],
+                    'min_value': value,
+                    'max_value': value,
+                    'sum_value': value,
+                    'count': 1,
+                    'last_value': value,
+                    'last_timestamp': reading['timestamp'],
+                }
+                continue
+            rollup['min_value'] = min(rollup['min_value'], value)
+            rollup['max_value'] = max(rollup['max_value'], value)
+            rollup['sum_value'] += value
+            rollup['count'] += 1
+            if reading['timestamp'] >= rollup['last_timestamp']:
+                rollup['last_value'] = value
+                rollup['last_timestamp'] = reading['timestamp']
+    return list(rollups.values())
+
+
+def choose_resolution(span: datetime.timedelta, points: int):
+    # A resolução mais grossa que ainda fornece ao menos `points` intervalos
+    for name, resolution in reversed(ROLLUP_RESOLUTIONS.items()):
+        if span / resolution >= points:
+            return name
+    return 'raw'
+
+
+class RollupRetention:
+    def __init__(self, windows: dict[str, datetime.timedelta | None] | None = None):
+        self.configure(windows or {})
+
+    def configure(self, windows: dict[str, datetime.timedelta | None]):
+        unknown = set(windows) - set(ROLLUP_RESOLUTIONS)
+        if unknown:
+            raise ValueError(f'Invalid rollup resolutions: {sorted(unknown)}')
+        self.windows = dict(windows)
+        return
+
+    def horizons(self, now: datetime.datetime):
+        # Resolução (em segundos) -> último intervalo expirado, isto é, o
+        # último que termina antes do horizonte de retenção
+        horizons = {}
+        for name, window in self.windows.items():
+            if window is None:
+                continue
+            resolution = ROLLUP_RESOLUTIONS[name]
+            seconds = int(resolution.total_seconds())
+            horizons[seconds] = to_micros(now - window) - resolution // MICROSECOND
+        return horizons
+
+
+ROLLUP_RETENTION = RollupRetention()
@@ -1,27 +1,91 @@
 import os
+import datetime
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from .models import Base
+from .registry import REGISTRY
+from .partitions import PARTITIONS
+from .archive import ARCHIVE
+from .rollups import ROLLUP_RETENTION
 
 
 DB_FILE = 'local.db'
 
-ENGINE = create_engine(
-    f'sqlite:///{DB_FILE}',
-    connect_args={'check_same_thread': False},
-)
 
-SessionMaker = sessionmaker(ENGINE)
+def create_write_engine(db_file):
+    engine = create_engine(
+        f'sqlite:///{db_file}',
+        connect_args={'check_same_thread': False},
+    )
 
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        # Transações controladas pelo SQLAlchemy (necessário para SAVEPOINT)
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
 
-def init_db(clear=False):
+    @event.listens_for(engine, 'begin')
+    def on_begin(connection):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+    return engine
+
+
+def create_read_engine(db_file):
+    engine = create_engine(
+        f'sqlite:///file:{db_file}?mode=ro&uri=true',
+        connect_args={'check_same_thread': False},
+    )
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def on_begin(connection):
+        # Todas as consultas de uma sessão de leitura veem o mesmo snapshot
+        connection.exec_driver_sql('BEGIN')
+
+    return engine
+
+
+ENGINE = create_write_engine(DB_FILE)
+
+READ_ENGINE = create_read_engine(DB_FILE)
+
+SessionMaker = sessionmaker(ENGINE, expire_on_commit=False)
+
+ReadSessionMaker = sessionmaker(READ_ENGINE)
+
+
+def init_db(
+    clear=False,
+    partition_period='day',
+    retention: datetime.timedelta | None = None,
+    hot_window: datetime.timedelta | None = None,
+    chunk_size=1024,
+    archive_window: datetime.timedelta | None = None,
+    archive_dir='archive',
+    rollup_retention: dict[str, datetime.timedelta | None] | None = None,
+):
     db_file = Path(DB_FILE).resolve()
-    if clear and db_file.is_file():
-        os.remove(db_file)
+    ARCHIVE.configure(archive_dir)
+    if clear:
+        for path in (db_file, Path(f'{db_file}-wal'), Path(f'{db_file}-shm')):
+            if path.is_file():
+                os.remove(path)
+        ARCHIVE.clear()
     Base.metadata.create_all(ENGINE)
+    REGISTRY.load(ReadSessionMaker)
+    PARTITIONS.configure(partition_period, retention, hot_window, chunk_size, archive_window)
+    PARTITIONS.load(ReadSessionMaker)
+    ROLLUP_RETENTION.configure(rollup_retention or {})
     return
 
 
 def get_session():
-    return SessionMaker()
+    return ReadSessionMaker()
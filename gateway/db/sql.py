@@ -0,0 +1,900 @@
+import datetime
+from typing import Any
+import numpy as np
+from sqlalchemy import select, insert, update, delete, and_, or_, case, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import sessionmaker
+from .writer import DatabaseWriter, completed, transform
+from .registry import DeviceRegistry
+from .repositories import SensorRepository, ActuatorRepository, StoredReading
+from .repositories import ReadingsSummary, EMPTY_SUMMARY
+from .repositories import metadata_changed, apply_state_patch
+from .models import Sensor, Actuator, LatestReading, SensorRollup, DeviceCategory
+from .models import utc_now
+from .partitions import Partition, PartitionManager, readings_table, chunks_table
+from .gorilla import encode_chunk, decode_chunk, encode_ids, decode_ids
+from .archive import ArchiveStore
+from .rollups import ROLLUP_RESOLUTIONS, RollupRetention, build_rollup_rows
+
+
+def category_code(session, category: str):
+    code = session.scalar(
+        select(DeviceCategory.code).where(DeviceCategory.name == category)
+    )
+    if code is None:
+        row = DeviceCategory(name=category)
+        session.add(row)
+        session.flush()
+        code = row.code
+    return code
+
+
+class SQLSensorRepository(SensorRepository):
+    def __init__(
+        self,
+        session_maker: sessionmaker,
+        writer: DatabaseWriter,
+        registry: DeviceRegistry,
+        partitions: PartitionManager,
+        archive: ArchiveStore,
+        rollup_retention: RollupRetention,
+    ):
+        self.session_maker = session_maker
+        self.writer = writer
+        self.registry = registry
+        self.partitions = partitions
+        self.archive = archive
+        self.rollup_retention = rollup_retention
+
+    def add_sensor(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        ip_address: str,
+        device_metadata: dict[str, Any] | None,
+        availability_tolerance: float = 10.0,
+        encoded_metadata: bytes | None = None,
+    ):
+        def operation(session):
+            sensor = session.get(Sensor, (sensor_id, sensor_category))
+            if sensor is None:
+                sensor = Sensor(
+                    id=sensor_id,
+                    category=sensor_category,
+                    ip_address=ip_address,
+                    device_metadata=device_metadata,
+                    encoded_metadata=encoded_metadata,
+                    availability_tolerance=availability_tolerance,
+                )
+                session.add(sensor)
+            else:
+                sensor.ip_address = ip_address
+                sensor.device_metadata = device_metadata
+                sensor.encoded_metadata = encoded_metadata
+                sensor.availability_tolerance = availability_tolerance
+                sensor.last_seen = utc_now()
+            return category_code(session, sensor_category)
+        def on_commit(code):
+            self.registry.categories.add(sensor_category, code)
+            self.registry.add_sensor(
+                sensor_id=sensor_id,
+                sensor_category=sensor_category,
+                ip_address=ip_address,
+                device_metadata=device_metadata,
+                encoded_metadata=encoded_metadata,
+            )
+        future = self.writer.submit(operation, on_commit)
+        return transform(
+            future,
+            lambda _: self.registry.categories.handle(sensor_id, sensor_category),
+        )
+
+    def has_sensor(self, sensor_id: int, sensor_category: str):
+        return self.registry.has_sensor(sensor_id, sensor_category)
+
+    def get_sensor(self, sensor_id: int, sensor_category: str):
+        if not self.registry.has_sensor(sensor_id, sensor_category):
+            return None
+        with self.session_maker() as session:
+            return session.get(Sensor, (sensor_id, sensor_category))
+
+    def get_sensor_readings_page(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None = None,
+        before: int | None = None,
+        cursor: tuple[int, int] | None = None,
+        limit: int = 100,
+    ):
+        if not self.registry.has_sensor(sensor_id, sensor_category):
+            return None
+        # Partições são disjuntas no tempo: percorre da mais recente para a
+        # mais antiga e para assim que a página estiver completa
+        readings = []
+        with self.session_maker() as session:
+            for partition in self.partitions.overlapping(after, before, session):
+                if cursor is not None and partition.start > cursor[0]:
+                    continue
+                needed = limit + 1 - len(readings)
+                args = (partition, sensor_id, sensor_category, after, before, cursor, needed)
+                tiers = [self._raw_readings(session, *args)]
+                if partition.compressed:
+                    tiers.append(self._compressed_readings(session, *args))
+                if partition.archive_version:
+                    tiers.append(self._archived_readings(*args))
+                if len(tiers) > 1:
+                    partition_readings = sorted(
+                        (reading for tier in tiers for reading in tier),
+                        key=lambda reading: (reading.timestamp, reading.id),
+                        reverse=True,
+                    )[:needed]
+                else:
+                    partition_readings = tiers[0]
+                readings.extend(partition_readings)
+                if len(readings) > limit:
+                    break
+        next_cursor = None
+        if len(readings) > limit:
+            readings = readings[:limit]
+            next_cursor = (readings[-1].timestamp, readings[-1].id)
+        readings.reverse()
+        return readings, next_cursor
+
+    def _raw_readings(
+        self,
+        session,
+        partition: Partition,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None,
+        before: int | None,
+        cursor: tuple[int, int] | None,
+        limit: int,
+    ):
+        table = readings_table(partition.key)
+        stmt = select(
+            table.c.id,
+            table.c.value,
+            table.c.timestamp,
+        ).where(
+            table.c.sensor_category == sensor_category,
+            table.c.sensor_id == sensor_id,
+        )
+        if after is not None:
+            stmt = stmt.where(table.c.timestamp >= after)
+        if before is not None:
+            stmt = stmt.where(table.c.timestamp < before)
+        if cursor is not None:
+            cursor_timestamp, cursor_id = cursor
+            stmt = stmt.where(
+                table.c.timestamp <= cursor_timestamp,
+                or_(
+                    table.c.timestamp < cursor_timestamp,
+                    table.c.id < cursor_id,
+                ),
+            )
+        stmt = stmt.order_by(
+            table.c.timestamp.desc(),
+            table.c.id.desc(),
+        ).limit(limit)
+        return [StoredReading(*row) for row in session.execute(stmt)]
+
+    def _compressed_readings(
+        self,
+        session,
+        partition: Partition,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None,
+        before: int | None,
+        cursor: tuple[int, int] | None,
+        limit: int,
+    ):
+        table = chunks_table(partition.key)
+        stmt = select(
+            table.c.end,
+            table.c.count,
+            table.c.data,
+            table.c.ids,
+        ).where(
+            table.c.sensor_category == sensor_category,
+            table.c.sensor_id == sensor_id,
+        )
+        if after is not None:
+            stmt = stmt.where(table.c.end >= after)
+        if before is not None:
+            stmt = stmt.where(table.c.start < before)
+        if cursor is not None:
+            stmt = stmt.where(table.c.start <= cursor[0])
+        stmt = stmt.order_by(table.c.end.desc())
+        samples = []
+        for chunk in session.execute(stmt):
+            # Blocos podem se sobrepor (leituras atrasadas), por isso a
+            # ordenação pelo fim do bloco
+            if len(samples) >= limit and chunk.end < samples[limit - 1][0]:
+                break
+            timestamps, values = decode_chunk(chunk.data, chunk.count)
+            ids = decode_ids(chunk.ids, chunk.count)
+            for micros, value, reading_id in zip(timestamps, values, ids):
+                if after is not None and micros < after:
+                    continue
+                if before is not None and micros >= before:
+                    continue
+                if cursor is not None and (micros, reading_id) >= cursor:
+                    continue
+                samples.append((micros, reading_id, value))
+            samples.sort(reverse=True)
+            del samples[limit:]
+        return [
+            StoredReading(reading_id, value, micros)
+            for micros, reading_id, value in samples
+        ]
+
+    def _archived_readings(
+        self,
+        partition: Partition,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None,
+        before: int | None,
+        cursor: tuple[int, int] | None,
+        limit: int,
+    ):
+        archive = self.archive.open(
+            partition.key,
+            partition.archive_version,
+            sensor_id,
+            sensor_category,
+        )
+        if archive is None:
+            return []
+        low, high = archive.span(after, before, cursor)
+        low = max(low, high - limit)
+        # Fatias dos arquivos mapeados: só as leituras da página são copiadas
+        timestamps = archive.timestamps[low:high].tolist()
+        values = archive.values[low:high].astype(np.float64).tolist()
+        ids = archive.ids[low:high].tolist()
+        return [
+            StoredReading(reading_id, value, micros)
+            for micros, value, reading_id in reversed(list(zip(timestamps, values, ids)))
+        ]
+
+    def get_sensor_summary(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None = None,
+        before: int | None = None,
+    ):
+        if not self.registry.has_sensor(sensor_id, sensor_category):
+            return None
+        summary = EMPTY_SUMMARY
+        with self.session_maker() as session:
+            for partition in self.partitions.overlapping(after, before, session):
+                args = (partition, sensor_id, sensor_category, after, before)
+                summary = summary.merge(self._raw_summary(session, *args))
+                if partition.compressed:
+                    summary = summary.merge(self._compressed_summary(session, *args))
+                if partition.archive_version:
+                    summary = summary.merge(self._archived_summary(*args))
+        return summary
+
+    def _raw_summary(
+        self,
+        session,
+        partition: Partition,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None,
+        before: int | None,
+    ):
+        table = readings_table(partition.key)
+        stmt = select(
+            func.count(table.c.value),
+            func.min(table.c.value),
+            func.max(table.c.value),
+            func.coalesce(func.sum(table.c.value), 0.0),
+        ).where(
+            table.c.sensor_category == sensor_category,
+            table.c.sensor_id == sensor_id,
+        )
+        if after is not None:
+            stmt = stmt.where(table.c.timestamp >= after)
+        if before is not None:
+            stmt = stmt.where(table.c.timestamp < before)
+        return ReadingsSummary(*session.execute(stmt).one())
+
+    def _compressed_summary(
+        self,
+        session,
+        partition: Partition,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None,
+        before: int | None,
+    ):
+        table = chunks_table(partition.key)
+        stmt = select(table.c.count, table.c.data).where(
+            table.c.sensor_category == sensor_category,
+            table.c.sensor_id == sensor_id,
+        )
+        if after is not None:
+            stmt = stmt.where(table.c.end >= after)
+        if before is not None:
+            stmt = stmt.where(table.c.start < before)
+        summary = EMPTY_SUMMARY
+        for chunk in session.execute(stmt):
+            timestamps, values = decode_chunk(chunk.data, chunk.count)
+            timestamps = np.array(timestamps, dtype=np.int64)
+            mask = np.ones(len(timestamps), dtype=bool)
+            if after is not None:
+                mask &= timestamps >= after
+            if before is not None:
+                mask &= timestamps < before
+            summary = summary.merge(ReadingsSummary.from_values(np.array(values)[mask]))
+        return summary
+
+    def _archived_summary(
+        self,
+        partition: Partition,
+        sensor_id: int,
+        sensor_category: str,
+        after: int | None,
+        before: int | None,
+    ):
+        archive = self.archive.open(
+            partition.key,
+            partition.archive_version,
+            sensor_id,
+            sensor_category,
+        )
+        if archive is None:
+            return EMPTY_SUMMARY
+        low, high = archive.span(after, before)
+        return ReadingsSummary.from_values(archive.values[low:high])
+
+    def get_sensor_rollups_page(
+        self,
+        sensor_id: int,
+        sensor_category: str,
+        resolution: str,
+        after: int | None = None,
+        before: int | None = None,
+        cursor: int | None = None,
+        limit: int = 1000,
+    ):
+        if not self.registry.has_sensor(sensor_id, sensor_category):
+            return None
+        seconds = int(ROLLUP_RESOLUTIONS[resolution].total_seconds())
+        stmt = select(SensorRollup).where(
+            SensorRollup.sensor_category == sensor_category,
+            SensorRollup.sensor_id == sensor_id,
+            SensorRollup.resolution == seconds,
+        )
+        if after is not None:
+            stmt = stmt.where(SensorRollup.bucket >= after)
+        if before is not None:
+            stmt = stmt.where(SensorRollup.bucket < before)
+        if cursor is not None:
+            stmt = stmt.where(SensorRollup.bucket < cursor)
+        stmt = stmt.order_by(SensorRollup.bucket.desc()).limit(limit + 1)
+        with self.session_maker() as session:
+            rollups = session.scalars(stmt).all()
+        next_cursor = None
+        if len(rollups) > limit:
+            rollups = rollups[:limit]
+            next_cursor = rollups[-1].bucket
+        rollups.reverse()
+        return rollups, next_cursor
+
+    def get_sensor_last_reading(self, sensor_id: int, sensor_category: str):
+        with self.session_maker() as session:
+            return session.get(LatestReading, (sensor_id, sensor_category))
+
+    def get_sensors_with_last_reading(self, sensor_category: str | None = None):
+        stmt = select(Sensor, LatestReading).outerjoin(
+            LatestReading,
+            and_(
+                LatestReading.sensor_id == Sensor.id,
+                LatestReading.sensor_category == Sensor.category,
+            ),
+        )
+        if sensor_category is not None:
+            stmt = stmt.where(Sensor.category == sensor_category)
+        with self.session_maker() as session:
+            return session.execute(stmt).all()
+
+    def get_all_sensors(self):
+        stmt = select(Sensor)
+        with self.session_maker() as session:
+            return session.scalars(stmt).all()
+
+    def get_sensors_by_category(self, sensor_category: str):
+        stmt = select(Sensor).where(Sensor.category == sensor_category)
+        with self.session_maker() as session:
+            return session.scalars(stmt).all()
+
+    def mark_sensors_as_seen(
+        self,
+        last_seen: dict[tuple[int, str], datetime.datetime],
+    ):
+        rows = [
+            {'id': sensor_id, 'category': sensor_category, 'last_seen': timestamp}
+            for (sensor_id, sensor_category), timestamp in last_seen.items()
+            if self.registry.has_sensor(sensor_id, sensor_category)
+        ]
+        if not rows:
+            return completed(False)
+        def operation(session):
+            session.execute(update(Sensor), rows)
+            return True
+        return self.writer.submit(operation)
+
+    def register_sensor_readings(
+        self,
+        readings: list[tuple[int, str, float, int]],
+    ):
+        sensors_keys = {(sensor_id, sensor_category) for sensor_id, sensor_category, *_ in readings}
+        known_keys = {key for key in sensors_keys if self.registry.has_sensor(*key)}
+        unknown_keys = sensors_keys - known_keys
+        # Leituras anteriores ao horizonte de retenção seriam descartadas
+        # junto com a partição na próxima manutenção
+        horizon = self.partitions.horizon(utc_now())
+        rows = []
+        latest = {}
+        for sensor_id, sensor_category, reading_value, reading_timestamp in readings:
+            key = (sensor_id, sensor_category)
+            if key not in known_keys:
+                continue
+            if horizon is not None and reading_timestamp < horizon:
+                continue
+            row = {
+                'value': reading_value,
+                'timestamp': reading_timestamp,
+                'sensor_id': sensor_id,
+                'sensor_category': sensor_category,
+            }
+            rows.append(row)
+            if key not in latest or reading_timestamp > latest[key]['timestamp']:
+                latest[key] = row
+        if not rows:
+            return completed(unknown_keys)
+        latest_stmt = sqlite_insert(LatestReading)
+        latest_stmt = latest_stmt.on_conflict_do_update(
+            index_elements=[LatestReading.sensor_id, LatestReading.sensor_category],
+            set_={
+                'value': latest_stmt.excluded.value,
+                'timestamp': latest_stmt.excluded.timestamp,
+            },
+            # Leituras fora de ordem não sobrescrevem uma leitura mais recente
+            where=latest_stmt.excluded.timestamp > LatestReading.timestamp,
+        )
+        rollup_stmt = sqlite_insert(SensorRollup)
+        excluded = rollup_stmt.excluded
+        rollup_stmt = rollup_stmt.on_conflict_do_update(
+            index_elements=[
+                SensorRollup.sensor_category,
+                SensorRollup.sensor_id,
+                SensorRollup.resolution,
+                SensorRollup.bucket,
+            ],
+            set_={
+                'min_value': func.min(SensorRollup.min_value, excluded.min_value),
+                'max_value': func.max(SensorRollup.max_value, excluded.max_value),
+                'sum_value': SensorRollup.sum_value + excluded.sum_value,
+                'count': SensorRollup.count + excluded.count,
+                'last_value': case(
+                    (
+                        excluded.last_timestamp >= SensorRollup.last_timestamp,
+                        excluded.last_value,
+                    ),
+                    else_=SensorRollup.last_value,
+                ),
+                'last_timestamp': func.max(
+                    SensorRollup.last_timestamp,
+                    excluded.last_timestamp,
+                ),
+            },
+        )
+        created = []
+        def operation(session):
+            keys, new_partitions = self.partitions.route(
+                session,
+                [row['timestamp'] for row in rows],
+            )
+            created.extend(new_partitions)
+            partitioned_rows = {}
+            for key, row in zip(keys, rows):
+                partitioned_rows.setdefault(key, []).append(row)
+            for key, partition_rows in partitioned_rows.items():
+                session.execute(insert(readings_table(key)), partition_rows)
+            session.execute(latest_stmt, list(latest.values()))
+            session.execute(rollup_stmt, build_rollup_rows(rows))
+            return unknown_keys
+        def on_commit(_):
+            self.partitions.add(created)
+        return self.writer.submit(operation, on_commit)
+
+    def drop_expired_readings(self, now: datetime.datetime | None = None):
+        expired = self.partitions.expired(now or utc_now())
+        if not expired:
+            return completed(0)
+        def operation(session):
+            count = 0
+            for partition in expired:
+                table = readings_table(partition.key)
+                count += session.scalar(select(func.count()).select_from(table)) or 0
+                if partition.compressed:
+                    chunks = chunks_table(partition.key)
+                    count += session.scalar(select(func.sum(chunks.c.count))) or 0
+                count += self.archive.count(partition.key, partition.archive_version)
+                self.partitions.drop(session, partition)
+            return count
+        def on_commit(_):
+            # Os arquivos colunares das partições descartadas deixam de ser
+            # referenciados e são removidos por archive_readings
+            self.partitions.remove(expired)
+        return self.writer.submit(operation, on_commit)
+
+    def drop_expired_rollups(self, now: datetime.datetime | None = None):
+        horizons = self.rollup_retention.horizons(now or utc_now())
+        if not horizons:
+            return completed(0)
+        def operation(session):
+            count = 0
+            for resolution, horizon in horizons.items():
+                count += session.execute(
+                    delete(SensorRollup).where(
+                        SensorRollup.resolution == resolution,
+                        SensorRollup.bucket <= horizon,
+                    )
+                ).rowcount
+            return count
+        return self.writer.submit(operation)
+
+    def compress_readings(self, now: datetime.datetime | None = None):
+        count = 0
+        for partition in self.partitions.compressible(now or utc_now()):
+            if not partition.compressed:
+                def operation(session, partition=partition):
+                    return self.partitions.enable_compression(session, partition)
+                partition = self.writer.submit(operation, self.partitions.replace).result()
+            table = readings_table(partition.key)
+            with self.session_maker() as session:
+                sensors = session.execute(
+                    select(table.c.sensor_id, table.c.sensor_category).distinct()
+                ).all()
+            for sensor_id, sensor_category in sensors:
+                count += self._compress_sensor(partition, sensor_id, sensor_category).result()
+        return completed(count)
+
+    def _compress_sensor(self, partition: Partition, sensor_id: int, sensor_category: str):
+        table = readings_table(partition.key)
+        stmt = select(
+            table.c.id,
+            table.c.value,
+            table.c.timestamp,
+        ).where(
+            table.c.sensor_category == sensor_category,
+            table.c.sensor_id == sensor_id,
+        ).order_by(table.c.timestamp, table.c.id)
+        with self.session_maker() as session:
+            readings = session.execute(stmt).all()
+        if not readings:
+            return completed(0)
+        # Leituras que chegarem durante a compressão têm ids maiores e
+        # permanecem na tabela bruta até a próxima passagem
+        last_id = max(reading.id for reading in readings)
+        chunk_size = self.partitions.chunk_size
+        chunks = []
+        for start in range(0, len(readings), chunk_size):
+            chunk = readings[start:start + chunk_size]
+            chunks.append({
+                'sensor_id': sensor_id,
+                'sensor_category': sensor_category,
+                'start': chunk[0].timestamp,
+                'end': chunk[-1].timestamp,
+                'count': len(chunk),
+                'data': encode_chunk(
+                    [reading.timestamp for reading in chunk],
+                    [reading.value for reading in chunk],
+                ),
+                'ids': encode_ids([reading.id for reading in chunk]),
+            })
+        def operation(session):
+            session.execute(insert(chunks_table(partition.key)), chunks)
+            session.execute(
+                delete(table).where(
+                    table.c.sensor_category == sensor_category,
+                    table.c.sensor_id == sensor_id,
+                    table.c.id <= last_id,
+                )
+            )
+            return len(readings)
+        return self.writer.submit(operation)
+
+    def archive_readings(self, now: datetime.datetime | None = None):
+        count = 0
+        for partition in self.partitions.archivable(now or utc_now()):
+            count += self._archive_partition(partition).result()
+        self.archive.collect(self.partitions.archived())
+        return completed(count)
+
+    def _archive_partition(self, partition: Partition):
+        table = readings_table(partition.key)
+        version = partition.archive_version + 1
+        count = 0
+        # Versão atual do arquivo, blocos e cauda bruta lidos no mesmo snapshot
+        with self.session_maker() as session:
+            last_id = session.scalar(select(func.max(table.c.id)))
+            if last_id is None and not partition.compressed:
+                return completed(0)
+            sensors = set(self.archive.sensors(partition.key, partition.archive_version))
+            sensors.update(
+                session.execute(
+                    select(table.c.sensor_id, table.c.sensor_category).distinct()
+                ).all()
+            )
+            if partition.compressed:
+                chunks = chunks_table(partition.key)
+                sensors.update(
+                    session.execute(
+                        select(chunks.c.sensor_id, chunks.c.sensor_category).distinct()
+                    ).all()
+                )
+            staging = self.archive.begin_version(partition.key, version)
+            for sensor_id, sensor_category in sorted(sensors):
+                timestamps = []
+                values = []
+                ids = []
+                archive = self.archive.open(
+                    partition.key,
+                    partition.archive_version,
+                    sensor_id,
+                    sensor_category,
+                )
+                if archive is not None:
+                    timestamps.append(archive.timestamps)
+                    values.append(archive.values)
+                    ids.append(archive.ids)
+                if partition.compressed:
+                    for chunk in session.execute(
+                        select(chunks.c.count, chunks.c.data, chunks.c.ids).where(
+                            chunks.c.sensor_category == sensor_category,
+                            chunks.c.sensor_id == sensor_id,
+                        ).order_by(chunks.c.id.desc())
+                    ):
+                        chunk_timestamps, chunk_values = decode_chunk(chunk.data, chunk.count)
+                        timestamps.append(np.array(chunk_timestamps, dtype=np.int64))
+                        values.append(np.array(chunk_values, dtype=np.float32))
+                        ids.append(np.array(decode_ids(chunk.ids, chunk.count), dtype=np.int64))
+                        count += chunk.count
+                rows = session.execute(
+                    select(table.c.id, table.c.timestamp, table.c.value).where(
+                        table.c.sensor_category == sensor_category,
+                        table.c.sensor_id == sensor_id,
+                    ).order_by(table.c.timestamp, table.c.id)
+                ).all()
+                if rows:
+                    timestamps.append(
+                        np.fromiter((row.timestamp for row in rows), np.int64, len(rows))
+                    )
+                    values.append(np.fromiter((row.value for row in rows), np.float32, len(rows)))
+                    ids.append(np.fromiter((row.id for row in rows), np.int64, len(rows)))
+                    count += len(rows)
+                if not timestamps:
+                    continue
+                sensor_timestamps = np.concatenate(timestamps)
+                sensor_values = np.concatenate(values)
+                sensor_ids = np.concatenate(ids)
+                # Mesma ordem das páginas: (timestamp, id)
+                order = np.lexsort((sensor_ids, sensor_timestamps))
+                self.archive.write_sensor(
+                    staging,
+                    sensor_id,
+                    sensor_category,
+                    sensor_timestamps[order],
+                    sensor_values[order],
+                    sensor_ids[order],
+                )
+        self.archive.publish_version(staging, partition.key, version)
+        # Leituras que chegarem durante o arquivamento têm ids maiores e
+        # permanecem na tabela bruta até a próxima passagem
+        def operation(session):
+            if last_id is not None:
+                session.execute(delete(table).where(table.c.id <= last_id))
+            return self.partitions.set_archive_version(session, partition, version)
+        future = self.writer.submit(operation, self.partitions.replace)
+        return transform(future, lambda _: count)
+
+
+class SQLActuatorRepository(ActuatorRepository):
+    def __init__(
+        self,
+        session_maker: sessionmaker,
+        writer: DatabaseWriter,
+        registry: DeviceRegistry,
+    ):
+        self.session_maker = session_maker
+        self.writer = writer
+        self.registry = registry
+
+    def add_actuator(
+        self,
+        actuator_id: int,
+        actuator_category: str,
+        ip_address: str,
+        communication_port: int,
+        device_state: dict[str, Any] | None,
+        device_metadata: dict[str, Any] | None,
+        timestamp: datetime.datetime,
+        availability_tolerance: float = 10.0,
+        encoded_state: bytes | None = None,
+        encoded_metadata: bytes | None = None,
+        metadata_hash: int | None = None,
+        state_seq: int | None = None,
+        framed_commands: bool = False,
+    ):
+        metadata_hash = metadata_hash or None
+        state_seq = state_seq or None
+        def operation(session):
+            actuator = session.get(Actuator, (actuator_id, actuator_category))
+            if actuator is None:
+                actuator = Actuator(
+                    id=actuator_id,
+                    category=actuator_category,
+                    ip_address=ip_address,
+                    communication_port=communication_port,
+                    device_state=device_state,
+                    device_metadata=device_metadata,
+                    encoded_state=encoded_state,
+                    encoded_metadata=encoded_metadata,
+                    metadata_hash=metadata_hash,
+                    state_seq=state_seq,
+                    framed_commands=framed_commands,
+                    timestamp=timestamp,
+                    availability_tolerance=availability_tolerance,
+                )
+                session.add(actuator)
+            else:
+                actuator.ip_address = ip_address
+                actuator.communication_port = communication_port
+                actuator.device_state = device_state
+                actuator.device_metadata = device_metadata
+                actuator.encoded_state = encoded_state
+                actuator.encoded_metadata = encoded_metadata
+                actuator.metadata_hash = metadata_hash
+                actuator.state_seq = state_seq
+                actuator.framed_commands = framed_commands
+                actuator.timestamp = timestamp
+                actuator.availability_tolerance = availability_tolerance
+                actuator.last_seen = utc_now()
+            return category_code(session, actuator_category)
+        def on_commit(code):
+            self.registry.categories.add(actuator_category, code)
+            self.registry.add_actuator(
+                actuator_id=actuator_id,
+                actuator_category=actuator_category,
+                ip_address=ip_address,
+                communication_port=communication_port,
+                metadata_hash=metadata_hash,
+                framed_commands=framed_commands,
+            )
+        future = self.writer.submit(operation, on_commit)
+        return transform(
+            future,
+            lambda _: self.registry.categories.handle(actuator_id, actuator_category),
+        )
+
+    def has_actuator(self, actuator_id: int, actuator_category: str):
+        return self.registry.has_actuator(actuator_id, actuator_category)
+
+    def get_actuator_address(self, actuator_id: int, actuator_category: str):
+        return self.registry.get_actuator_address(actuator_id, actuator_category)
+
+    def has_framed_commands(self, actuator_id: int, actuator_category: str):
+        return self.registry.has_framed_commands(actuator_id, actuator_category)
+
+    def get_actuator(self, actuator_id: int, actuator_category: str):
+        if not self.registry.has_actuator(actuator_id, actuator_category):
+            return None
+        with self.session_maker() as session:
+            return session.get(Actuator, (actuator_id, actuator_category))
+
+    def get_all_actuators(self):
+        stmt = select(Actuator)
+        with self.session_maker() as session:
+            return session.scalars(stmt).all()
+
+    def get_actuators_by_category(self, actuator_category: str):
+        stmt = select(Actuator).where(Actuator.category == actuator_category)
+        with self.session_maker() as session:
+            return session.scalars(stmt).all()
+
+    def mark_actuators_as_seen(
+        self,
+        last_seen: dict[tuple[int, str], datetime.datetime],
+    ):
+        rows = [
+            {'id': actuator_id, 'category': actuator_category, 'last_seen': timestamp}
+            for (actuator_id, actuator_category), timestamp in last_seen.items()
+            if self.registry.has_actuator(actuator_id, actuator_category)
+        ]
+        if not rows:
+            return completed(False)
+        def operation(session):
+            session.execute(update(Actuator), rows)
+            return True
+        return self.writer.submit(operation)
+
+    def register_actuator_update(
+        self,
+        actuator_id: int,
+        actuator_category: str,
+        device_state: dict[str, Any] | None,
+        device_metadata: dict[str, Any] | None,
+        timestamp: datetime.datetime,
+        encoded_state: bytes | None = None,
+        encoded_metadata: bytes | None = None,
+        metadata_hash: int | None = None,
+        state_seq: int | None = None,
+        state_delta: bool = False,
+        base_seq: int = 0,
+    ):
+        if not self.registry.has_actuator(actuator_id, actuator_category):
+            return completed(False)
+        write_metadata = metadata_changed(
+            device_metadata,
+            encoded_metadata,
+            metadata_hash,
+            self.registry.get_actuator_metadata_hash(actuator_id, actuator_category),
+        )
+        metadata_values = {}
+        if write_metadata:
+            metadata_values = {
+                'device_metadata': device_metadata,
+                'encoded_metadata': encoded_metadata,
+                'metadata_hash': metadata_hash or None,
+            }
+        if state_delta:
+            def operation(session):
+                actuator = session.get(Actuator, (actuator_id, actuator_category))
+                if actuator.state_seq is None or actuator.state_seq < base_seq:
+                    return None
+                # Deltas já aplicados (ou keep-alives vazios) não regravam o estado
+                if actuator.state_seq < state_seq and actuator.timestamp < timestamp:
+                    actuator.device_state, actuator.encoded_state = apply_state_patch(
+                        actuator.device_state,
+                        actuator.encoded_state,
+                        device_state,
+                        encoded_state,
+                    )
+                    actuator.state_seq = state_seq
+                    actuator.timestamp = timestamp
+                for name, value in metadata_values.items():
+                    setattr(actuator, name, value)
+                return True
+        else:
+            stmt = update(Actuator).where(
+                Actuator.id == actuator_id,
+                Actuator.category == actuator_category,
+                Actuator.timestamp < timestamp,
+            ).values(
+                device_state=device_state,
+                encoded_state=encoded_state,
+                state_seq=state_seq or None,
+                timestamp=timestamp,
+                **metadata_values,
+            )
+            def operation(session):
+                return session.execute(stmt).rowcount > 0
+        def on_commit(updated):
+            if updated and write_metadata:
+                self.registry.set_actuator_metadata_hash(
+                    actuator_id,
+                    actuator_category,
+                    metadata_hash or None,
+                )
+        future = self.writer.submit(operation, on_commit)
+        return transform(future, lambda updated: updated is not None)
@@ -0,0 +1,106 @@
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from sqlalchemy.orm import sessionmaker
+from .sessions import SessionMaker
+
+
+class WriterClosedError(RuntimeError):
+    pass
+
+
+def completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def transform(future, func):
+    transformed = Future()
+    def callback(done):
+        try:
+            transformed.set_result(func(done.result()))
+        except Exception as e:
+            transformed.set_exception(e)
+    future.add_done_callback(callback)
+    return transformed
+
+
+class DatabaseWriter:
+    def __init__(self, session_maker: sessionmaker):
+        self.session_maker = session_maker
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, operation, on_commit=None):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise WriterClosedError('Database writer is closed')
+            self._queue.put((operation, on_commit, future))
+        return future
+
+    def _take(self, max_batch, timeout):
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch, logger):
+        results = []
+        try:
+            with self.session_maker.begin() as session:
+                for operation, on_commit, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        # Falhas isoladas não descartam o restante do lote
+                        with session.begin_nested():
+                            result = operation(session)
+                    except Exception as e:
+                        future.set_exception(e)
+                        continue
+                    results.append((on_commit, future, result))
+        except Exception as e:
+            logger.error(
+                'Falha ao confirmar lote de %d operações: (%s) %s',
+                len(batch),
+                type(e).__name__,
+                e,
+            )
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for on_commit, future, result in results:
+            try:
+                if on_commit is not None:
+                    on_commit(result)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            future.set_result(result)
+
+    def run(self, stop_flag, max_batch=256):
+        logger = logging.getLogger('DATABASE_WRITER')
+        logger.info('Gravando no banco em lotes de até %d operações', max_batch)
+        while not stop_flag.is_set():
+            batch = self._take(max_batch, 0.5)
+            if batch:
+                self._commit(batch, logger)
+        with self._lock:
+            self._closed = True
+        while batch := self._take(max_batch, 0.0):
+            self._commit(batch, logger)
+        logger.info('Interrompendo gravação no banco')
+
+
+DB_WRITER = DatabaseWriter(SessionMaker)
@@ -5,10 +5,16 @@ import logging
 from functools import wraps
 from api import app, ApiServerThread
 from registration_handler import multicast_locations, registration_listener
-from sensors_handler import sensors_consumer
-from actuators_handler import actuators_listener
+from sensors_handler import ReadingsBuffer, sensors_consumer, readings_writer
+from actuators_handler import actuators_listener, COMMAND_QUEUES
 from clients_handler import clients_listener
-from db.sessions import init_db
+from connection_pool import ACTUATORS_POOL, pool_maintainer
+from command_dispatcher import COMMAND_DISPATCHER
+from circuit_breaker import ACTUATOR_BREAKERS
+from liveness import ACTUATORS_LIVENESS, load_liveness, liveness_monitor
+from storage_maintainer import storage_maintainer
+from db.repositories import init_storage
+from db.writer import DB_WRITER
 
 
 def stop_wrapper(func, stop_flag):
@@ -34,10 +40,23 @@ def load_configs():
     return configs
 
 
-def _run():
+def _run(configs):
     stop_flag = threading.Event()
+    # O escritor do banco é encerrado por último, após os demais threads
+    writer_stop_flag = threading.Event()
     try:
-        configs = load_configs()
+        db_writer = threading.Thread(
+            target=stop_wrapper(DB_WRITER.run, stop_flag),
+            args=(
+                writer_stop_flag,
+                configs.db_writer_batch_size,
+            ),
+        )
+        readings_buffer = ReadingsBuffer(
+            max_size=configs.readings_buffer_size,
+            batch_size=configs.readings_batch_size,
+            max_delay=configs.readings_max_delay,
+        )
         se_consumer = threading.Thread(
             target=stop_wrapper(sensors_consumer, stop_flag),
             args=(
@@ -45,6 +64,17 @@ def _run():
                 configs.broker_ip,
                 configs.broker_port,
                 configs.publish_exchange,
+                readings_buffer,
+                configs.readings_queue,
+                configs.readings_manual_ack,
+                configs.readings_prefetch,
+            ),
+        )
+        se_writer = threading.Thread(
+            target=stop_wrapper(readings_writer, stop_flag),
+            args=(
+                stop_flag,
+                readings_buffer,
             ),
         )
         ac_listener = threading.Thread(
@@ -52,6 +82,7 @@ def _run():
             args=(
                 stop_flag,
                 configs.actuators_port,
+                configs.actuators_stream_idle_timeout,
             ),
         )
         cl_listener = threading.Thread(
@@ -71,6 +102,27 @@ def _run():
                 configs.actuators_tolerance,
             ),
         )
+        li_monitor = threading.Thread(
+            target=stop_wrapper(liveness_monitor, stop_flag),
+            args=(
+                stop_flag,
+                configs.liveness_flush_interval,
+            ),
+        )
+        po_maintainer = threading.Thread(
+            target=stop_wrapper(pool_maintainer, stop_flag),
+            args=(
+                stop_flag,
+                configs.actuators_pool_maintenance_interval,
+            ),
+        )
+        st_maintainer = threading.Thread(
+            target=stop_wrapper(storage_maintainer, stop_flag),
+            args=(
+                stop_flag,
+                configs.maintenance_interval,
+            ),
+        )
         multicaster = threading.Thread(
             target=stop_wrapper(multicast_locations, stop_flag),
             args=(
@@ -85,16 +137,22 @@ def _run():
                 configs.publish_exchange,
             ),
         )
+        app.config['READINGS_BUFFER'] = readings_buffer
         api_server = ApiServerThread(
             stop_flag,
             configs.host_ip,
             configs.api_port,
             app,
         )
+        db_writer.start()
+        se_writer.start()
         se_consumer.start()
         ac_listener.start()
         cl_listener.start()
         re_listener.start()
+        li_monitor.start()
+        po_maintainer.start()
+        st_maintainer.start()
         multicaster.start()
         api_server.start()
         stop_flag.wait()
@@ -103,11 +161,18 @@ def _run():
     finally:
         stop_flag.set()
         se_consumer.join()
+        se_writer.join()
         ac_listener.join()
         cl_listener.join()
         re_listener.join()
+        li_monitor.join()
+        po_maintainer.join()
+        st_maintainer.join()
         multicaster.join()
         api_server.shutdown()
+        COMMAND_QUEUES.shutdown()
+        writer_stop_flag.set()
+        db_writer.join()
 
 
 def main():
@@ -137,10 +202,37 @@ def main():
         format='[%(levelname)s %(asctime)s] %(name)s\n  %(message)s',
     )
 
+    configs = load_configs()
+
     # Database
-    init_db(args.clear)
+    init_storage(
+        backend=configs.storage_backend,
+        clear=args.clear,
+        partition_period=configs.readings_partition,
+        retention_days=configs.readings_retention_days,
+        series_capacity=configs.memory_series_capacity,
+        hot_days=configs.readings_hot_days,
+        chunk_size=configs.readings_chunk_size,
+        archive_days=configs.readings_archive_days,
+        archive_dir=configs.archive_dir,
+        rollup_retention_days=configs.rollups_retention_days,
+    )
+    ACTUATOR_BREAKERS.configure(
+        failure_threshold=configs.actuators_breaker_failures,
+        reset_timeout=configs.actuators_breaker_reset,
+    )
+    # Atuadores offline têm o circuito aberto até voltarem a se comunicar
+    ACTUATORS_LIVENESS.subscribe(ACTUATOR_BREAKERS.liveness_changed)
+    load_liveness()
+    ACTUATORS_POOL.configure(
+        max_connections=configs.actuators_pool_size,
+        idle_timeout=configs.actuators_pool_idle_timeout,
+        timeout=configs.actuators_timeout,
+    )
+    COMMAND_QUEUES.configure(max_workers=configs.actuators_command_workers)
+    COMMAND_DISPATCHER.configure(deadline=configs.group_commands_deadline)
 
-    return _run()
+    return _run(configs)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,170 @@
+import time
+import heapq
+import logging
+import datetime
+import threading
+from db.models import utc_now
+from db.repositories import get_sensors_repository, get_actuators_repository
+
+
+class LivenessTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tolerances = {}
+        self._last_seen = {}
+        self._online = set()
+        self._deadlines = []
+        self._unflushed = set()
+        self._listeners = []
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+        return
+
+    def _notify(self, transitions):
+        for key, online in transitions:
+            for listener in self._listeners:
+                listener(key, online)
+
+    def track(self, key, tolerance, last_seen=None):
+        now = time.monotonic()
+        if last_seen is None:
+            seen_clock = now
+        else:
+            seen_clock = now - (utc_now() - last_seen).total_seconds()
+        with self._lock:
+            self._tolerances[key] = tolerance
+            self._last_seen[key] = seen_clock
+            if last_seen is None:
+                self._unflushed.add(key)
+            went_online = (
+                key not in self._online
+                and now - seen_clock <= tolerance
+            )
+            if went_online:
+                self._online.add(key)
+                heapq.heappush(self._deadlines, (seen_clock + tolerance, key))
+        if went_online:
+            self._notify(((key, True),))
+        return
+
+    def mark_seen(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tolerance = self._tolerances.get(key)
+            if tolerance is None:
+                return False
+            self._last_seen[key] = now
+            self._unflushed.add(key)
+            if key in self._online:
+                return True
+            self._online.add(key)
+            heapq.heappush(self._deadlines, (now + tolerance, key))
+        self._notify(((key, True),))
+        return True
+
+    def is_online(self, key):
+        tolerance = self._tolerances.get(key)
+        if tolerance is None:
+            return False
+        return time.monotonic() - self._last_seen[key] <= tolerance
+
+    def expire(self):
+        now = time.monotonic()
+        transitions = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] < now:
+                _, key = heapq.heappop(self._deadlines)
+                deadline = self._last_seen[key] + self._tolerances[key]
+                if deadline >= now:
+                    heapq.heappush(self._deadlines, (deadline, key))
+                    continue
+                self._online.discard(key)
+                transitions.append((key, False))
+        self._notify(transitions)
+        return len(transitions)
+
+    def take_unflushed(self):
+        now = time.monotonic()
+        wall_now = utc_now()
+        with self._lock:
+            keys, self._unflushed = self._unflushed, set()
+            return {
+                key: wall_now - datetime.timedelta(seconds=now - self._last_seen[key])
+                for key in keys
+            }
+
+
+SENSORS_LIVENESS = LivenessTracker()
+
+ACTUATORS_LIVENESS = LivenessTracker()
+
+
+def load_liveness():
+    for sensor in get_sensors_repository().get_all_sensors():
+        SENSORS_LIVENESS.track(
+            (sensor.id, sensor.category),
+            sensor.availability_tolerance,
+            sensor.last_seen,
+        )
+    for actuator in get_actuators_repository().get_all_actuators():
+        ACTUATORS_LIVENESS.track(
+            (actuator.id, actuator.category),
+            actuator.availability_tolerance,
+            actuator.last_seen,
+        )
+    return
+
+
+def flush_liveness(logger):
+    sensors_last_seen = SENSORS_LIVENESS.take_unflushed()
+    actuators_last_seen = ACTUATORS_LIVENESS.take_unflushed()
+    if not sensors_last_seen and not actuators_last_seen:
+        return
+    try:
+        if sensors_last_seen:
+            get_sensors_repository().mark_sensors_as_seen(sensors_last_seen).result()
+        if actuators_last_seen:
+            get_actuators_repository().mark_actuators_as_seen(actuators_last_seen).result()
+    except Exception as e:
+        logger.error(
+            'Falha ao persistir disponibilidade dos dispositivos: (%s) %s',
+            type(e).__name__,
+            e,
+        )
+        return
+    logger.debug(
+        'Disponibilidade persistida: %d sensores e %d atuadores',
+        len(sensors_last_seen),
+        len(actuators_last_seen),
+    )
+
+
+def liveness_monitor(stop_flag, flush_interval):
+    logger = logging.getLogger('LIVENESS_MONITOR')
+    def log_transition(kind):
+        def listener(key, online):
+            logger.info(
+                '%s %s-%d está %s',
+                kind,
+                key[1],
+                key[0],
+                'online' if online else 'offline',
+            )
+        return listener
+    SENSORS_LIVENESS.subscribe(log_transition('Sensor'))
+    ACTUATORS_LIVENESS.subscribe(log_transition('Atuador'))
+    logger.info(
+        'Monitorando disponibilidade dos dispositivos. '
+        'Persistência a cada %.1f segundos',
+        flush_interval,
+    )
+    last_flush = time.monotonic()
+    while not stop_flag.is_set():
+        stop_flag.wait(0.5)
+        SENSORS_LIVENESS.expire()
+        ACTUATORS_LIVENESS.expire()
+        if time.monotonic() - last_flush >= flush_interval:
+            flush_liveness(logger)
+            last_flush = time.monotonic()
+    flush_liveness(logger)
@@ -22,51 +22,62 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+from google.protobuf import struct_pb2 as google_dot_protobuf_dot_struct__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0emessages.proto\"e\n\x07\x41\x64\x64ress\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x0c\n\x04port\x18\x02 \x01(\r\x12\x11\n\tbroker_ip\x18\x03 \x01(\t\x12\x13\n\x0b\x62roker_port\x18\x04 \x01(\r\x12\x18\n\x10publish_exchange\x18\x05 \x01(\t\"i\n\nDeviceInfo\x12\x19\n\x04type\x18\x01 \x01(\x0e\x32\x0b.DeviceType\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05state\x18\x03 \x01(\t\x12\x10\n\x08metadata\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\t\"Q\n\x0bJoinRequest\x12 \n\x0b\x64\x65vice_info\x18\x01 \x01(\x0b\x32\x0b.DeviceInfo\x12 \n\x0e\x64\x65vice_address\x18\x02 \x01(\x0b\x32\x08.Address\" \n\tJoinReply\x12\x13\n\x0breport_port\x18\x01 \x01(\r\"s\n\rSensorReading\x12\x13\n\x0b\x64\x65vice_name\x18\x01 \x01(\t\x12\x15\n\rreading_value\x18\x02 \x01(\x02\x12\x10\n\x08metadata\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\t\x12\x11\n\tis_online\x18\x05 \x01(\x08\"l\n\x0e\x41\x63tuatorUpdate\x12\x13\n\x0b\x64\x65vice_name\x18\x01 \x01(\t\x12\r\n\x05state\x18\x02 \x01(\t\x12\x10\n\x08metadata\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\t\x12\x11\n\tis_online\x18\x05 \x01(\x08\";\n\x0f\x41\x63tuatorCommand\x12\x1a\n\x04type\x18\x01 \x01(\x0e\x32\x0c.CommandType\x12\x0c\n\x04\x62ody\x18\x02 \x01(\t\"P\n\x0e\x41\x63tuatorComply\x12\x1d\n\x06status\x18\x01 \x01(\x0e\x32\r.ComplyStatus\x12\x1f\n\x06update\x18\x02 \x01(\x0b\x32\x0f.ActuatorUpdate\"\xae\x01\n\nSensorData\x12\x13\n\x0b\x64\x65vice_name\x18\x01 \x01(\t\x12\x10\n\x08metadata\x18\x02 \x01(\t\x12+\n\x08readings\x18\x03 \x03(\x0b\x32\x19.SensorData.SimpleReading\x12\x11\n\tis_online\x18\x04 \x01(\x08\x1a\x39\n\rSimpleReading\x12\x11\n\ttimestamp\x18\x01 \x01(\t\x12\x15\n\rreading_value\x18\x02 \x01(\x02\"0\n\rSensorsReport\x12\x1f\n\x07\x64\x65vices\x18\x01 \x03(\x0b\x32\x0e.SensorReading\"3\n\x0f\x41\x63tuatorsReport\x12 \n\x07\x64\x65vices\x18\x01 \x03(\x0b\x32\x0f.ActuatorUpdate\"N\n\rClientRequest\x12\x1a\n\x04type\x18\x01 \x01(\x0e\x32\x0c.RequestType\x12\x13\n\x0b\x64\x65vice_name\x18\x02 \x01(\t\x12\x0c\n\x04\x62ody\x18\x03 \x01(\t\"Y\n\x0b\x43lientReply\x12\x1c\n\x06status\x18\x01 \x01(\x0e\x32\x0c.ReplyStatus\x12\x1e\n\x08reply_to\x18\x02 \x01(\x0e\x32\x0c.RequestType\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c*@\n\nDeviceType\x12\x12\n\x0e\x44T_UNSPECIFIED\x10\x00\x12\r\n\tDT_SENSOR\x10\x01\x12\x0f\n\x0b\x44T_ACTUATOR\x10\x02*T\n\x0b\x43ommandType\x12\x12\n\x0e\x43T_UNSPECIFIED\x10\x00\x12\r\n\tCT_ACTION\x10\x01\x12\x10\n\x0c\x43T_GET_STATE\x10\x02\x12\x10\n\x0c\x43T_SET_STATE\x10\x03*g\n\x0c\x43omplyStatus\x12\x12\n\x0e\x43S_UNSPECIFIED\x10\x00\x12\t\n\x05\x43S_OK\x10\x01\x12\x0b\n\x07\x43S_FAIL\x10\x02\x12\x15\n\x11\x43S_UNKNOWN_ACTION\x10\x03\x12\x14\n\x10\x43S_INVALID_STATE\x10\x04*\xc4\x01\n\x0bRequestType\x12\x12\n\x0eRT_UNSPECIFIED\x10\x00\x12\x19\n\x15RT_GET_SENSORS_REPORT\x10\x01\x12\x1b\n\x17RT_GET_ACTUATORS_REPORT\x10\x02\x12\x16\n\x12RT_GET_SENSOR_DATA\x10\x03\x12\x1a\n\x16RT_GET_ACTUATOR_UPDATE\x10\x04\x12\x19\n\x15RT_SET_ACTUATOR_STATE\x10\x05\x12\x1a\n\x16RT_RUN_ACTUATOR_ACTION\x10\x06*}\n\x0bReplyStatus\x12\x12\n\x0eRS_UNSPECIFIED\x10\x00\x12\t\n\x05RS_OK\x10\x01\x12\x0b\n\x07RS_FAIL\x10\x02\x12\x14\n\x10RS_INVALID_STATE\x10\x03\x12\x15\n\x11RS_UNKNOWN_DEVICE\x10\x04\x12\x15\n\x11RS_UNKNOWN_ACTION\x10\x05\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0emessages.proto\x1a\x1cgoogle/protobuf/struct.proto\"\x82\x01\n\x07\x41\x64\x64ress\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x0c\n\x04port\x18\x02 \x01(\r\x12\x11\n\tbroker_ip\x18\x03 \x01(\t\x12\x13\n\x0b\x62roker_port\x18\x04 \x01(\r\x12\x18\n\x10publish_exchange\x18\x05 \x01(\t\x12\x1b\n\x13\x66ramed_registration\x18\x06 \x01(\x08\"(\n\x08\x44\x65viceId\x12\x10\n\x08\x63\x61tegory\x18\x01 \x01(\t\x12\n\n\x02id\x18\x02 \x01(\r\"\xab\x02\n\nDeviceInfo\x12\x19\n\x04type\x18\x01 \x01(\x0e\x32\x0b.DeviceType\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05state\x18\x03 \x01(\t\x12\x10\n\x08metadata\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\t\x12\x1c\n\tdevice_id\x18\x06 \x01(\x0b\x32\t.DeviceId\x12-\n\x0cstate_struct\x18\x07 \x01(\x0b\x32\x17.google.protobuf.Struct\x12\x30\n\x0fmetadata_struct\x18\x08 \x01(\x0b\x32\x17.google.protobuf.Struct\x12\x15\n\rmetadata_hash\x18\t \x01(\x03\x12\x11\n\tstate_seq\x18\n \x01(\x04\x12\x17\n\x0f\x66ramed_commands\x18\x0b \x01(\x08\"Q\n\x0bJoinRequest\x12 \n\x0b\x64\x65vice_info\x18\x01 \x01(\x0b\x32\x0b.DeviceInfo\x12 \n\x0e\x64\x65vice_address\x18\x02 \x01(\x0b\x32\x08.Address\"}\n\tJoinReply\x12\x13\n\x0breport_port\x18\x01 \x01(\r\x12\x15\n\rdevice_handle\x18\x02 \x01(\x04\x12\x16\n\x0eupdate_streams\x18\x03 \x01(\x08\x12\x16\n\x0etyped_payloads\x18\x04 \x01(\x08\x12\x14\n\x0cstate_deltas\x18\x05 \x01(\x08\"\xf0\x01\n\rSensorReading\x12\x13\n\x0b\x64\x65vice_name\x18\x01 \x01(\t\x12\x15\n\rreading_value\x18\x02 \x01(\x02\x12\x10\n\x08metadata\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\t\x12\x11\n\tis_online\x18\x05 \x01(\x08\x12\x14\n\x0ctimestamp_us\x18\x06 \x01(\x03\x12\x15\n\rdevice_handle\x18\x07 \x01(\x04\x12\x1c\n\tdevice_id\x18\x08 \x01(\x0b\x32\t.DeviceId\x12\x30\n\x0fmetadata_struct\x18\t \x01(\x0b\x32\x17.google.protobuf.Struct\"6\n\x12SensorReadingBatch\x12 \n\x08readings\x18\x01 \x03(\x0b\x32\x0e.SensorReading\"\xd3\x02\n\x0e\x41\x63tuatorUpdate\x12\x13\n\x0b\x64\x65vice_name\x18\x01 \x01(\t\x12\r\n\x05state\x18\x02 \x01(\t\x12\x10\n\x08metadata\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\t\x12\x11\n\tis_online\x18\x05 \x01(\x08\x12\x15\n\rdevice_handle\x18\x06 \x01(\x04\x12\x1c\n\tdevice_id\x18\x07 \x01(\x0b\x32\t.DeviceId\x12-\n\x0cstate_struct\x18\x08 \x01(\x0b\x32\x17.google.protobuf.Struct\x12\x30\n\x0fmetadata_struct\x18\t \x01(\x0b\x32\x17.google.protobuf.Struct\x12\x15\n\rmetadata_hash\x18\n \x01(\x03\x12\x11\n\tstate_seq\x18\x0b \x01(\x04\x12\x13\n\x0bstate_delta\x18\x0c \x01(\x08\x12\x10\n\x08\x62\x61se_seq\x18\r \x01(\x04\";\n\x0f\x41\x63tuatorCommand\x12\x1a\n\x04type\x18\x01 \x01(\x0e\x32\x0c.CommandType\x12\x0c\n\x04\x62ody\x18\x02 \x01(\t\"P\n\x0e\x41\x63tuatorComply\x12\x1d\n\x06status\x18\x01 \x01(\x0e\x32\r.ComplyStatus\x12\x1f\n\x06update\x18\x02 \x01(\x0b\x32\x0f.ActuatorUpdate\"\x94\x02\n\nSensorData\x12\x13\n\x0b\x64\x65vice_name\x18\x01 \x01(\t\x12\x10\n\x08metadata\x18\x02 \x01(\t\x12+\n\x08readings\x18\x03 \x03(\x0b\x32\x19.SensorData.SimpleReading\x12\x11\n\tis_online\x18\x04 \x01(\x08\x12\x1c\n\tdevice_id\x18\x05 \x01(\x0b\x32\t.DeviceId\x12\x30\n\x0fmetadata_struct\x18\x06 \x01(\x0b\x32\x17.google.protobuf.Struct\x1aO\n\rSimpleReading\x12\x11\n\ttimestamp\x18\x01 \x01(\t\x12\x15\n\rreading_value\x18\x02 \x01(\x02\x12\x14\n\x0ctimestamp_us\x18\x03 \x01(\x03\"0\n\rSensorsReport\x12\x1f\n\x07\x64\x65vices\x18\x01 \x03(\x0b\x32\x0e.SensorReading\"3\n\x0f\x41\x63tuatorsReport\x12 \n\x07\x64\x65vices\x18\x01 \x03(\x0b\x32\x0f.ActuatorUpdate\",\n\x0b\x44\x65viceGroup\x12\x10\n\x08\x63\x61tegory\x18\x01 \x01(\t\x12\x0b\n\x03ids\x18\x02 \x03(\r\"\xbd\x01\n\rClientRequest\x12\x1a\n\x04type\x18\x01 \x01(\x0e\x32\x0c.RequestType\x12\x13\n\x0b\x64\x65vice_name\x18\x02 \x01(\t\x12\x0c\n\x04\x62ody\x18\x03 \x01(\t\x12\x1c\n\tdevice_id\x18\x04 \x01(\x0b\x32\t.DeviceId\x12\x16\n\x0etyped_payloads\x18\x05 \x01(\x08\x12\"\n\x0c\x64\x65vice_group\x18\x06 \x01(\x0b\x32\x0c.DeviceGroup\x12\x13\n\x0b\x64\x65\x61\x64line_ms\x18\x07 \x01(\r\"Y\n\x0b\x43lientReply\x12\x1c\n\x06status\x18\x01 \x01(\x0e\x32\x0c.ReplyStatus\x12\x1e\n\x08reply_to\x18\x02 \x01(\x0e\x32\x0c.RequestType\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\"q\n\x12GroupCommandResult\x12\x1c\n\tdevice_id\x18\x01 \x01(\x0b\x32\t.DeviceId\x12\x1c\n\x06status\x18\x02 \x01(\x0e\x32\x0c.ReplyStatus\x12\x1f\n\x06update\x18\x03 \x01(\x0b\x32\x0f.ActuatorUpdate\":\n\x12GroupCommandReport\x12$\n\x07results\x18\x01 \x03(\x0b\x32\x13.GroupCommandResult*@\n\nDeviceType\x12\x12\n\x0e\x44T_UNSPECIFIED\x10\x00\x12\r\n\tDT_SENSOR\x10\x01\x12\x0f\n\x0b\x44T_ACTUATOR\x10\x02*T\n\x0b\x43ommandType\x12\x12\n\x0e\x43T_UNSPECIFIED\x10\x00\x12\r\n\tCT_ACTION\x10\x01\x12\x10\n\x0c\x43T_GET_STATE\x10\x02\x12\x10\n\x0c\x43T_SET_STATE\x10\x03*g\n\x0c\x43omplyStatus\x12\x12\n\x0e\x43S_UNSPECIFIED\x10\x00\x12\t\n\x05\x43S_OK\x10\x01\x12\x0b\n\x07\x43S_FAIL\x10\x02\x12\x15\n\x11\x43S_UNKNOWN_ACTION\x10\x03\x12\x14\n\x10\x43S_INVALID_STATE\x10\x04*\xf5\x01\n\x0bRequestType\x12\x12\n\x0eRT_UNSPECIFIED\x10\x00\x12\x19\n\x15RT_GET_SENSORS_REPORT\x10\x01\x12\x1b\n\x17RT_GET_ACTUATORS_REPORT\x10\x02\x12\x16\n\x12RT_GET_SENSOR_DATA\x10\x03\x12\x1a\n\x16RT_GET_ACTUATOR_UPDATE\x10\x04\x12\x19\n\x15RT_SET_ACTUATOR_STATE\x10\x05\x12\x1a\n\x16RT_RUN_ACTUATOR_ACTION\x10\x06\x12\x16\n\x12RT_SET_GROUP_STATE\x10\x07\x12\x17\n\x13RT_RUN_GROUP_ACTION\x10\x08*\x8d\x01\n\x0bReplyStatus\x12\x12\n\x0eRS_UNSPECIFIED\x10\x00\x12\t\n\x05RS_OK\x10\x01\x12\x0b\n\x07RS_FAIL\x10\x02\x12\x14\n\x10RS_INVALID_STATE\x10\x03\x12\x15\n\x11RS_UNKNOWN_DEVICE\x10\x04\x12\x15\n\x11RS_UNKNOWN_ACTION\x10\x05\x12\x0e\n\nRS_TIMEOUT\x10\x06\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'messages_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_DEVICETYPE']._serialized_start=1166
-  _globals['_DEVICETYPE']._serialized_end=1230
-  _globals['_COMMANDTYPE']._serialized_start=1232
-  _globals['_COMMANDTYPE']._serialized_end=1316
-  _globals['_COMPLYSTATUS']._serialized_start=1318
-  _globals['_COMPLYSTATUS']._serialized_end=1421
-  _globals['_REQUESTTYPE']._serialized_start=1424
-  _globals['_REQUESTTYPE']._serialized_end=1620
-  _globals['_REPLYSTATUS']._serialized_start=1622
-  _globals['_REPLYSTATUS']._serialized_end=1747
-  _globals['_ADDRESS']._serialized_start=18
-  _globals['_ADDRESS']._serialized_end=119
-  _globals['_DEVICEINFO']._serialized_start=121
-  _globals['_DEVICEINFO']._serialized_end=226
-  _globals['_JOINREQUEST']._serialized_start=228
-  _globals['_JOINREQUEST']._serialized_end=309
-  _globals['_JOINREPLY']._serialized_start=311
-  _globals['_JOINREPLY']._serialized_end=343
-  _globals['_SENSORREADING']._serialized_start=345
-  _globals['_SENSORREADING']._serialized_end=460
-  _globals['_ACTUATORUPDATE']._serialized_start=462
-  _globals['_ACTUATORUPDATE']._serialized_end=570
-  _globals['_ACTUATORCOMMAND']._serialized_start=572
-  _globals['_ACTUATORCOMMAND']._serialized_end=631
-  _globals['_ACTUATORCOMPLY']._serialized_start=633
-  _globals['_ACTUATORCOMPLY']._serialized_end=713
-  _globals['_SENSORDATA']._serialized_start=716
-  _globals['_SENSORDATA']._serialized_end=890
-  _globals['_SENSORDATA_SIMPLEREADING']._serialized_start=833
-  _globals['_SENSORDATA_SIMPLEREADING']._serialized_end=890
-  _globals['_SENSORSREPORT']._serialized_start=892
-  _globals['_SENSORSREPORT']._serialized_end=940
-  _globals['_ACTUATORSREPORT']._serialized_start=942
-  _globals['_ACTUATORSREPORT']._serialized_end=993
-  _globals['_CLIENTREQUEST']._serialized_start=995
-  _globals['_CLIENTREQUEST']._serialized_end=1073
-  _globals['_CLIENTREPLY']._serialized_start=1075
-  _globals['_CLIENTREPLY']._serialized_end=1164
+  _globals['_DEVICETYPE']._serialized_start=2405
+  _globals['_DEVICETYPE']._serialized_end=2469
+  _globals['_COMMANDTYPE']._serialized_start=2471
+  _globals['_COMMANDTYPE']._serialized_end=2555
+  _globals['_COMPLYSTATUS']._serialized_start=2557
+  _globals['_COMPLYSTATUS']._serialized_end=2660
+  _globals['_REQUESTTYPE']._serialized_start=2663
+  _globals['_REQUESTTYPE']._serialized_end=2908
+  _globals['_REPLYSTATUS']._serialized_start=2911
+  _globals['_REPLYSTATUS']._serialized_end=3052
+  _globals['_ADDRESS']._serialized_start=49
+  _globals['_ADDRESS']._serialized_end=179
+  _globals['_DEVICEID']._serialized_start=181
+  _globals['_DEVICEID']._serialized_end=221
+  _globals['_DEVICEINFO']._serialized_start=224
+  _globals['_DEVICEINFO']._serialized_end=523
+  _globals['_JOINREQUEST']._serialized_start=525
+  _globals['_JOINREQUEST']._serialized_end=606
+  _globals['_JOINREPLY']._serialized_start=608
+  _globals['_JOINREPLY']._serialized_end=733
+  _globals['_SENSORREADING']._serialized_start=736
+  _globals['_SENSORREADING']._serialized_end=976
+  _globals['_SENSORREADINGBATCH']._serialized_start=978
+  _globals['_SENSORREADINGBATCH']._serialized_end=1032
+  _globals['_ACTUATORUPDATE']._serialized_start=1035
+  _globals['_ACTUATORUPDATE']._serialized_end=1374
+  _globals['_ACTUATORCOMMAND']._serialized_start=1376
+  _globals['_ACTUATORCOMMAND']._serialized_end=1435
+  _globals['_ACTUATORCOMPLY']._serialized_start=1437
+  _globals['_ACTUATORCOMPLY']._serialized_end=1517
+  _globals['_SENSORDATA']._serialized_start=1520
+  _globals['_SENSORDATA']._serialized_end=1796
+  _globals['_SENSORDATA_SIMPLEREADING']._serialized_start=1717
+  _globals['_SENSORDATA_SIMPLEREADING']._serialized_end=1796
+  _globals['_SENSORSREPORT']._serialized_start=1798
+  _globals['_SENSORSREPORT']._serialized_end=1846
+  _globals['_ACTUATORSREPORT']._serialized_start=1848
+  _globals['_ACTUATORSREPORT']._serialized_end=1899
+  _globals['_DEVICEGROUP']._serialized_start=1901
+  _globals['_DEVICEGROUP']._serialized_end=1945
+  _globals['_CLIENTREQUEST']._serialized_start=1948
+  _globals['_CLIENTREQUEST']._serialized_end=2137
+  _globals['_CLIENTREPLY']._serialized_start=2139
+  _globals['_CLIENTREPLY']._serialized_end=2228
+  _globals['_GROUPCOMMANDRESULT']._serialized_start=2230
+  _globals['_GROUPCOMMANDRESULT']._serialized_end=2343
+  _globals['_GROUPCOMMANDREPORT']._serialized_start=2345
+  _globals['_GROUPCOMMANDREPORT']._serialized_end=2403
 # @@protoc_insertion_point(module_scope)
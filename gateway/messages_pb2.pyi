@@ -1,3 +1,4 @@
+from google.protobuf import struct_pb2 as _struct_pb2
 from google.protobuf.internal import containers as _containers
 from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
 from google.protobuf import descriptor as _descriptor
@@ -37,6 +38,8 @@ class RequestType(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
     RT_GET_ACTUATOR_UPDATE: _ClassVar[RequestType]
     RT_SET_ACTUATOR_STATE: _ClassVar[RequestType]
     RT_RUN_ACTUATOR_ACTION: _ClassVar[RequestType]
+    RT_SET_GROUP_STATE: _ClassVar[RequestType]
+    RT_RUN_GROUP_ACTION: _ClassVar[RequestType]
 
 class ReplyStatus(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
     __slots__ = ()
@@ -46,6 +49,7 @@ class ReplyStatus(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
     RS_INVALID_STATE: _ClassVar[ReplyStatus]
     RS_UNKNOWN_DEVICE: _ClassVar[ReplyStatus]
     RS_UNKNOWN_ACTION: _ClassVar[ReplyStatus]
+    RS_TIMEOUT: _ClassVar[ReplyStatus]
 DT_UNSPECIFIED: DeviceType
 DT_SENSOR: DeviceType
 DT_ACTUATOR: DeviceType
@@ -65,40 +69,65 @@ RT_GET_SENSOR_DATA: RequestType
 RT_GET_ACTUATOR_UPDATE: RequestType
 RT_SET_ACTUATOR_STATE: RequestType
 RT_RUN_ACTUATOR_ACTION: RequestType
+RT_SET_GROUP_STATE: RequestType
+RT_RUN_GROUP_ACTION: RequestType
 RS_UNSPECIFIED: ReplyStatus
 RS_OK: ReplyStatus
 RS_FAIL: ReplyStatus
 RS_INVALID_STATE: ReplyStatus
 RS_UNKNOWN_DEVICE: ReplyStatus
 RS_UNKNOWN_ACTION: ReplyStatus
+RS_TIMEOUT: ReplyStatus
 
 class Address(_message.Message):
-    __slots__ = ("ip", "port", "broker_ip", "broker_port", "publish_exchange")
+    __slots__ = ("ip", "port", "broker_ip", "broker_port", "publish_exchange", "framed_registration")
     IP_FIELD_NUMBER: _ClassVar[int]
     PORT_FIELD_NUMBER: _ClassVar[int]
     BROKER_IP_FIELD_NUMBER: _ClassVar[int]
     BROKER_PORT_FIELD_NUMBER: _ClassVar[int]
     PUBLISH_EXCHANGE_FIELD_NUMBER: _ClassVar[int]
+    FRAMED_REGISTRATION_FIELD_NUMBER: _ClassVar[int]
     ip: str
     port: int
     broker_ip: str
     broker_port: int
     publish_exchange: str
-    def __init__(self, ip: _Optional[str] = ..., port: _Optional[int] = ..., broker_ip: _Optional[str] = ..., broker_port: _Optional[int] = ..., publish_exchange: _Optional[str] = ...) -> None: ...
+    framed_registration: bool
+    def __init__(self, ip: _Optional[str] = ..., port: _Optional[int] = ..., broker_ip: _Optional[str] = ..., broker_port: _Optional[int] = ..., publish_exchange: _Optional[str] = ..., framed_registration: bool = ...) -> None: ...
+
+class DeviceId(_message.Message):
+    __slots__ = ("category", "id")
+    CATEGORY_FIELD_NUMBER: _ClassVar[int]
+    ID_FIELD_NUMBER: _ClassVar[int]
+    category: str
+    id: int
+    def __init__(self, category: _Optional[str] = ..., id: _Optional[int] = ...) -> None: ...
 
 class DeviceInfo(_message.Message):
-    __slots__ = ("type", "name", "state", "metadata", "timestamp")
+    __slots__ = ("type", "name", "state", "metadata", "timestamp", "device_id", "state_struct", "metadata_struct", "metadata_hash", "state_seq", "framed_commands")
     TYPE_FIELD_NUMBER: _ClassVar[int]
     NAME_FIELD_NUMBER: _ClassVar[int]
     STATE_FIELD_NUMBER: _ClassVar[int]
     METADATA_FIELD_NUMBER: _ClassVar[int]
     TIMESTAMP_FIELD_NUMBER: _ClassVar[int]
+    DEVICE_ID_FIELD_NUMBER: _ClassVar[int]
+    STATE_STRUCT_FIELD_NUMBER: _ClassVar[int]
+    METADATA_STRUCT_FIELD_NUMBER: _ClassVar[int]
+    METADATA_HASH_FIELD_NUMBER: _ClassVar[int]
+    STATE_SEQ_FIELD_NUMBER: _ClassVar[int]
+    FRAMED_COMMANDS_FIELD_NUMBER: _ClassVar[int]
     type: DeviceType
     name: str
     state: str
     metadata: str
     timestamp: str
-    def __init__(self, type: _Optional[_Union[DeviceType, str]] = ..., name: _Optional[str] = ..., state: _Optional[str] = ..., metadata: _Optional[str] = ..., timestamp: _Optional[str] = ...) -> None: ...
+    device_id: DeviceId
+    state_struct: _struct_pb2.Struct
+    metadata_struct: _struct_pb2.Struct
+    metadata_hash: int
+    state_seq: int
+    framed_commands: bool
+    def __init__(self, type: _Optional[_Union[DeviceType, str]] = ..., name: _Optional[str] = ..., state: _Optional[str] = ..., metadata: _Optional[str] = ..., timestamp: _Optional[str] = ..., device_id: _Optional[_Union[DeviceId, _Mapping]] = ..., state_struct: _Optional[_Union[_struct_pb2.Struct, _Mapping]] = ..., metadata_struct: _Optional[_Union[_struct_pb2.Struct, _Mapping]] = ..., metadata_hash: _Optional[int] = ..., state_seq: _Optional[int] = ..., framed_commands: bool = ...) -> None: ...
 
 class JoinRequest(_message.Message):
     __slots__ = ("device_info", "device_address")
@@ -109,38 +138,76 @@ class JoinRequest(_message.Message):
     def __init__(self, device_info: _Optional[_Union[DeviceInfo, _Mapping]] = ..., device_address: _Optional[_Union[Address, _Mapping]] = ...) -> None: ...
 
 class JoinReply(_message.Message):
-    __slots__ = ("report_port",)
+    __slots__ = ("report_port", "device_handle", "update_streams", "typed_payloads", "state_deltas")
     REPORT_PORT_FIELD_NUMBER: _ClassVar[int]
+    DEVICE_HANDLE_FIELD_NUMBER: _ClassVar[int]
+    UPDATE_STREAMS_FIELD_NUMBER: _ClassVar[int]
+    TYPED_PAYLOADS_FIELD_NUMBER: _ClassVar[int]
+    STATE_DELTAS_FIELD_NUMBER: _ClassVar[int]
     report_port: int
-    def __init__(self, report_port: _Optional[int] = ...) -> None: ...
+    device_handle: int
+    update_streams: bool
+    typed_payloads: bool
+    state_deltas: bool
+    def __init__(self, report_port: _Optional[int] = ..., device_handle: _Optional[int] = ..., update_streams: bool = ..., typed_payloads: bool = ..., state_deltas: bool = ...) -> None: ...
 
 class SensorReading(_message.Message):
-    __slots__ = ("device_name", "reading_value", "metadata", "timestamp", "is_online")
+    __slots__ = ("device_name", "reading_value", "metadata", "timestamp", "is_online", "timestamp_us", "device_handle", "device_id", "metadata_struct")
     DEVICE_NAME_FIELD_NUMBER: _ClassVar[int]
     READING_VALUE_FIELD_NUMBER: _ClassVar[int]
     METADATA_FIELD_NUMBER: _ClassVar[int]
     TIMESTAMP_FIELD_NUMBER: _ClassVar[int]
     IS_ONLINE_FIELD_NUMBER: _ClassVar[int]
+    TIMESTAMP_US_FIELD_NUMBER: _ClassVar[int]
+    DEVICE_HANDLE_FIELD_NUMBER: _ClassVar[int]
+    DEVICE_ID_FIELD_NUMBER: _ClassVar[int]
+    METADATA_STRUCT_FIELD_NUMBER: _ClassVar[int]
     device_name: str
     reading_value: float
     metadata: str
     timestamp: str
     is_online: bool
-    def __init__(self, device_name: _Optional[str] = ..., reading_value: _Optional[float] = ..., metadata: _Optional[str] = ..., timestamp: _Optional[str] = ..., is_online: bool = ...) -> None: ...
+    timestamp_us: int
+    device_handle: int
+    device_id: DeviceId
+    metadata_struct: _struct_pb2.Struct
+    def __init__(self, device_name: _Optional[str] = ..., reading_value: _Optional[float] = ..., metadata: _Optional[str] = ..., timestamp: _Optional[str] = ..., is_online: bool = ..., timestamp_us: _Optional[int] = ..., device_handle: _Optional[int] = ..., device_id: _Optional[_Union[DeviceId, _Mapping]] = ..., metadata_struct: _Optional[_Union[_struct_pb2.Struct, _Mapping]] = ...) -> None: ...
+
+class SensorReadingBatch(_message.Message):
+    __slots__ = ("readings",)
+    READINGS_FIELD_NUMBER: _ClassVar[int]
+    readings: _containers.RepeatedCompositeFieldContainer[SensorReading]
+    def __init__(self, readings: _Optional[_Iterable[_Union[SensorReading, _Mapping]]] = ...) -> None: ...
 
 class ActuatorUpdate(_message.Message):
-    __slots__ = ("device_name", "state", "metadata", "timestamp", "is_online")
+    __slots__ = ("device_name", "state", "metadata", "timestamp", "is_online", "device_handle", "device_id", "state_struct", "metadata_struct", "metadata_hash", "state_seq", "state_delta", "base_seq")
     DEVICE_NAME_FIELD_NUMBER: _ClassVar[int]
     STATE_FIELD_NUMBER: _ClassVar[int]
     METADATA_FIELD_NUMBER: _ClassVar[int]
     TIMESTAMP_FIELD_NUMBER: _ClassVar[int]
     IS_ONLINE_FIELD_NUMBER: _ClassVar[int]
+    DEVICE_HANDLE_FIELD_NUMBER: _ClassVar[int]
+    DEVICE_ID_FIELD_NUMBER: _ClassVar[int]
+    STATE_STRUCT_FIELD_NUMBER: _ClassVar[int]
+    METADATA_STRUCT_FIELD_NUMBER: _ClassVar[int]
+    METADATA_HASH_FIELD_NUMBER: _ClassVar[int]
+    STATE_SEQ_FIELD_NUMBER: _ClassVar[int]
+    STATE_DELTA_FIELD_NUMBER: _ClassVar[int]
+    BASE_SEQ_FIELD_NUMBER: _ClassVar[int]
     device_name: str
     state: str
     metadata: str
     timestamp: str
     is_online: bool
-    def __init__(self, device_name: _Optional[str] = ..., state: _Optional[str] = ..., metadata: _Optional[str] = ..., timestamp: _Optional[str] = ..., is_online: bool = ...) -> None: ...
+    device_handle: int
+    device_id: DeviceId
+    state_struct: _struct_pb2.Struct
+    metadata_struct: _struct_pb2.Struct
+    metadata_hash: int
+    state_seq: int
+    state_delta: bool
+    base_seq: int
+    def __init__(self, device_name: _Optional[str] = ..., state: _Optional[str] = ..., metadata: _Optional[str] = ..., timestamp: _Optional[str] = ..., is_online: bool = ..., device_handle: _Optional[int] = ..., device_id: _Optional[_Union[DeviceId, _Mapping]] = ..., state_struct: _Optional[_Union[_struct_pb2.Struct, _Mapping]] = ..., metadata_struct: _Optional[_Union[_struct_pb2.Struct, _Mapping]] = ..., metadata_hash: _Optional[int] = ..., state_seq: _Optional[int] = ..., state_delta: bool = ..., base_seq: _Optional[int] = ...) -> None: ...
 
 class ActuatorCommand(_message.Message):
     __slots__ = ("type", "body")
@@ -159,23 +226,29 @@ class ActuatorComply(_message.Message):
     def __init__(self, status: _Optional[_Union[ComplyStatus, str]] = ..., update: _Optional[_Union[ActuatorUpdate, _Mapping]] = ...) -> None: ...
 
 class SensorData(_message.Message):
-    __slots__ = ("device_name", "metadata", "readings", "is_online")
+    __slots__ = ("device_name", "metadata", "readings", "is_online", "device_id", "metadata_struct")
     class SimpleReading(_message.Message):
-        __slots__ = ("timestamp", "reading_value")
+        __slots__ = ("timestamp", "reading_value", "timestamp_us")
         TIMESTAMP_FIELD_NUMBER: _ClassVar[int]
         READING_VALUE_FIELD_NUMBER: _ClassVar[int]
+        TIMESTAMP_US_FIELD_NUMBER: _ClassVar[int]
         timestamp: str
         reading_value: float
-        def __init__(self, timestamp: _Optional[str] = ..., reading_value: _Optional[float] = ...) -> None: ...
+        timestamp_us: int
+        def __init__(self, timestamp: _Optional[str] = ..., reading_value: _Optional[float] = ..., timestamp_us: _Optional[int] = ...) -> None: ...
     DEVICE_NAME_FIELD_NUMBER: _ClassVar[int]
     METADATA_FIELD_NUMBER: _ClassVar[int]
     READINGS_FIELD_NUMBER: _ClassVar[int]
     IS_ONLINE_FIELD_NUMBER: _ClassVar[int]
+    DEVICE_ID_FIELD_NUMBER: _ClassVar[int]
+    METADATA_STRUCT_FIELD_NUMBER: _ClassVar[int]
     device_name: str
     metadata: str
     readings: _containers.RepeatedCompositeFieldContainer[SensorData.SimpleReading]
     is_online: bool
-    def __init__(self, device_name: _Optional[str] = ..., metadata: _Optional[str] = ..., readings: _Optional[_Iterable[_Union[SensorData.SimpleReading, _Mapping]]] = ..., is_online: bool = ...) -> None: ...
+    device_id: DeviceId
+    metadata_struct: _struct_pb2.Struct
+    def __init__(self, device_name: _Optional[str] = ..., metadata: _Optional[str] = ..., readings: _Optional[_Iterable[_Union[SensorData.SimpleReading, _Mapping]]] = ..., is_online: bool = ..., device_id: _Optional[_Union[DeviceId, _Mapping]] = ..., metadata_struct: _Optional[_Union[_struct_pb2.Struct, _Mapping]] = ...) -> None: ...
 
 class SensorsReport(_message.Message):
     __slots__ = ("devices",)
@@ -189,15 +262,31 @@ class ActuatorsReport(_message.Message):
     devices: _containers.RepeatedCompositeFieldContainer[ActuatorUpdate]
     def __init__(self, devices: _Optional[_Iterable[_Union[ActuatorUpdate, _Mapping]]] = ...) -> None: ...
 
+class DeviceGroup(_message.Message):
+    __slots__ = ("category", "ids")
+    CATEGORY_FIELD_NUMBER: _ClassVar[int]
+    IDS_FIELD_NUMBER: _ClassVar[int]
+    category: str
+    ids: _containers.RepeatedScalarFieldContainer[int]
+    def __init__(self, category: _Optional[str] = ..., ids: _Optional[_Iterable[int]] = ...) -> None: ...
+
 class ClientRequest(_message.Message):
-    __slots__ = ("type", "device_name", "body")
+    __slots__ = ("type", "device_name", "body", "device_id", "typed_payloads", "device_group", "deadline_ms")
     TYPE_FIELD_NUMBER: _ClassVar[int]
     DEVICE_NAME_FIELD_NUMBER: _ClassVar[int]
     BODY_FIELD_NUMBER: _ClassVar[int]
+    DEVICE_ID_FIELD_NUMBER: _ClassVar[int]
+    TYPED_PAYLOADS_FIELD_NUMBER: _ClassVar[int]
+    DEVICE_GROUP_FIELD_NUMBER: _ClassVar[int]
+    DEADLINE_MS_FIELD_NUMBER: _ClassVar[int]
     type: RequestType
     device_name: str
     body: str
-    def __init__(self, type: _Optional[_Union[RequestType, str]] = ..., device_name: _Optional[str] = ..., body: _Optional[str] = ...) -> None: ...
+    device_id: DeviceId
+    typed_payloads: bool
+    device_group: DeviceGroup
+    deadline_ms: int
+    def __init__(self, type: _Optional[_Union[RequestType, str]] = ..., device_name: _Optional[str] = ..., body: _Optional[str] = ..., device_id: _Optional[_Union[DeviceId, _Mapping]] = ..., typed_payloads: bool = ..., device_group: _Optional[_Union[DeviceGroup, _Mapping]] = ..., deadline_ms: _Optional[int] = ...) -> None: ...
 
 class ClientReply(_message.Message):
     __slots__ = ("status", "reply_to", "data")
@@ -208,3 +297,19 @@ class ClientReply(_message.Message):
     reply_to: RequestType
     data: bytes
     def __init__(self, status: _Optional[_Union[ReplyStatus, str]] = ..., reply_to: _Optional[_Union[RequestType, str]] = ..., data: _Optional[bytes] = ...) -> None: ...
+
+class GroupCommandResult(_message.Message):
+    __slots__ = ("device_id", "status", "update")
+    DEVICE_ID_FIELD_NUMBER: _ClassVar[int]
+    STATUS_FIELD_NUMBER: _ClassVar[int]
+    UPDATE_FIELD_NUMBER: _ClassVar[int]
+    device_id: DeviceId
+    status: ReplyStatus
+    update: ActuatorUpdate
+    def __init__(self, device_id: _Optional[_Union[DeviceId, _Mapping]] = ..., status: _Optional[_Union[ReplyStatus, str]] = ..., update: _Optional[_Union[ActuatorUpdate, _Mapping]] = ...) -> None: ...
+
+class GroupCommandReport(_message.Message):
+    __slots__ = ("results",)
+    RESULTS_FIELD_NUMBER: _ClassVar[int]
+    results: _containers.RepeatedCompositeFieldContainer[GroupCommandResult]
+    def __init__(self, results: _Optional[_Iterable[_Union[GroupCommandResult, _Mapping]]] = ...) -> None: ...
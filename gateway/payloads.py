@@ -0,0 +1,88 @@
+import json
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.struct_pb2 import Struct
+
+
+# Estado e metadados chegam como JSON (state/metadata) ou como
+# google.protobuf.Struct (state_struct/metadata_struct). Structs são guardados
+# já codificados e repassados aos clientes sem decodificação
+
+
+def encoded_struct(message, field: str):
+    if not message.HasField(field):
+        return None
+    return getattr(message, field).SerializeToString()
+
+
+def decode_struct(encoded: bytes):
+    struct = Struct()
+    struct.ParseFromString(encoded)
+    return MessageToDict(struct)
+
+
+def read_payload(message, name: str):
+    # Retorna (dicionário, bytes codificados); apenas um deles é preenchido,
+    # ou nenhum se o campo foi omitido
+    encoded = encoded_struct(message, f'{name}_struct')
+    if encoded is not None:
+        return None, encoded
+    payload = getattr(message, name)
+    if not payload:
+        return None, None
+    return json.loads(payload), None
+
+
+def has_payload(message, name: str):
+    return bool(getattr(message, name)) or message.HasField(f'{name}_struct')
+
+
+def payload_dict(decoded, encoded: bytes | None):
+    if encoded is None:
+        return decoded
+    return decode_struct(encoded)
+
+
+def _varint(value: int):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def encode_field(field_number: int, payload: bytes):
+    # Campo length-delimited (wire type 2) no formato binário do Protobuf
+    return _varint(field_number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def serialize_with_payloads(message, payloads, typed: bool):
+    # payloads: pares nome -> (dicionário, bytes codificados). Com typed, os
+    # Structs codificados são anexados à mensagem serializada sem decodificação
+    fields = message.DESCRIPTOR.fields_by_name
+    extra = []
+    for name, (decoded, encoded) in payloads.items():
+        if decoded is None and encoded is None:
+            # Nada armazenado (ex.: metadados ainda desconhecidos)
+            continue
+        if encoded is None:
+            setattr(message, name, json.dumps(decoded))
+        elif typed:
+            extra.append(encode_field(fields[f'{name}_struct'].number, encoded))
+        else:
+            setattr(message, name, json.dumps(decode_struct(encoded)))
+    return message.SerializeToString() + b''.join(extra)
+
+
+def serialize_repeated(field_number: int, entries):
+    return b''.join(encode_field(field_number, entry) for entry in entries)
+
+
+def legacy_payloads(message, names):
+    # Clientes antigos entendem apenas as strings JSON
+    for name in names:
+        field = f'{name}_struct'
+        if message.HasField(field):
+            setattr(message, name, json.dumps(MessageToDict(getattr(message, field))))
+            message.ClearField(field)
+    return message
@@ -1,10 +1,13 @@
 import time
-import json
 import socket
 import logging
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
+from db.handles import split_device_name
 from db.repositories import get_sensors_repository, get_actuators_repository
+from liveness import SENSORS_LIVENESS, ACTUATORS_LIVENESS
+from framing import is_framed, recv_frame, send_frame
+from payloads import read_payload
 from messages_pb2 import Address, JoinRequest, JoinReply, DeviceType
 
 
@@ -31,6 +34,7 @@ def multicast_locations(
         broker_ip=broker_ip,
         broker_port=broker_port,
         publish_exchange=publish_exchange,
+        framed_registration=True,
     )
     addrs = addrs.SerializeToString()
     with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
@@ -58,32 +62,38 @@ def registration_handler(
     try:
         logger = logging.getLogger(f'REGISTRATION_HANDLER_{address}')
         logger.info('Processando requisição de registro')
-        msg = sock.recv(1024)
+        # Dispositivos antigos enviam a requisição sem prefixo de tamanho
+        framed = is_framed(sock)
+        msg = recv_frame(sock) if framed else sock.recv(1024)
         request = JoinRequest()
         request.ParseFromString(msg)
         device_info = request.device_info
         device_addrs = request.device_address
-        device_category, device_id = device_info.name.split('-')
-        device_id = int(device_id)
+        if device_info.HasField('device_id'):
+            device_id = device_info.device_id.id
+            device_category = device_info.device_id.category
+        else:
+            device_id, device_category = split_device_name(device_info.name)
         match request.device_info.type:
             case DeviceType.DT_SENSOR:
                 sensors_repository = get_sensors_repository()
-                reply = JoinReply()
-                metadata = json.loads(device_info.metadata)
-                sensors_repository.add_sensor(
+                metadata, encoded_metadata = read_payload(device_info, 'metadata')
+                handle = sensors_repository.add_sensor(
                     sensor_id=device_id,
                     sensor_category=device_category,
                     ip_address=device_addrs.ip,
                     device_metadata=metadata,
                     availability_tolerance=sensors_tolerance,
-                )
+                    encoded_metadata=encoded_metadata,
+                ).result()
+                reply = JoinReply(device_handle=handle)
+                SENSORS_LIVENESS.track((device_id, device_category), sensors_tolerance)
             case DeviceType.DT_ACTUATOR:
                 actuators_repository = get_actuators_repository()
-                reply = JoinReply(report_port=actuators_port)
-                state = json.loads(device_info.state)
-                metadata = json.loads(device_info.metadata)
+                state, encoded_state = read_payload(device_info, 'state')
+                metadata, encoded_metadata = read_payload(device_info, 'metadata')
                 timestamp = datetime.fromisoformat(device_info.timestamp)
-                actuators_repository.add_actuator(
+                handle = actuators_repository.add_actuator(
                     actuator_id=device_id,
                     actuator_category=device_category,
                     ip_address=device_addrs.ip,
@@ -92,10 +102,26 @@ def registration_handler(
                     device_metadata=metadata,
                     timestamp=timestamp,
                     availability_tolerance=actuators_tolerance,
+                    encoded_state=encoded_state,
+                    encoded_metadata=encoded_metadata,
+                    metadata_hash=device_info.metadata_hash,
+                    state_seq=device_info.state_seq,
+                    framed_commands=device_info.framed_commands,
+                ).result()
+                reply = JoinReply(
+                    report_port=actuators_port,
+                    device_handle=handle,
+                    update_streams=True,
+                    typed_payloads=True,
+                    state_deltas=True,
                 )
+                ACTUATORS_LIVENESS.track((device_id, device_category), actuators_tolerance)
             case _:
                 raise ValueError('Invalid DeviceType')
-        sock.send(reply.SerializeToString())
+        if framed:
+            send_frame(sock, reply.SerializeToString())
+        else:
+            sock.send(reply.SerializeToString())
         logger.info('Ingresso bem-sucedido: %s', device_info.name)
     except Exception as e:
         logger.error(
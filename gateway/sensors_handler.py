@@ -1,49 +1,328 @@
 import time
 import logging
 import datetime
+import threading
+from collections import deque
+from concurrent.futures import Future, wait
+from functools import partial
 import pika
 from pika.exceptions import AMQPError
+from db.models import to_micros
+from db.handles import message_device_key
 from db.repositories import get_sensors_repository
-from messages_pb2 import SensorReading
+from liveness import SENSORS_LIVENESS
+from messages_pb2 import SensorReading, SensorReadingBatch
 
 
-def register_reading(body):
+READINGS_BATCH_TYPE = 'SensorReadingBatch'
+
+
+class ReadingsBuffer:
+    def __init__(self, max_size=5000, batch_size=500, max_delay=0.05):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._readings = 0
+        self._rejected = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._last_latency = 0.0
+        self._max_batch = 0
+        self._last_batch = 0
+
+    def offer(self, readings, delivery=None, force=False):
+        # Não bloqueia: as leituras de uma mensagem entram todas juntas ou
+        # nenhuma. Com o buffer vazio, mensagens maiores que ele são aceitas
+        with self._condition:
+            pending = len(self._items)
+            if not force and pending and pending + len(readings) > self.max_size:
+                return False
+            now = time.monotonic()
+            last = len(readings) - 1
+            # A mensagem só é confirmada após a gravação da sua última leitura
+            for position, reading in enumerate(readings):
+                self._items.append((now, reading, delivery if position == last else None))
+            if len(self._items) >= self.batch_size:
+                self._condition.notify_all()
+            return True
+
+    def has_room(self):
+        # Metade livre antes de retomar o consumo, para não alternar a cada lote
+        with self._condition:
+            return len(self._items) <= self.max_size // 2
+
+    def take(self, stop_flag):
+        with self._condition:
+            while True:
+                if len(self._items) >= self.batch_size or stop_flag.is_set():
+                    break
+                if self._items:
+                    age = time.monotonic() - self._items[0][0]
+                    if age >= self.max_delay:
+                        break
+                    self._condition.wait(self.max_delay - age)
+                else:
+                    self._condition.wait(0.5)
+            batch_size = min(len(self._items), self.batch_size)
+            batch = [self._items.popleft()[1:] for _ in range(batch_size)]
+            self._condition.notify_all()
+            return batch
+
+    def record_flush(self, batch_size, latency, rejected=0, failed=False):
+        with self._stats_lock:
+            if failed:
+                self._failed_flushes += 1
+                return
+            self._flushes += 1
+            self._readings += batch_size
+            self._rejected += rejected
+            self._total_latency += latency
+            self._last_latency = latency
+            self._max_latency = max(self._max_latency, latency)
+            self._last_batch = batch_size
+            self._max_batch = max(self._max_batch, batch_size)
+
+    def stats(self):
+        with self._condition:
+            pending = len(self._items)
+        with self._stats_lock:
+            flushes = self._flushes
+            return {
+                'pendingReadings': pending,
+                'flushes': flushes,
+                'failedFlushes': self._failed_flushes,
+                'readings': self._readings,
+                'rejectedReadings': self._rejected,
+                'batchSize': {
+                    'last': self._last_batch,
+                    'max': self._max_batch,
+                    'avg': self._readings / flushes if flushes else 0.0,
+                },
+                'flushLatencyMs': {
+                    'last': self._last_latency * 1000.0,
+                    'max': self._max_latency * 1000.0,
+                    'avg': self._total_latency * 1000.0 / flushes if flushes else 0.0,
+                },
+            }
+
+
+class ChannelAcknowledger:
+    def __init__(self, connection, channel):
+        self.connection = connection
+        self.channel = channel
+
+    def _threadsafe(self, method, **kwargs):
+        def callback():
+            if self.channel.is_open:
+                method(**kwargs)
+        try:
+            self.connection.add_callback_threadsafe(callback)
+        except Exception:
+            # Conexão encerrada: o Broker reenvia as mensagens não confirmadas
+            pass
+
+    def ack(self, delivery_tag):
+        self._threadsafe(
+            self.channel.basic_ack,
+            delivery_tag=delivery_tag,
+            multiple=True,
+        )
+
+    def nack(self, delivery_tag):
+        self._threadsafe(
+            self.channel.basic_nack,
+            delivery_tag=delivery_tag,
+            multiple=True,
+            requeue=True,
+        )
+
+
+def last_delivery_tags(deliveries):
+    tags = {}
+    for delivery in deliveries:
+        if delivery is None:
+            continue
+        acknowledger, delivery_tag = delivery
+        tags[acknowledger] = max(delivery_tag, tags.get(acknowledger, 0))
+    return tags
+
+
+def reading_entry(reading):
+    sensor_id, sensor_category = message_device_key(reading)
+    timestamp = reading.timestamp_us
+    if not timestamp:
+        # Sensores antigos enviam apenas o timestamp em ISO 8601
+        timestamp = to_micros(datetime.datetime.fromisoformat(reading.timestamp))
+    return (
+        sensor_id,
+        sensor_category,
+        reading.reading_value,
+        timestamp,
+    )
+
+
+def parse_reading(body):
     reading = SensorReading()
     reading.ParseFromString(body)
-    sensor_category, sensor_id = reading.device_name.split('-')
-    sensor_id = int(sensor_id)
+    return reading_entry(reading)
+
+
+def parse_readings(properties, body):
+    # Retorna as leituras válidas e o número de leituras descartadas do lote
+    if properties.type != READINGS_BATCH_TYPE:
+        return [parse_reading(body)], 0
+    batch = SensorReadingBatch()
+    batch.ParseFromString(body)
+    readings = []
+    for reading in batch.readings:
+        try:
+            readings.append(reading_entry(reading))
+        except ValueError:
+            continue
+    return readings, len(batch.readings) - len(readings)
+
+
+def flush_readings(readings_buffer, items, logger):
+    batch = [reading for reading, _ in items]
+    delivery_tags = last_delivery_tags(delivery for _, delivery in items)
     sensors_repository = get_sensors_repository()
-    result = sensors_repository.register_sensor_reading(
-        sensor_id=sensor_id,
-        sensor_category=sensor_category,
-        reading_value=reading.reading_value,
-        reading_timestamp=datetime.datetime.fromisoformat(reading.timestamp),
+    start = time.perf_counter()
+    def on_flushed(future):
+        try:
+            unknown_sensors = future.result()
+        except Exception as e:
+            readings_buffer.record_flush(len(batch), 0.0, failed=True)
+            for acknowledger, delivery_tag in delivery_tags.items():
+                acknowledger.nack(delivery_tag)
+            logger.error(
+                'Falha ao gravar lote de %d leituras: (%s) %s',
+                len(batch),
+                type(e).__name__,
+                e,
+            )
+            return
+        latency = time.perf_counter() - start
+        for acknowledger, delivery_tag in delivery_tags.items():
+            acknowledger.ack(delivery_tag)
+        rejected = sum(
+            1 for sensor_id, sensor_category, *_ in batch
+            if (sensor_id, sensor_category) in unknown_sensors
+        )
+        readings_buffer.record_flush(len(batch), latency, rejected)
+        logger.debug(
+            'Lote de %d leituras gravado em %.2f ms',
+            len(batch),
+            latency * 1000.0,
+        )
+        for sensor_id, sensor_category in unknown_sensors:
+            logger.warning(
+                'Recebendo leituras de um sensor não registrado: %s-%d',
+                sensor_category,
+                sensor_id,
+            )
+    try:
+        future = sensors_repository.register_sensor_readings(batch)
+    except Exception as e:
+        future = Future()
+        future.set_exception(e)
+    future.add_done_callback(on_flushed)
+    return future
+
+
+def readings_writer(stop_flag, readings_buffer):
+    logger = logging.getLogger('READINGS_WRITER')
+    logger.info(
+        'Gravando leituras em lotes de até %d leituras ou a cada %.3f segundos',
+        readings_buffer.batch_size,
+        readings_buffer.max_delay,
     )
-    return result, reading.device_name
+    in_flight = None
+    while True:
+        items = readings_buffer.take(stop_flag)
+        if items:
+            future = flush_readings(readings_buffer, items, logger)
+            # Acumula o próximo lote enquanto o anterior é gravado
+            if in_flight is not None:
+                wait((in_flight,))
+            in_flight = future
+        elif stop_flag.is_set():
+            break
+    if in_flight is not None:
+        wait((in_flight,))
+    logger.info('Interrompendo gravação de leituras')
 
 
-def sensors_consumer(stop_flag, broker_ip, broker_port, publish_exchange):
+def sensors_consumer(
+    stop_flag,
+    broker_ip,
+    broker_port,
+    publish_exchange,
+    readings_buffer,
+    readings_queue='',
+    manual_ack=False,
+    prefetch_count=0,
+):
     logger = logging.getLogger('SENSORS_CONSUMER')
-    def callback(ch, method, properties, body):
+    consumer = {'tag': None}
+    def receive(properties, body):
+        readings, discarded = parse_readings(properties, body)
+        if discarded:
+            logger.warning(
+                '%d leituras de sensores não identificados descartadas do lote',
+                discarded,
+            )
+        for sensor_key in {reading[:2] for reading in readings}:
+            SENSORS_LIVENESS.mark_seen(sensor_key)
+        return readings
+    def pause(ch):
+        # Suspende o consumo sem bloquear a conexão com o Broker; ele é
+        # retomado quando o escritor libera espaço no buffer
+        logger.warning('Buffer de leituras cheio: consumo suspenso')
+        pending = ch.basic_cancel(consumer['tag'])
+        consumer['tag'] = None
+        # Sem confirmação manual, as mensagens já entregues não voltam para a
+        # fila e são aceitas mesmo com o buffer cheio (no máximo as recebidas
+        # antes do cancelamento)
+        for _, properties, body in pending:
+            try:
+                readings_buffer.offer(receive(properties, body), force=True)
+            except Exception as e:
+                logger.error(
+                    'Falha ao processar mensagem: (%s) %s',
+                    type(e).__name__,
+                    e,
+                )
+    def callback(acknowledger, ch, method, properties, body):
         try:
-            result, sensor_name = register_reading(body)
+            readings = receive(properties, body)
         except Exception as e:
             logger.error(
                 'Falha ao processar mensagem: (%s) %s',
                 type(e).__name__,
                 e,
             )
+            if acknowledger is not None:
+                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
             return
-        if result:
-            logger.debug(
-                'Leitura de sensor recebida: %s',
-                sensor_name,
-            )
-        else:
-            logger.warning(
-                'Recebendo leituras de um sensor não registrado: %s',
-                sensor_name,
-            )
+        if not readings:
+            if acknowledger is not None:
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        delivery = None
+        if acknowledger is not None:
+            delivery = (acknowledger, method.delivery_tag)
+        if not readings_buffer.offer(readings, delivery):
+            pause(ch)
+            if acknowledger is not None:
+                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                return
+            readings_buffer.offer(readings, force=True)
+        logger.debug('%d leituras de sensores recebidas', len(readings))
     while not stop_flag.is_set():
         try:
             connection = pika.BlockingConnection(
@@ -65,23 +344,47 @@ def sensors_consumer(stop_flag, broker_ip, broker_port, publish_exchange):
                     exchange=publish_exchange,
                     exchange_type='fanout',
                 )
-                result = channel.queue_declare(queue='', exclusive=True)
-                exclusive_queue = result.method.queue
-                channel.queue_bind(exchange=publish_exchange, queue=exclusive_queue)
-                channel.basic_consume(
-                    queue=exclusive_queue,
-                    on_message_callback=callback,
-                    auto_ack=True,
-                )
+                if readings_queue:
+                    result = channel.queue_declare(
+                        queue=readings_queue,
+                        durable=True,
+                    )
+                else:
+                    result = channel.queue_declare(queue='', exclusive=True)
+                queue_name = result.method.queue
+                channel.queue_bind(exchange=publish_exchange, queue=queue_name)
+                acknowledger = None
+                if manual_ack:
+                    # Mensagens não confirmadas ficam no buffer: o prefetch não
+                    # pode ultrapassar sua capacidade
+                    channel.basic_qos(
+                        prefetch_count=min(
+                            prefetch_count or readings_buffer.max_size,
+                            readings_buffer.max_size,
+                        ),
+                    )
+                    acknowledger = ChannelAcknowledger(connection, channel)
+                def consume():
+                    return channel.basic_consume(
+                        queue=queue_name,
+                        on_message_callback=partial(callback, acknowledger),
+                        auto_ack=not manual_ack,
+                    )
+                consumer['tag'] = consume()
                 logger.info(
-                    'Consumindo mensagens da exchange %s',
+                    'Consumindo mensagens da exchange %s pela fila %s',
                     publish_exchange,
+                    queue_name,
                 )
                 fail_count = 0
                 max_num_fails = 3
                 while not stop_flag.is_set():
                     try:
-                        connection.process_data_events(time_limit=1.0)
+                        paused = consumer['tag'] is None
+                        connection.process_data_events(time_limit=0.1 if paused else 1.0)
+                        if paused and readings_buffer.has_room():
+                            logger.info('Consumo de mensagens retomado')
+                            consumer['tag'] = consume()
                         fail_count = 0
                     except Exception as e:
                         fail_count += 1
@@ -0,0 +1,69 @@
+import logging
+from db.repositories import get_sensors_repository
+
+
+def drop_expired_readings(logger):
+    try:
+        count = get_sensors_repository().drop_expired_readings().result()
+    except Exception as e:
+        logger.error(
+            'Erro ao descartar partições expiradas: (%s) %s',
+            type(e).__name__,
+            e,
+        )
+        return
+    if count:
+        logger.info('%d leituras expiradas descartadas', count)
+
+
+def drop_expired_rollups(logger):
+    try:
+        count = get_sensors_repository().drop_expired_rollups().result()
+    except Exception as e:
+        logger.error(
+            'Erro ao descartar agregados expirados: (%s) %s',
+            type(e).__name__,
+            e,
+        )
+        return
+    if count:
+        logger.info('%d agregados expirados descartados', count)
+
+
+def archive_readings(logger):
+    try:
+        count = get_sensors_repository().archive_readings().result()
+    except Exception as e:
+        logger.error(
+            'Erro ao arquivar leituras: (%s) %s',
+            type(e).__name__,
+            e,
+        )
+        return
+    if count:
+        logger.info('%d leituras arquivadas', count)
+
+
+def compress_readings(logger):
+    try:
+        count = get_sensors_repository().compress_readings().result()
+    except Exception as e:
+        logger.error(
+            'Erro ao comprimir leituras: (%s) %s',
+            type(e).__name__,
+            e,
+        )
+        return
+    if count:
+        logger.info('%d leituras comprimidas', count)
+
+
+def storage_maintainer(stop_flag, interval):
+    logger = logging.getLogger('STORAGE_MAINTAINER')
+    logger.info('Manutenção do armazenamento a cada %.1f segundos', interval)
+    while not stop_flag.is_set():
+        drop_expired_readings(logger)
+        drop_expired_rollups(logger)
+        archive_readings(logger)
+        compress_readings(logger)
+        stop_flag.wait(interval)
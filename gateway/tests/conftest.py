@@ -0,0 +1,42 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+import pytest
+
+# Os módulos do Gateway são importados a partir do seu diretório
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def pytest_configure(config):
+    # O banco (local.db) e os arquivos colunares são criados no diretório
+    # corrente, que precisa ser fixado antes da importação de db.sessions
+    config.gateway_cwd = os.getcwd()
+    config.storage_dir = tempfile.mkdtemp(prefix='gateway-tests-')
+    os.chdir(config.storage_dir)
+
+
+def pytest_unconfigure(config):
+    os.chdir(config.gateway_cwd)
+    shutil.rmtree(config.storage_dir, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def sql_storage():
+    # Escritor do banco rodando em segundo plano; cada chamada recria o
+    # armazenamento
+    from db.repositories import init_storage
+    from db.sessions import ENGINE, READ_ENGINE
+    from db.writer import DB_WRITER
+    def init(**kwargs):
+        ENGINE.dispose()
+        READ_ENGINE.dispose()
+        init_storage('sqlite', clear=True, **kwargs)
+    stop_flag = threading.Event()
+    writer = threading.Thread(target=DB_WRITER.run, args=(stop_flag,), daemon=True)
+    writer.start()
+    yield init
+    stop_flag.set()
+    writer.join()
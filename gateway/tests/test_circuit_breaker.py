@@ -0,0 +1,106 @@
+import pytest
+from circuit_breaker import CircuitBreakers, CLOSED, OPEN, HALF_OPEN
+
+KEY = (1, 'semaphore')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def breakers(clock):
+    return CircuitBreakers(failure_threshold=3, reset_timeout=5.0, clock=clock)
+
+
+def fail(breakers, times):
+    for _ in range(times):
+        breakers.record_failure(KEY)
+
+
+def test_opens_after_threshold(breakers):
+    fail(breakers, 2)
+    assert breakers.state(KEY) == CLOSED
+    assert breakers.allow(KEY)
+    fail(breakers, 1)
+    assert breakers.state(KEY) == OPEN
+    assert not breakers.available(KEY)
+    assert not breakers.allow(KEY)
+    assert breakers.stats() == {
+        'openCircuits': ['semaphore-1'],
+        'rejectedCommands': 2,
+    }
+
+
+def test_success_resets_failure_count(breakers):
+    fail(breakers, 2)
+    breakers.record_success(KEY)
+    fail(breakers, 2)
+    assert breakers.state(KEY) == CLOSED
+
+
+def test_half_open_allows_a_single_probe(breakers, clock):
+    fail(breakers, 3)
+    clock.now += 5.0
+    # available() apenas consulta, sem consumir a tentativa
+    assert breakers.available(KEY)
+    assert breakers.state(KEY) == OPEN
+    assert breakers.allow(KEY)
+    assert breakers.state(KEY) == HALF_OPEN
+    assert not breakers.available(KEY)
+    assert not breakers.allow(KEY)
+
+
+def test_probe_success_closes(breakers, clock):
+    fail(breakers, 3)
+    clock.now += 5.0
+    assert breakers.allow(KEY)
+    breakers.record_success(KEY)
+    assert breakers.state(KEY) == CLOSED
+    assert breakers.allow(KEY)
+    assert breakers.allow(KEY)
+
+
+def test_probe_failure_reopens(breakers, clock):
+    fail(breakers, 3)
+    clock.now += 5.0
+    assert breakers.allow(KEY)
+    fail(breakers, 1)
+    assert breakers.state(KEY) == OPEN
+    clock.now += 4.9
+    assert not breakers.allow(KEY)
+    clock.now += 0.1
+    assert breakers.allow(KEY)
+
+
+def test_liveness_opens_and_closes(breakers):
+    breakers.liveness_changed(KEY, False)
+    assert breakers.state(KEY) == OPEN
+    assert not breakers.available(KEY)
+    breakers.liveness_changed(KEY, True)
+    assert breakers.state(KEY) == CLOSED
+    assert breakers.available(KEY)
+
+
+def test_circuits_are_per_actuator(breakers):
+    fail(breakers, 3)
+    assert breakers.state(KEY) == OPEN
+    assert breakers.allow((2, 'semaphore'))
+    assert breakers.state((2, 'semaphore')) == CLOSED
+
+
+def test_configure_resets_circuits(breakers):
+    fail(breakers, 3)
+    breakers.configure(failure_threshold=1, reset_timeout=1.0)
+    assert breakers.state(KEY) == CLOSED
+    fail(breakers, 1)
+    assert breakers.state(KEY) == OPEN
@@ -0,0 +1,38 @@
+import datetime
+import pytest
+from clients_handler import get_sensors_report, get_sensor_data
+from db.models import to_micros
+from db.repositories import get_sensors_repository
+from messages_pb2 import SensorsReport, SensorData
+
+
+TIMESTAMP = datetime.datetime(2026, 1, 1, 12, 30, 15, 250, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def sensor(sql_storage):
+    sql_storage()
+    repository = get_sensors_repository()
+    repository.add_sensor(1, 'temp', '127.0.0.1', {'unit': 'C'}).result()
+    repository.register_sensor_readings([(1, 'temp', 21.5, to_micros(TIMESTAMP))]).result()
+    return repository
+
+
+def test_report_keeps_iso_timestamp_for_old_clients(sensor):
+    report = SensorsReport.FromString(get_sensors_report(typed=False))
+    reading = report.devices[0]
+    assert reading.timestamp_us == to_micros(TIMESTAMP)
+    assert datetime.datetime.fromisoformat(reading.timestamp) == TIMESTAMP
+
+
+def test_sensor_data_keeps_iso_timestamp_for_old_clients(sensor):
+    data = SensorData.FromString(get_sensor_data(1, 'temp', typed=False))
+    assert [datetime.datetime.fromisoformat(r.timestamp) for r in data.readings] == [TIMESTAMP]
+
+
+def test_typed_clients_get_only_integer_timestamps(sensor):
+    report = SensorsReport.FromString(get_sensors_report(typed=True))
+    data = SensorData.FromString(get_sensor_data(1, 'temp', typed=True))
+    for reading in (report.devices[0], data.readings[0]):
+        assert reading.timestamp == ''
+        assert reading.timestamp_us == to_micros(TIMESTAMP)
@@ -0,0 +1,144 @@
+import json
+import threading
+import pytest
+from command_queue import ActuatorCommandQueues
+from messages_pb2 import CommandType, ComplyStatus, ActuatorComply
+
+TIMEOUT = 5.0
+
+
+class FakeActuator:
+    # Aceita apenas chaves conhecidas, como o semáforo. O primeiro comando
+    # fica preso até release(), para que os seguintes se acumulem na fila
+    def __init__(self, keys=('GreenPeriod', 'RedPeriod')):
+        self.keys = set(keys)
+        self.state = {}
+        self.bodies = []
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def release(self):
+        self.released.set()
+
+    def deliver(self, actuator_id, actuator_category, command_type, command_body):
+        self.bodies.append((command_type, command_body))
+        self.started.set()
+        assert self.released.wait(TIMEOUT)
+        if command_type == CommandType.CT_SET_STATE:
+            patch = json.loads(command_body)
+            if set(patch) - self.keys:
+                return ActuatorComply(status=ComplyStatus.CS_INVALID_STATE)
+            self.state.update(patch)
+        return ActuatorComply(status=ComplyStatus.CS_OK)
+
+
+@pytest.fixture
+def actuator():
+    return FakeActuator()
+
+
+@pytest.fixture
+def queues(actuator):
+    queues = ActuatorCommandQueues(actuator.deliver, max_workers=2)
+    yield queues
+    actuator.release()
+    queues.shutdown()
+
+
+def set_state(queues, patch):
+    return queues.submit(1, 'semaphore', CommandType.CT_SET_STATE, json.dumps(patch))
+
+
+def block(queues, actuator):
+    # Ocupa o atuador com um comando em andamento
+    waiter = queues.submit(1, 'semaphore', CommandType.CT_ACTION, 'Block')
+    assert actuator.started.wait(TIMEOUT)
+    return waiter
+
+
+def test_pending_state_changes_are_merged(queues, actuator):
+    block(queues, actuator)
+    first = set_state(queues, {'GreenPeriod': 10})
+    second = set_state(queues, {'RedPeriod': 20})
+    actuator.release()
+    assert first.result(TIMEOUT).status == ComplyStatus.CS_OK
+    assert second.result(TIMEOUT).status == ComplyStatus.CS_OK
+    assert actuator.bodies[1:] == [
+        (CommandType.CT_SET_STATE, json.dumps({'GreenPeriod': 10, 'RedPeriod': 20})),
+    ]
+    assert queues.stats()['mergedCommands'] == 1
+
+
+def test_later_change_wins(queues, actuator):
+    block(queues, actuator)
+    set_state(queues, {'GreenPeriod': 10})
+    last = set_state(queues, {'GreenPeriod': 15})
+    actuator.release()
+    last.result(TIMEOUT)
+    assert actuator.state == {'GreenPeriod': 15}
+
+
+def test_cancelled_change_is_not_sent(queues, actuator):
+    block(queues, actuator)
+    cancelled = set_state(queues, {'GreenPeriod': 10})
+    kept = set_state(queues, {'RedPeriod': 20})
+    assert cancelled.cancel()
+    actuator.release()
+    assert kept.result(TIMEOUT).status == ComplyStatus.CS_OK
+    assert actuator.bodies[1:] == [
+        (CommandType.CT_SET_STATE, json.dumps({'RedPeriod': 20})),
+    ]
+    assert actuator.state == {'RedPeriod': 20}
+
+
+def test_invalid_change_fails_only_its_caller(queues, actuator):
+    block(queues, actuator)
+    valid = set_state(queues, {'GreenPeriod': 10})
+    invalid = set_state(queues, {'Phase': 'Green'})
+    other = set_state(queues, {'RedPeriod': 20})
+    actuator.release()
+    assert valid.result(TIMEOUT).status == ComplyStatus.CS_OK
+    assert invalid.result(TIMEOUT).status == ComplyStatus.CS_INVALID_STATE
+    assert other.result(TIMEOUT).status == ComplyStatus.CS_OK
+    assert actuator.state == {'GreenPeriod': 10, 'RedPeriod': 20}
+
+
+def test_concurrent_get_state_is_shared(queues, actuator):
+    block(queues, actuator)
+    waiters = [
+        queues.submit(1, 'semaphore', CommandType.CT_GET_STATE, '')
+        for _ in range(3)
+    ]
+    actuator.release()
+    replies = [waiter.result(TIMEOUT) for waiter in waiters]
+    assert all(reply is replies[0] for reply in replies)
+    assert [body for body in actuator.bodies if body[0] == CommandType.CT_GET_STATE] == [
+        (CommandType.CT_GET_STATE, ''),
+    ]
+
+
+def test_commands_keep_arrival_order(queues, actuator):
+    block(queues, actuator)
+    set_state(queues, {'GreenPeriod': 10})
+    queues.submit(1, 'semaphore', CommandType.CT_ACTION, 'Reset')
+    last = set_state(queues, {'GreenPeriod': 15})
+    actuator.release()
+    last.result(TIMEOUT)
+    assert [body for _, body in actuator.bodies] == [
+        'Block',
+        json.dumps({'GreenPeriod': 10}),
+        'Reset',
+        json.dumps({'GreenPeriod': 15}),
+    ]
+
+
+def test_delivery_error_resolves_none():
+    def deliver(*args):
+        raise RuntimeError('boom')
+
+    queues = ActuatorCommandQueues(deliver, max_workers=1)
+    try:
+        waiter = queues.submit(1, 'semaphore', CommandType.CT_GET_STATE, '')
+        assert waiter.result(TIMEOUT) is None
+    finally:
+        queues.shutdown()
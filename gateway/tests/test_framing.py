@@ -0,0 +1,111 @@
+import socket
+import pytest
+from framing import MAX_FRAME_SIZE, FrameBuffer, FrameReader
+from framing import frame_message, is_framed, recv_frame, send_frame
+from messages_pb2 import ActuatorUpdate
+
+
+@pytest.fixture
+def peers():
+    receiver, sender = socket.socketpair()
+    yield receiver, sender
+    receiver.close()
+    sender.close()
+
+
+def test_send_and_recv_frame(peers):
+    receiver, sender = peers
+    for message in (b'', b'a', b'x' * 100_000):
+        send_frame(sender, message)
+        assert recv_frame(receiver) == message
+
+
+def test_recv_frame_rejects_oversized_frame(peers):
+    receiver, sender = peers
+    sender.sendall(frame_message(b'x' * 11))
+    with pytest.raises(ValueError):
+        recv_frame(receiver, max_frame_size=10)
+
+
+def test_recv_frame_detects_closed_socket(peers):
+    receiver, sender = peers
+    sender.sendall(frame_message(b'abcdef')[:-2])
+    sender.shutdown(socket.SHUT_WR)
+    with pytest.raises(EOFError):
+        recv_frame(receiver)
+
+
+def test_is_framed(peers):
+    receiver, sender = peers
+    message = ActuatorUpdate(device_name='semaphore-1').SerializeToString()
+    sender.sendall(message)
+    assert not is_framed(receiver)
+    # A espiada não consome o byte inspecionado
+    assert receiver.recv(len(message)) == message
+    send_frame(sender, message)
+    assert is_framed(receiver)
+    assert recv_frame(receiver) == message
+
+
+def test_frame_buffer_reuses_and_grows(peers):
+    receiver, sender = peers
+    frames = FrameBuffer(buffer_size=8)
+    send_frame(sender, b'abc')
+    assert bytes(frames.recv_frame(receiver)) == b'abc'
+    buffer = frames._buffer
+    send_frame(sender, b'defgh')
+    assert bytes(frames.recv_frame(receiver)) == b'defgh'
+    assert frames._buffer is buffer
+    send_frame(sender, b'y' * 20)
+    assert bytes(frames.recv_frame(receiver)) == b'y' * 20
+    assert len(frames._buffer) == 20
+
+
+def test_frame_reader_reassembles_fragments(peers):
+    receiver, sender = peers
+    reader = FrameReader(buffer_size=4)
+    messages = [b'first', b'', b'x' * 50, b'last']
+    data = b''.join(frame_message(message) for message in messages)
+    received = []
+    # Buffer inicial menor que os frames: leituras parciais e crescimento
+    for position in range(0, len(data), 3):
+        sender.sendall(data[position:position + 3])
+        reader.read(receiver)
+        received.extend(reader.frames())
+    while len(received) < len(messages):
+        reader.read(receiver)
+        received.extend(reader.frames())
+    assert received == messages
+    assert reader.pending_size() == 0
+
+
+def test_frame_reader_frames_outlive_later_reads(peers):
+    receiver, sender = peers
+    reader = FrameReader(buffer_size=8)
+    send_frame(sender, b'abcd')
+    reader.read(receiver)
+    frames = reader.frames()
+    send_frame(sender, b'z' * 30)
+    while not reader.frames():
+        reader.read(receiver)
+    assert frames == [b'abcd']
+
+
+def test_frame_reader_rejects_oversized_frame(peers):
+    receiver, sender = peers
+    reader = FrameReader(max_frame_size=10)
+    sender.sendall(frame_message(b'x' * 11))
+    reader.read(receiver)
+    with pytest.raises(ValueError):
+        reader.frames()
+
+
+def test_frame_reader_detects_closed_socket(peers):
+    receiver, sender = peers
+    sender.close()
+    with pytest.raises(EOFError):
+        FrameReader().read(receiver)
+
+
+def test_first_byte_of_a_frame_is_zero():
+    assert frame_message(b'x' * (MAX_FRAME_SIZE - 1))[:1] == b'\x00'
@@ -0,0 +1,80 @@
+import math
+import random
+import struct
+import pytest
+from db.gorilla import encode_chunk, decode_chunk, encode_ids, decode_ids
+
+
+def round_trip(timestamps, values):
+    return decode_chunk(encode_chunk(timestamps, values), len(timestamps))
+
+
+def same_floats(decoded, expected):
+    # Compara os bits, para que NaN e -0.0 também sejam verificados
+    pack = lambda values: struct.pack(f'>{len(values)}d', *values)
+    return pack(decoded) == pack(expected)
+
+
+def test_empty_chunk():
+    assert encode_chunk([], []) == b''
+    assert decode_chunk(b'', 0) == ([], [])
+
+
+def test_negative_first_timestamp():
+    timestamps = [-5_000_000, -4_000_000, 0]
+    assert round_trip(timestamps, [1.0, 2.0, 3.0])[0] == timestamps
+
+
+def test_ids_round_trip():
+    ids = [7, 9, 11, 12, 40, 3, 1 << 40]
+    assert decode_ids(encode_ids(ids), len(ids)) == ids
+    assert decode_ids(encode_ids([]), 0) == []
+
+
+def test_single_reading():
+    timestamps, values = round_trip([1_700_000_000_000_000], [22.5])
+    assert timestamps == [1_700_000_000_000_000]
+    assert values == [22.5]
+
+
+def test_regular_series_is_compact():
+    timestamps = [1_700_000_000_000_000 + i * 1_000_000 for i in range(1024)]
+    values = [22.5] * 1024
+    data = encode_chunk(timestamps, values)
+    assert decode_chunk(data, 1024) == (timestamps, values)
+    # Após o primeiro intervalo, delta-of-delta e XOR nulos: um bit por
+    # timestamp e por valor
+    assert len(data) <= 16 + 8 + 2 * 1024 // 8
+
+
+@pytest.mark.parametrize('delta_of_delta', [1, -1, 1 << 15, -(1 << 15), 1 << 23, 1 << 31, 1 << 40])
+def test_timestamp_buckets(delta_of_delta):
+    timestamps = [1_000_000, 2_000_000, 3_000_000 + delta_of_delta, 4_000_000]
+    assert round_trip(timestamps, [0.0] * 4)[0] == timestamps
+
+
+def test_unordered_timestamps():
+    timestamps = [5_000_000, 4_000_000, 4_000_000, 9_000_000, 1_000]
+    assert round_trip(timestamps, [1.0] * 5)[0] == timestamps
+
+
+def test_special_values():
+    values = [0.0, -0.0, math.inf, -math.inf, math.nan, 5e-324, -1.7976931348623157e308, 1.0]
+    timestamps = list(range(len(values)))
+    assert same_floats(round_trip(timestamps, values)[1], values)
+
+
+def test_random_series():
+    rng = random.Random(2015)
+    timestamp = 1_700_000_000_000_000
+    timestamps = []
+    values = []
+    value = 20.0
+    for _ in range(2000):
+        timestamp += rng.choice((1_000_000, 1_000_000, 999_987, 1_000_042, 60_000_000))
+        value = rng.choice((value, round(value + rng.uniform(-0.5, 0.5), 1), rng.uniform(-1e6, 1e6)))
+        timestamps.append(timestamp)
+        values.append(value)
+    decoded_timestamps, decoded_values = round_trip(timestamps, values)
+    assert decoded_timestamps == timestamps
+    assert same_floats(decoded_values, values)
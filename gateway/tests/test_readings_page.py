@@ -0,0 +1,131 @@
+import datetime
+import numpy as np
+import pytest
+from db.models import to_micros
+from db.repositories import get_sensors_repository
+
+
+DAY = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def micros(day, hour, minute=0):
+    return to_micros(DAY + datetime.timedelta(days=day, hours=hour, minutes=minute))
+
+
+def readings(sensor_id, days):
+    # Quatro leituras por dia, duas delas com o mesmo timestamp
+    rows = []
+    for day in days:
+        for hour, value in ((1, 0.5), (6, 1.5), (6, 2.5), (18, 3.25)):
+            rows.append((sensor_id, 'temp', day * 10 + value, micros(day, hour)))
+    return rows
+
+
+def read_all(repository, sensor_id, limit, cursor=None, pages=None):
+    # Percorre as páginas (da mais recente para a mais antiga) a partir do
+    # cursor, no máximo `pages` páginas
+    seen = []
+    while pages is None or pages > 0:
+        page, cursor = repository.get_sensor_readings_page(
+            sensor_id, 'temp', cursor=cursor, limit=limit,
+        )
+        seen.extend(reversed(page))
+        if pages is not None:
+            pages -= 1
+        if cursor is None:
+            break
+    return seen, cursor
+
+
+def expected_order(rows):
+    return sorted(
+        ((timestamp, value) for _, _, value, timestamp in rows),
+        key=lambda reading: reading[0],
+        reverse=True,
+    )
+
+
+def assert_complete(seen, rows):
+    assert len({(reading.timestamp, reading.id) for reading in seen}) == len(seen)
+    assert [reading.timestamp for reading in seen] == [timestamp for timestamp, _ in expected_order(rows)]
+    assert sorted(reading.value for reading in seen) == sorted(value for _, _, value, _ in rows)
+
+
+@pytest.fixture
+def repository(sql_storage):
+    sql_storage(hot_days=1, archive_days=4, chunk_size=3)
+    repository = get_sensors_repository()
+    repository.add_sensor(1, 'temp', '127.0.0.1', None).result()
+    return repository
+
+
+def test_pages_across_raw_compressed_and_archived(repository):
+    rows = readings(1, range(8))
+    repository.register_sensor_readings(rows).result()
+    now = DAY + datetime.timedelta(days=8)
+    assert repository.archive_readings(now).result() == 16
+    assert repository.compress_readings(now).result() == 12
+    # Leituras atrasadas ficam na cauda bruta de partições já processadas
+    late = [(1, 'temp', 100.5, micros(1, 6)), (1, 'temp', 200.5, micros(5, 12))]
+    repository.register_sensor_readings(late).result()
+    rows += late
+    for limit in (1, 3, 5, 100):
+        seen, _ = read_all(repository, 1, limit)
+        assert_complete(seen, rows)
+
+
+def test_cursor_survives_compression_and_archiving(repository):
+    rows = readings(1, range(8))
+    repository.register_sensor_readings(rows).result()
+    # Metade das páginas lidas antes da manutenção, o restante depois
+    first, cursor = read_all(repository, 1, 3, pages=5)
+    assert cursor is not None
+    now = DAY + datetime.timedelta(days=8)
+    repository.archive_readings(now).result()
+    repository.compress_readings(now).result()
+    second, cursor = read_all(repository, 1, 3, cursor=cursor, pages=2)
+    # Uma nova versão do arquivo no meio da paginação
+    late = [(1, 'temp', 100.5, micros(0, 12))]
+    repository.register_sensor_readings(late).result()
+    repository.archive_readings(now).result()
+    third, _ = read_all(repository, 1, 3, cursor=cursor)
+    assert_complete(first + second + third, rows + late)
+    ids = {(reading.timestamp, reading.value): reading.id for reading in first + second}
+    final, _ = read_all(repository, 1, 100)
+    for reading in final:
+        if (reading.timestamp, reading.value) in ids:
+            assert ids[reading.timestamp, reading.value] == reading.id
+
+
+def test_time_window(repository):
+    rows = readings(1, range(8))
+    repository.register_sensor_readings(rows).result()
+    now = DAY + datetime.timedelta(days=8)
+    repository.archive_readings(now).result()
+    repository.compress_readings(now).result()
+    after, before = micros(2, 6), micros(6, 6)
+    page, cursor = repository.get_sensor_readings_page(1, 'temp', after=after, before=before, limit=100)
+    assert cursor is None
+    window = [row for row in rows if after <= row[3] < before]
+    assert [reading.timestamp for reading in reversed(page)] == [timestamp for timestamp, _ in expected_order(window)]
+
+
+def test_values_do_not_change_across_tiers(repository):
+    # Leituras chegam como float32 (campo float do Protobuf)
+    values = [float(np.float32(value)) for value in (22.7, -3.1, 0.1, 18.35)]
+    rows = [
+        (1, 'temp', values[(day + hour) % len(values)], micros(day, hour))
+        for day in range(8)
+        for hour in (1, 6, 18)
+    ]
+    repository.register_sensor_readings(rows).result()
+    before, _ = read_all(repository, 1, 100)
+    summary = repository.get_sensor_summary(1, 'temp')
+    now = DAY + datetime.timedelta(days=8)
+    repository.archive_readings(now).result()
+    repository.compress_readings(now).result()
+    after, _ = read_all(repository, 1, 100)
+    assert [(reading.id, reading.value) for reading in after] == [
+        (reading.id, reading.value) for reading in before
+    ]
+    assert repository.get_sensor_summary(1, 'temp') == summary
@@ -0,0 +1,53 @@
+import socket
+import pytest
+from actuators_handler import UpdateStream
+from framing import FrameReader, frame_message
+from messages_pb2 import ActuatorUpdate
+
+
+@pytest.fixture
+def peers():
+    gateway, actuator = socket.socketpair()
+    yield gateway, actuator
+    gateway.close()
+    actuator.close()
+
+
+def make_stream(sock, max_frame_size=1 << 20):
+    stream = UpdateStream(sock, ('127.0.0.1', 0))
+    stream.reader = FrameReader(buffer_size=16, max_frame_size=max_frame_size)
+    return stream
+
+
+def test_framed_updates(peers):
+    gateway, actuator = peers
+    stream = make_stream(gateway)
+    updates = [ActuatorUpdate(device_name=f'semaphore-{i}', state_seq=i) for i in range(3)]
+    actuator.sendall(b''.join(frame_message(u.SerializeToString()) for u in updates))
+    received = []
+    while len(received) < len(updates):
+        received.extend(stream.read_updates())
+    assert not stream.legacy
+    assert received == updates
+
+
+def test_legacy_update(peers):
+    gateway, actuator = peers
+    stream = make_stream(gateway)
+    update = ActuatorUpdate(device_name='semaphore-1', timestamp='2025-01-01T00:00:00')
+    actuator.sendall(update.SerializeToString())
+    actuator.shutdown(socket.SHUT_WR)
+    with pytest.raises(EOFError):
+        while True:
+            assert stream.read_updates() == []
+    assert stream.legacy
+    assert stream.legacy_update() == update
+
+
+def test_legacy_update_is_capped(peers):
+    gateway, actuator = peers
+    stream = make_stream(gateway, max_frame_size=64)
+    actuator.sendall(ActuatorUpdate(device_name='x' * 100).SerializeToString())
+    with pytest.raises(ValueError):
+        while True:
+            stream.read_updates()